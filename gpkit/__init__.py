@@ -122,6 +122,9 @@ from .nomials import Nomial, NomialArray
 from .nomials import Monomial, Posynomial, Signomial
 from .nomials import Variable, VectorVariable, ArrayVariable
 from .geometric_program import GeometricProgram
+from .compiled_program import CompiledGeometricProgram
+from .program_cache import ProgramCache
+from .streaming import StreamedGeometricProgram
 from .constraints.signomial_program import SignomialProgram
 from .constraints.set import ConstraintSet
 from .constraints.model import Model
@@ -0,0 +1,97 @@
+"""Solves GPs with zero degrees of difficulty analytically, from their dual
+
+A GP with n variables and n+1 monomials (after presolve) has a dual whose
+feasible set is a single point: the solution of the normality condition
+(the cost's monomials' duals sum to one) and the orthogonality conditions
+(A.T.dot(nu) = 0). If that point is non-negative it is optimal, and the
+primal solution follows from a linear system in log space.
+"""
+import warnings
+import numpy as np
+from .segment_ops import segment_sum, segment_logsumexp
+
+
+def degree_of_difficulty(cs, A):
+    "Returns the number of monomials minus the number of variables, minus 1."
+    return len(cs) - A.shape[1] - 1
+
+
+def analytic_fn(tol=1e-8):
+    "Return an analytic zero-degree-of-difficulty solve function."
+
+    # pylint: disable=unused-argument
+    def dualsolve(c, A, p_idxs, k, *args, **kwargs):
+        """Solves a GP with zero degrees of difficulty through its dual
+
+            Arguments
+            ---------
+            c : floats array of shape n
+                Coefficients of each monomial
+            A : floats array of shape (n, n-1)
+                Exponents of the various free variables for each monomial.
+            p_idxs : ints array of shape n
+                Posynomial index of each monomial
+            k : ints array
+                number of monomials present in each posynomial
+
+            Returns
+            -------
+            dict
+                Contains the following keys
+                    "status": string
+                        "optimal", or the reason the dual point isn't
+                        optimal, in which case another solver should be used
+                    "objective": float
+                        Optimal value of the cost
+                    "primal": floats array of size n-1
+                        Optimal value of free variables, in logspace.
+                    "nu": floats array of size n
+                        Optimal value of each monomial's dual variable.
+        """
+        from scipy.sparse import csr_matrix, vstack
+        from scipy.sparse.linalg import spsolve
+        if degree_of_difficulty(c, A):
+            raise ValueError("the analytic solver needs a GP with zero degrees"
+                             " of difficulty, not %i."
+                             % degree_of_difficulty(c, A))
+        csr = A.tocsr()
+        n_vars = csr.shape[1]
+        p_idxs = np.asarray(p_idxs)
+        logc = np.log(c)
+
+        ## the dual's single feasible point
+        normality = csr_matrix((p_idxs == 0).astype(float))
+        rhs = np.zeros(n_vars + 1)
+        rhs[-1] = 1
+        system = vstack([csr.T, normality]).tocsc()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # singular systems give nans
+            nu = np.atleast_1d(spsolve(system, rhs))
+        if (not np.isfinite(nu).all()
+                or np.abs(system.dot(nu) - rhs).max() > tol):
+            return dict(status="singular")
+        if nu.min() < -tol:
+            return dict(status="negative dual")
+        nu[nu < tol] = 0
+        la = segment_sum(nu, p_idxs, len(k))
+
+        ## the primal, from each monomial's share of its posynomial
+        active = np.flatnonzero(nu)
+        shares = np.log(nu[active]/la[p_idxs[active]])
+        logcost = np.dot(nu[active], logc[active] - shares)
+        lhs = csr[active].toarray()
+        logmonos = shares - logc[active]
+        logmonos[p_idxs[active] == 0] += logcost
+        primal, _, rank, _ = np.linalg.lstsq(lhs, logmonos, rcond=None)
+        if rank < n_vars:
+            return dict(status="primal not unique")
+        if np.abs(lhs.dot(primal) - logmonos).max() > tol:
+            return dict(status="inconsistent")
+        # constraints whose duals are zero must still be satisfied
+        posys = segment_logsumexp(csr.dot(primal) + logc, p_idxs, len(k))
+        if len(k) > 1 and posys[1:].max() > tol:
+            return dict(status="infeasible")
+        return dict(status="optimal", primal=primal, nu=nu,
+                    objective=np.exp(logcost))
+
+    return dualsolve
@@ -1,5 +1,7 @@
 "Implements the GPkit interface to CVXOPT"
-from cvxopt import solvers, spmatrix, matrix, log
+import numpy as np
+from cvxopt import solvers, spmatrix, matrix
+from .presolve import split_monomial_rows
 
 
 def cvxoptimize_fn(options=None):
@@ -8,7 +10,7 @@ def cvxoptimize_fn(options=None):
         solvers.options.update(options)
     gpsolver = solvers.gp
 
-    # pylint: disable=unused-argument
+    # pylint: disable=unused-argument,too-many-locals
     def cvxoptimize(c, A, k, *args, **kwargs):
         """Interface to the CVXOPT solver
 
@@ -28,23 +30,70 @@ def cvxoptimize_fn(options=None):
             k : ints array of shape n
                 number of monomials (columns of F) present in each constraint
 
+            Single-monomial constraints are passed to CVXOPT as linear
+            inequalities (G, h), and monomial equalities as linear
+            equalities (A, b); see gpkit.presolve.split_monomial_rows.
+
             Returns
             -------
             dict
                 Contains the following keys
-                    "success": bool
-                    "objective_sol" float
-                        Optimal value of the objective
-                    "primal_sol": floats array of size m
-                        Optimal value of free variables. Note: not in logspace.
-                    "dual_sol": floats array of size p
-                        Optimal value of the dual variables, in logspace.
+                    "status": string
+                        CVXOPT's status, e.g. "optimal"
+                    "primal": floats array of size m
+                        Optimal value of free variables, in logspace.
+                    "la": floats array of size p
+                        Optimal value of each posynomial's dual variable
+                        (those of linear constraints mapped back to their
+                        posynomials).
         """
-        g = log(matrix(c))
-        F = spmatrix(A.data, A.row, A.col, tc='d')
-        solution = gpsolver(k, F, g)
+        blocks = split_monomial_rows(c, A, k)
+        p_idxs = np.repeat(np.arange(len(k)), k)
+        logc = np.log(c)
+        csr = A.tocsr()
+
+        def block(rows):
+            "Returns the rows' exponents as a cvxopt spmatrix, and -log(c)."
+            coo = csr[rows].tocoo()
+            return (spmatrix(coo.data.tolist(), coo.row.tolist(),
+                             coo.col.tolist(), size=(len(rows), csr.shape[1])),
+                    matrix(-logc[rows]))
+
+        posy_rows = blocks["posynomial"]
+        F, g = block(posy_rows)
+        g = -g  # F x + g are the posynomials' log-space monomials
+        K = np.bincount(p_idxs[posy_rows]).tolist()
+        K = [n for n in K if n]
+        linear = {}
+        if len(blocks["inequality"]):
+            linear["G"], linear["h"] = block(blocks["inequality"])
+        if len(blocks["equality"]):
+            linear["A"], linear["b"] = block(blocks["equality"])
+        try:
+            solution = gpsolver(K, F, g, **linear)
+        except ValueError:
+            if "A" not in linear:
+                raise
+            # the equalities may be linearly dependent; solve them as
+            # pairs of inequalities instead
+            rows = np.hstack([blocks["inequality"], blocks["equality"],
+                              blocks["twin"]])
+            blocks["inequality"] = rows
+            blocks["equality"] = blocks["twin"] = np.array([], dtype=int)
+            linear = dict(zip(["G", "h"], block(rows)))
+            solution = gpsolver(K, F, g, **linear)
+
+        la = np.zeros(len(k))
+        la[0] = 1.0
+        la[np.unique(p_idxs[posy_rows])[1:]] = np.ravel(solution['znl'])
+        if len(blocks["inequality"]):
+            la[p_idxs[blocks["inequality"]]] = np.ravel(solution['zl'])
+        if len(blocks["equality"]):
+            y = np.ravel(solution['y'])
+            la[p_idxs[blocks["equality"]]] = np.maximum(y, 0)
+            la[p_idxs[blocks["twin"]]] = np.maximum(-y, 0)
         return dict(status=solution['status'],
                     primal=solution['x'],
-                    la=solution['znl'])
+                    la=la)
 
     return cvxoptimize
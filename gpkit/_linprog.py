@@ -0,0 +1,108 @@
+"""Implements a GPkit interface to scipy's linprog, for GPs whose posynomials
+(including the cost) all have a single monomial, which are linear programs
+in log space"""
+import re
+import numpy as np
+
+LINPROG_STATUS = {0: "optimal", 2: "infeasible", 3: "unbounded"}
+
+
+def has_highs():
+    """True if scipy's linprog has the HiGHS method and returns its duals
+
+    (as `res.ineqlin.marginals`), which it does from scipy 1.7 on. Older
+    versions don't always reject an unknown method, so this checks the
+    version rather than trying the method.
+    """
+    try:
+        import scipy
+    except ImportError:
+        return False
+    version = re.match(r"(\d+)\.(\d+)", scipy.__version__)
+    return bool(version) and tuple(map(int, version.groups())) >= (1, 7)
+
+
+def linprog_fn(options=None):
+    "Return a linprog solve function for a particular set of options."
+
+    # pylint: disable=unused-argument
+    def lpoptimize(c, A, k, *args, **kwargs):
+        """Solves an all-monomial GP as a linear program with scipy
+
+            Arguments
+            ---------
+            c : floats array of shape n
+                Coefficients of each monomial
+            A : floats array of shape (m,n)
+                Exponents of the various free variables for each monomial.
+            k : ints array of shape n
+                number of monomials present in each posynomial; all 1.
+
+            Returns
+            -------
+            dict
+                Contains the following keys
+                    "status": string
+                    "objective": float
+                        Optimal value of the cost
+                    "primal": floats array of size m
+                        Optimal value of free variables, in logspace.
+                    "la": floats array of size n
+                        Optimal value of each posynomial's dual variable.
+
+            Uses the HiGHS solver and its dual values where scipy has them;
+            otherwise uses the default method, and finds the duals of the
+            constraints active at the solution with non-negative least
+            squares.
+        """
+        from scipy.optimize import linprog
+        if any(n != 1 for n in k):
+            raise ValueError("linprog can only solve GPs whose posynomials"
+                             " all have a single monomial.")
+        csr = A.tocsr()
+        logc = np.log(c)
+        cost = csr[0].toarray().ravel()
+        A_ub, b_ub = csr[1:], -logc[1:]
+        bounds = [(None, None)]*csr.shape[1]
+        if not len(b_ub):
+            A_ub = b_ub = None
+        highs = has_highs()
+        if highs:
+            res = linprog(cost, A_ub=A_ub, b_ub=b_ub, bounds=bounds,
+                          method="highs", options=options)
+        else:
+            if A_ub is not None:
+                A_ub = A_ub.toarray()
+            res = linprog(cost, A_ub=A_ub, b_ub=b_ub, bounds=bounds,
+                          options=options)
+        status = LINPROG_STATUS.get(res.status, "unknown: %s" % res.message)
+        if res.status != 0:
+            # there's no solution (or duals) to report
+            return dict(status=status, primal=None)
+        if A_ub is None:
+            la = []
+        elif highs:
+            la = -res.ineqlin.marginals
+        else:
+            la = active_set_duals(cost, A_ub, b_ub, res.x)
+        return dict(status=status, primal=res.x,
+                    objective=np.exp(logc[0] + res.fun),
+                    la=np.hstack(([1.0], la)))
+
+    return lpoptimize
+
+
+def active_set_duals(cost, A_ub, b_ub, x, tol=1e-9):
+    """Returns dual variables for min cost.x s.t. A_ub.x <= b_ub at x
+
+    The duals of inactive constraints are zero; those of the active ones
+    are the non-negative least-squares solution of the stationarity
+    condition cost + A_active.T.dot(duals) = 0.
+    """
+    from scipy.optimize import nnls
+    slack = b_ub - A_ub.dot(x)
+    active = np.flatnonzero(slack <= tol*(1 + np.abs(b_ub)))
+    duals = np.zeros(len(b_ub))
+    if len(active):
+        duals[active], _ = nnls(A_ub[active].T, -cost)
+    return duals
@@ -64,6 +64,10 @@ def imize_fn(path=None, clearfiles=True):
         filename: str
             Filename prefix for temporary files
 
+        Monomial constraints, including both halves of monomial equalities,
+        are passed as one-term posynomials, since EXPOPT's input has no
+        separate block of linear constraints.
+
         Returns
         -------
         dict
@@ -142,6 +142,10 @@ def imize(c, A, p_idxs, *args, **kwargs):
     p_idxs: ints array of shape n
         Posynomial index of each monomial
 
+    Monomial constraints, including both halves of monomial equalities,
+    are passed as one-term posynomials, since EXPOPT's input has no
+    separate block of linear constraints.
+
     Returns
     -------
     dict
@@ -0,0 +1,511 @@
+"""Implement the CompiledGeometricProgram class"""
+from collections import OrderedDict
+import numpy as np
+from .geometric_program import (GeometricProgram, LazyResult, genA,
+                                iter_constraints)
+from .program_cache import ProgramCache, structure_key
+from .shared_program import SharedProgram
+from .kkt import KKTSystem
+from ._analytic import degree_of_difficulty
+from .nomials.substitution import parse_subs
+from .small_classes import Numbers, HashVector, CootMatrix
+from .keydict import KeySet, KeyDict
+from .small_scripts import mag
+from . import DimensionalityError
+
+
+class CompiledGeometricProgram(GeometricProgram):
+    """A GeometricProgram whose structure is compiled once for many solves.
+
+    Numeric constants are kept symbolic during compilation, so that the
+    program's A matrix, index maps and sensitivity maps don't depend on their
+    values. The log of the coefficient vector is then an affine function of
+    the log of those constants (the program's "parameters"):
+
+        log(cs) = log(cs_0) + P * log(parameters)
+
+    and `update()` only has to recompute the entries of cs whose monomials
+    contain the changed parameters before the next `solve()`.
+
+    Arguments
+    ---------
+    cost : Posynomial
+        Posynomial to minimize when solving
+    constraints : ConstraintSet
+        Constraints to maintain when solving
+    substitutions : dict (optional)
+        Substitutions; positive numeric ones become parameters.
+    verbosity : int (optional)
+        If verbosity is greater than zero, warns about missing bounds
+        on creation.
+    parameters : iterable (optional)
+        Keys of the only substitutions which should become parameters;
+        all others are substituted during compilation and can't be updated.
+    cache : str or ProgramCache (optional)
+        If given, the program's arrays are loaded from this cache (a
+        directory) if a program of the same structure has been compiled
+        into it before, skipping compilation; otherwise the program is
+        compiled and its arrays are saved there. See gpkit.program_cache.
+
+    Attributes
+    ----------
+    parameters : list of VarKeys
+        The parameters, in the column order of P
+    from_cache : bool
+        True if the program was loaded from a cache. Such programs have no
+        symbolic exps, and their results have no constraint sensitivities;
+        the sensitivities of their constants (all of which are parameters
+        or were substituted when the entry was made) come from P.
+
+    Examples
+    --------
+    >>> cgp = m.compile()   # or CompiledGeometricProgram(m.cost, m, m.subs)
+    >>> cgp.update({x_min: 3})
+    >>> cgp.solve()
+    """
+
+    def __init__(self, cost, constraints, substitutions=None, verbosity=1,
+                 parameters=None, cache=None):
+        # pylint: disable=too-many-locals,non-parent-init-called
+        substitutions = substitutions if substitutions else {}
+        varkeys = KeySet(cost.varlocs)
+        varkeys.update(constraints.varkeys)
+        constants, _, _ = parse_subs(varkeys, substitutions)
+        if parameters is not None:
+            allowed = KeySet()
+            for key in parameters:
+                allowed.update({vk: None for vk in varkeys[key]})
+        params = {}
+        for key, value in constants.items():
+            if parameters is not None and key not in allowed:
+                continue
+            if isinstance(value, Numbers) and mag(value) > 0:
+                params[key] = value
+
+        for key in substitutions:
+            if getattr(key, "key", key) not in varkeys.keymap and verbosity > 0:
+                print("Warning: %s has a substitution but was not found in"
+                      " the cost or any constraints." % key)
+
+        self.from_cache = False
+        cachekey = None
+        if cache is not None:
+            if not isinstance(cache, ProgramCache):
+                cache = ProgramCache(cache)
+            cachekey, keyorder = structure_key(cost, constraints, varkeys,
+                                               constants, params)
+            arrays = cache.load(cachekey) if cachekey else None
+            if arrays is not None:
+                self._init_from_arrays(cost, constraints, constants, params,
+                                       arrays, keyorder, verbosity)
+                self._hashvalue = hash(cachekey)
+                return
+
+        ## Compile with the parameters left as variables
+        for constr in iter_constraints(constraints):
+            if "pmap" in constr.__dict__:
+                del constr.pmap  # don't keep pmaps from a previous program
+        compilesubs = {k: v for k, v in constants.items() if k not in params}
+        GeometricProgram.__init__(self, cost, constraints, compilesubs,
+                                  verbosity=0)
+
+        # the substitutions dict is shared with every constraint, so adding
+        # the parameters here lets constraints report their sensitivities
+        self.substitutions.update(params)
+        # the cost without parameters, for _compile_result's varloc checks
+        self.posynomials[0] = cost.sub(self.substitutions)
+
+        ## Split A into free-variable and parameter columns
+        varlist = list(self.varlocs)  # in the column order of self.A
+        param_cols = [j for j, vk in enumerate(varlist) if vk in params]
+        self.parameters = [varlist[j] for j in param_cols]
+        self._P = self.A.tocsc()[:, param_cols]
+        self._logcs0 = np.log(self.cs)
+        self._logparams = np.array([np.log(self._magnitude(vk, params[vk]))
+                                    for vk in self.parameters])
+        self._paramidxs = {vk: j for j, vk in enumerate(self.parameters)}
+        self._paramkeys = KeySet(self._paramidxs)
+
+        exps = tuple(HashVector({vk: x for vk, x in exp.items()
+                                 if vk not in params}) for exp in self.exps)
+        varlocs = {vk: locs for vk, locs in self.varlocs.items()
+                   if vk not in params}
+        self.exps, self.varlocs = exps, varlocs
+        self._varkeys, self._values = None, None
+        self.A, self.missingbounds = genA(self.exps, self.varlocs)
+        if verbosity > 0:
+            for var, bound in sorted(self.missingbounds.items()):
+                print("%s has no %s bound" % (var, bound))
+        self._update_cs()
+        if cachekey:
+            cache.save(cachekey, self._arrays(keyorder))
+
+    def _arrays(self, keyorder):
+        "Returns the arrays of a cache entry for this program."
+        idxs = {key: i for i, key in enumerate(keyorder)}
+        P = self._P.tocsc()
+        return dict(row=self.A.row, col=self.A.col, data=self.A.data,
+                    shape=self.A.shape, k=self.k, logcs0=self._logcs0,
+                    P_data=P.data, P_indices=P.indices, P_indptr=P.indptr,
+                    P_shape=P.shape,
+                    freevariables=[idxs[key] for key in self.varlocs],
+                    parameters=[idxs[key] for key in self.parameters])
+
+    def _init_from_arrays(self, cost, constraints, constants, params,
+                          arrays, keyorder, verbosity):
+        "Sets up the program from a cache entry's arrays, without compiling."
+        # pylint: disable=too-many-arguments,attribute-defined-outside-init
+        self.cost, self.constraints = cost, constraints
+        self.substitutions = dict(constants)
+        self.posynomials = [cost.sub(self.substitutions)]
+        self.unusedsubkeys = set()
+        freevariables = [keyorder[i] for i in arrays["freevariables"]]
+        parameters = [keyorder[i] for i in arrays["parameters"]]
+        logparams = [np.log(self._magnitude(vk, params[vk]))
+                     for vk in parameters]
+        self._load_arrays(arrays, freevariables, parameters, logparams,
+                          verbosity)
+        self.from_cache = True
+
+    def _load_arrays(self, arrays, freevariables, parameters, logparams,
+                     verbosity):
+        """Sets the program's arrays, index maps and parameters from arrays
+
+        `arrays` are those of a cache entry (or of a SharedProgram); the
+        program won't have any symbolic exps or constraint state.
+        """
+        # pylint: disable=too-many-arguments,attribute-defined-outside-init
+        from scipy.sparse import csc_matrix
+        self.constr_idxs, self._constraint_state = [], []
+        self.k = arrays["k"].tolist()
+        self.p_idxs = np.repeat(np.arange(len(self.k)), self.k)
+        self.m_idxs = np.split(np.arange(len(self.p_idxs)),
+                               np.cumsum(self.k[:-1]))
+        self.A = CootMatrix(arrays["row"], arrays["col"], arrays["data"])
+        self.A.shape = arrays["shape"].tolist()
+        nonzero = self.A.data != 0  # constant monomials are zeros in column 0
+        rows, cols = self.A.row[nonzero], self.A.col[nonzero]
+        bycol = np.argsort(cols, kind="mergesort")
+        locs = np.split(rows[bycol], np.searchsorted(
+            cols[bycol], np.arange(1, len(freevariables))))
+        self.varlocs = OrderedDict((var, varlocs.tolist()) for var, varlocs
+                                   in zip(freevariables, locs))
+        self.missingbounds = {}
+        signs = [np.bincount(cols[sign*self.A.data[nonzero] > 0],
+                             minlength=len(freevariables)) > 0
+                 for sign in (1, -1)]
+        for var, has_pos, has_neg in zip(freevariables, *signs):
+            if not (has_pos and has_neg):
+                self.missingbounds[var] = "lower" if has_pos else "upper"
+        if verbosity > 0:
+            for var, bound in sorted(self.missingbounds.items()):
+                print("%s has no %s bound" % (var, bound))
+        self.exps, self.units, self.any_nonpositive_cs = None, None, False
+        self._varkeys, self._values = None, None
+
+        self.parameters = list(parameters)
+        self._P = csc_matrix((arrays["P_data"], arrays["P_indices"],
+                              arrays["P_indptr"]),
+                             shape=tuple(arrays["P_shape"]))
+        self._logcs0 = arrays["logcs0"]
+        self._logparams = np.array(logparams, dtype=float)
+        self._paramidxs = {vk: j for j, vk in enumerate(self.parameters)}
+        self._paramkeys = KeySet(self._paramidxs)
+        self._update_cs()
+
+        self.result = None
+        self.solver_log = None
+        self.solver_out = None
+        self.presolved = None
+        self.scaled = None
+        self.blocks = None
+        self.bounds = None
+        self._logbounds = None
+        # of the program's own arrays, until solve() presolves them
+        self.degree_of_difficulty = degree_of_difficulty(self.cs, self.A)
+        self.from_cache = False
+
+    def _magnitude(self, key, value):
+        "Returns value's magnitude in the units of key"
+        if hasattr(value, "units") and hasattr(value, "to"):
+            units = getattr(key.units, "units", "dimensionless")
+            try:
+                value = value.to(units)
+            except DimensionalityError:
+                raise ValueError("the units of '%s' are not compatible with"
+                                 " those of '%s' [%s]." % (value, key, units))
+            value = value.magnitude
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = None
+        if value is None or not value > 0:
+            raise ValueError("parameter %s of a CompiledGeometricProgram"
+                             " must be a positive number, not %s."
+                             % (key, value))
+        return value
+
+    def _update_cs(self):
+        "Recomputes cs from the current parameter values."
+        self._logcs = self._logcs0 + self._P.dot(self._logparams)
+        self.cs = np.exp(self._logcs)
+
+    def update(self, substitutions):
+        """Changes parameter values, recomputing only the affected coefficients
+
+        The work done is proportional to the number of monomials containing
+        the changed parameters. If any substitution is invalid nothing is
+        changed.
+
+        Arguments
+        ---------
+        substitutions : dict
+            New values for some of this program's parameters. Keys can be
+            anything that identifies a parameter (strings, Variables, ...).
+
+        Raises
+        ------
+        ValueError, if a key is not a parameter or a value isn't positive
+        """
+        constants, logparams = self._parse_parameters(substitutions)
+        for j, logparam in logparams.items():
+            start, end = self._P.indptr[j], self._P.indptr[j+1]
+            rows = self._P.indices[start:end]
+            delta = logparam - self._logparams[j]
+            self._logcs[rows] += self._P.data[start:end]*delta
+            self.cs[rows] = np.exp(self._logcs[rows])
+            self._logparams[j] = logparam
+        self.substitutions.update(constants)
+        self.result, self.solver_out = None, None
+
+    def _parse_parameters(self, substitutions):
+        """Returns substitutions' parameter values, and their logs by column
+
+        Raises
+        ------
+        ValueError, if a key is not a parameter or a value isn't positive
+        """
+        for key in substitutions:
+            if getattr(key, "key", key) not in self._paramkeys.keymap:
+                raise ValueError("%s is not a parameter of this compiled"
+                                 " program; compile a new one to change it."
+                                 % (key,))
+        constants, sweep, linkedsweep = parse_subs(self._paramkeys,
+                                                   substitutions)
+        if sweep or linkedsweep:
+            raise ValueError("CompiledGeometricPrograms cannot be swept;"
+                             " call update() once for each point instead.")
+        logparams = {self._paramidxs[key]: np.log(self._magnitude(key, value))
+                     for key, value in constants.items()}
+        return constants, logparams
+
+    def solve(self, solver=None, verbosity=1, *args, **kwargs):
+        """Solves the program; see GeometricProgram.solve
+
+        Arguments
+        ---------
+        curvature : bool or iterable (optional)
+            If True, or some of the parameters, the result's sensitivities
+            also have a "curvature" item: the second derivatives of the log
+            cost with respect to the log of those parameters (by default,
+            all of them), from `cost_hessian()`.
+        parametric : bool (optional)
+            If True, the result's sensitivities also have a "parametric"
+            item: d(log x)/d(log p) for each free variable x and parameter
+            p, from `variable_sensitivities()`.
+        """
+        curvature = kwargs.pop("curvature", False)
+        parametric = kwargs.pop("parametric", False)
+        result = GeometricProgram.solve(self, solver, verbosity,
+                                        *args, **kwargs)
+        if curvature is not False and curvature is not None:
+            parameters = None if curvature is True else curvature
+            result["sensitivities"]["curvature"] = \
+                self.cost_hessian(parameters, result)
+        if parametric:
+            result["sensitivities"]["parametric"] = \
+                self.variable_sensitivities(result)
+        return result
+
+    def share(self):
+        """Returns a SharedProgram of this program's arrays
+
+        See gpkit.shared_program; the SharedProgram should be closed when
+        it's no longer needed.
+        """
+        return SharedProgram(self)
+
+    def solve_many(self, substitutions, processes=None, solver=None,
+                   skipfailures=False, shared=None, **kwargs):
+        """Solves the program for each of a list of parameter values at once
+
+        The program's arrays are put in shared memory (see `share()`),
+        which a pool of worker processes attaches to, so that each solve
+        only sends the worker the values of the parameters. This program's
+        parameters are left as they were.
+
+        Arguments
+        ---------
+        substitutions : list of dicts
+            New values for some of this program's parameters, as for
+            `update()`, for each solve
+        processes : int (optional)
+            Number of worker processes; by default, the number of CPUs.
+        solver : str (optional)
+            As for `solve()`; has to be the name of a solver.
+        skipfailures : bool (optional)
+            If True, the result of each solve which fails is None;
+            otherwise a RuntimeWarning is raised.
+        shared : SharedProgram (optional)
+            This program's SharedProgram, if it's already been made
+        **kwargs :
+            Passed to each worker's `solve()`.
+
+        Returns
+        -------
+        list of results, one for each dict of substitutions
+        """
+        points = [self._parse_parameters(subs) for subs in substitutions]
+        tasks = []
+        for _, logparams in points:
+            task = self._logparams.copy()
+            for j, logparam in logparams.items():
+                task[j] = logparam
+            tasks.append(task)
+        shared_ = shared if shared else self.share()
+        try:
+            outs = shared_.solve(tasks, processes, solver, **kwargs)
+        finally:
+            if not shared:
+                shared_.close()
+        # results copy the substitutions when made, so set them for each
+        initial = {key: self.substitutions[key] for key in self.parameters}
+        results = []
+        for (constants, _), out in zip(points, outs):
+            if isinstance(out, dict):
+                self.substitutions.update(initial)
+                self.substitutions.update(constants)
+                results.append(self._compile_result(out))
+            elif skipfailures:
+                results.append(None)
+            else:
+                self.substitutions.update(initial)
+                raise RuntimeWarning("solve %i of solve_many failed: %s"
+                                     % (len(results), out))
+        self.substitutions.update(initial)
+        return results
+
+    def variable_sensitivities(self, result=None, tol=1e-6):
+        """Returns d(log x)/d(log p) for each free variable x and parameter p
+
+        These come from one factorization of the program's KKT system at
+        the solution (see gpkit.kkt), instead of a re-solve per parameter.
+        They're local: they hold while the same constraints stay active.
+
+        Arguments
+        ---------
+        result : dict (optional)
+            A result of this program; by default, that of its last solve.
+        tol : float (optional)
+            Constraints whose sensitivity is at most this are inactive.
+
+        Returns
+        -------
+        KeyDict of each free variable's KeyDict of each parameter's
+        sensitivity, e.g. sens[x][p]
+
+        Raises
+        ------
+        ValueError, if there's no result or the KKT system is singular
+        """
+        kkt = self._kkt_system(result, tol)
+        return KeyDict((var, KeyDict(zip(self.parameters, row)))
+                       for var, row in zip(self.varlocs, kkt.dprimal))
+
+    def cost_hessian(self, parameters=None, result=None, tol=1e-6):
+        """Returns d^2(log cost)/d(log p_i)d(log p_j) for pairs of parameters
+
+        The derivatives of the constants' sensitivities (the first-order
+        d(log cost)/d(log p) of result["sensitivities"]["constants"]),
+        i.e. how fast each of those tradeoffs changes. With L the program's
+        Lagrangian and J the gradients of its active constraints, they are
+
+            L_qq + L_qy dy/dq + J_q^T dla/dq
+
+        from one factorization of the KKT system at the solution (see
+        gpkit.kkt), which is only made for the chosen parameters.
+
+        Arguments
+        ---------
+        parameters : iterable (optional)
+            Keys of the parameters to differentiate with respect to; by
+            default, all of them.
+        result, tol :
+            As for `variable_sensitivities()`
+
+        Returns
+        -------
+        KeyDict of each parameter's KeyDict of the second derivatives of
+        the log cost with respect to it and each parameter, e.g. hess[p][q]
+
+        Raises
+        ------
+        ValueError, if there's no result, a key isn't a parameter or the
+        KKT system is singular
+        """
+        if parameters is None:
+            columns = list(range(len(self.parameters)))
+        else:
+            columns = set()
+            for key in parameters:
+                if getattr(key, "key", key) not in self._paramkeys.keymap:
+                    raise ValueError("%s is not a parameter of this compiled"
+                                     " program." % (key,))
+                columns.update(self._paramidxs[vk]
+                               for vk in self._paramkeys[key])
+            columns = sorted(columns)
+        kkt = self._kkt_system(result, tol, columns)
+        n_vars = len(self.varlocs)
+        hessian = kkt.hessian.tocsr()
+        curvature = (hessian[n_vars:, n_vars:].toarray()
+                     + hessian[n_vars:, :n_vars].dot(kkt.dprimal)
+                     + kkt.jacobian[:, n_vars:].T.dot(kkt.dla))
+        curvature = (curvature + curvature.T)/2  # only symmetric to rounding
+        keys = [self.parameters[j] for j in columns]
+        return KeyDict((key, KeyDict(zip(keys, row)))
+                       for key, row in zip(keys, curvature))
+
+    def _kkt_system(self, result, tol, columns=None):
+        """Returns the KKTSystem of result (by default, self.result), in the
+        parameters of the given columns of P (by default, all of them)"""
+        result = self.result if result is None else result
+        if result is None:
+            raise ValueError("this program has no solution to differentiate;"
+                             " solve it first.")
+        nu, la = result["sensitivities"]["nu"], result["sensitivities"]["la"]
+        P = self._P if columns is None else self._P[:, columns]
+        return KKTSystem(self.A, P, self.p_idxs, nu, la, tol)
+
+    def _compile_result(self, solver_out):
+        "Adds the objective, which may depend on parameters, to the result."
+        if "objective" not in solver_out:
+            # the cost may have parameters, so evaluate it from the arrays
+            m_0 = self.m_idxs[0]
+            Ax = self.A.tocsr()[m_0].dot(np.ravel(solver_out["primal"]))
+            solver_out["objective"] = np.dot(self.cs[m_0], np.exp(Ax))
+        if self.from_cache:
+            assert len(self.varlocs) == len(solver_out["primal"])
+            return _CachedResult(self, solver_out)
+        return GeometricProgram._compile_result(self, solver_out)
+
+
+class _CachedResult(LazyResult):
+    "The result of a program loaded from a cache, which has only arrays."
+
+    def _build_sensitivities(self):
+        "Returns the dual solution and the sensitivities of the parameters."
+        program = self.program
+        senss = program._P.T.dot(self.nu)  # pylint: disable=protected-access
+        return {"constraints": {}, "nu": self.nu, "la": self.la,
+                "constants": KeyDict(zip(program.parameters, senss))}
+
@@ -5,6 +5,7 @@ from ..varkey import VarKey
 from ..nomials import Monomial
 from .prog_factories import _progify_fctry, _solve_fctry
 from ..geometric_program import GeometricProgram
+from ..compiled_program import CompiledGeometricProgram
 from .signomial_program import SignomialProgram
 from .linked import LinkedConstraintSet
 from ..keydict import KeyDict
@@ -43,6 +44,7 @@ class Model(CostedConstraintSet):
     num = None
     program = None
     solution = None
+    _compiled = None
 
     def __init__(self, cost=None, constraints=None,
                  substitutions=None, name=None):
@@ -65,10 +67,17 @@ class Model(CostedConstraintSet):
             self._add_modelname_tovars(self.name, self.num)
 
     gp = _progify_fctry(GeometricProgram)
+    compile = _progify_fctry(CompiledGeometricProgram)
     sp = _progify_fctry(SignomialProgram)
-    solve = _solve_fctry(_progify_fctry(GeometricProgram, "solve"))
+    solve = _solve_fctry(_progify_fctry(GeometricProgram, "solve",
+                                        reuse=True))
     localsolve = _solve_fctry(_progify_fctry(SignomialProgram, "localsolve"))
 
+    def subinplace(self, subs, value=None):
+        "Substitutes in place, discarding any compiled program."
+        self._compiled = None
+        CostedConstraintSet.subinplace(self, subs, value)
+
     def link(self, other, include_only=None, exclude=None):
         "Connects this model with a set of constraints"
         lc = LinkedConstraintSet([self, other], include_only, exclude)
@@ -5,6 +5,9 @@ from ..nomials.substitution import parse_subs
 from ..solution_array import SolutionArray
 from ..keydict import KeyDict
 from ..varkey import VarKey
+from ..small_classes import Numbers
+from ..small_scripts import mag
+from ..compiled_program import CompiledGeometricProgram
 
 try:
     from ipyparallel import Client
@@ -17,7 +20,7 @@ except (ImportError, IOError, AssertionError):
     POOL = None
 
 
-def _progify_fctry(program, return_attr=None):
+def _progify_fctry(program, return_attr=None, reuse=False):
     "Generates function that returns a program() and optionally an attribute."
     def programify(self, verbosity=1, substitutions=None, **kwargs):
         """Return program version of self
@@ -28,10 +31,17 @@ def _progify_fctry(program, return_attr=None):
             Class to return, e.g. GeometricProgram or SignomialProgram
         return_attr: string
             attribute to return in addition to the program
+        reuse: bool
+            if True and self.substitutions are used, the previous program
+            is patched when only the values of some constants have changed
         """
+        prog = None
         if not substitutions:
             substitutions = self.substitutions
-        prog = program(self.cost, self, substitutions, verbosity, **kwargs)
+            if reuse:
+                prog = _reused_program(self, verbosity, **kwargs)
+        if prog is None:
+            prog = program(self.cost, self, substitutions, verbosity, **kwargs)
         if return_attr:
             return prog, getattr(prog, return_attr)
         else:
@@ -39,6 +49,76 @@ def _progify_fctry(program, return_attr=None):
     return programify
 
 
+def _reused_program(model, verbosity, **kwargs):
+    """Returns a CompiledGeometricProgram for model if that saves work
+
+    Only possible when the model's substitutions track their changes
+    (see TrackedKeyDict). The first time some constants are changed between
+    solves the model is compiled; after that, as long as the model's
+    structure stays the same and only positive constants change, the
+    compiled program's A matrix is kept and only the coefficients of the
+    monomials containing those constants are recomputed. The structure is
+    the same if the cost and every (possibly nested) constraint are the
+    same objects as when the program was compiled.
+
+    Returns None if a new program should be built instead.
+    """
+    # pylint: disable=protected-access
+    subs = model.substitutions
+    changed = getattr(subs, "changed", None)
+    if changed is None:
+        return None
+    prog = None
+    structure = tuple(model.flat(constraintsets=True))
+    if model._compiled is not None:
+        prog, cost, compiledsubs, compiledstructure = model._compiled
+        if cost is not model.cost or compiledsubs is not subs \
+                or not _same_objects(structure, compiledstructure):
+            prog = None
+    newsubs = {key: subs[key] for key in changed if key in subs}
+    if len(newsubs) != len(changed):
+        prog = None  # a substitution was deleted
+    elif prog is not None:
+        try:
+            prog.update(newsubs)
+        except ValueError:
+            prog = None
+    elif changed and model.program is not None \
+            and _all_positive(newsubs.values()):
+        prog = CompiledGeometricProgram(model.cost, model, subs,
+                                        verbosity, **kwargs)
+    model._compiled = None
+    if prog is not None:
+        model._compiled = (prog, model.cost, subs, structure)
+    changed.clear()
+    return prog
+
+
+def _same_objects(these, those):
+    """True if two sequences hold the very same objects, in the same order
+
+    Used to tell if any of a model's constraints was replaced (e.g. with
+    `m[0] = (x >= 2*x_min)`) since it was compiled; since the compiled
+    sequence keeps its constraints alive, their ids can't be reused.
+    """
+    return (len(these) == len(those) and
+            all(this is that for this, that in zip(these, those)))
+
+
+def _all_positive(values):
+    "True if every value is a positive number or array of them."
+    for value in values:
+        value = mag(value)
+        if not isinstance(value, Numbers):
+            try:
+                value = np.array(value, dtype=float)
+            except (TypeError, ValueError):
+                return False
+        if not np.all(value > 0):
+            return False
+    return True
+
+
 def _solve_fctry(genfunction):
     "Returns function for making/solving/sweeping a program."
     def solvefn(self, solver=None, verbosity=2, skipsweepfailures=False,
@@ -54,7 +134,20 @@ def _solve_fctry(genfunction):
              Is decremented by one and then passed to programs.
          skipsweepfailures : bool (optional)
              If True, when a solve errors during a sweep, skip it.
+         curvature : bool or iterable (optional)
+             If True, or some constants, the model is solved as a
+             CompiledGeometricProgram of those constants (by default, all
+             positive ones), and the solution's sensitivities also have a
+             "curvature" item: see CompiledGeometricProgram.cost_hessian.
+         parametric : bool (optional)
+             If True, the model is likewise solved as a compiled program,
+             and the solution's sensitivities also have a "parametric"
+             item of d(log x)/d(log p) for each free variable x and
+             parameter p: see
+             CompiledGeometricProgram.variable_sensitivities.
          *args, **kwargs : Passed to solver
+             (and `check`, to GeometricProgram.solve; "full", "cheap" or
+             "off" to choose how thoroughly each solution is verified)
 
          Returns
          -------
@@ -69,14 +162,33 @@ def _solve_fctry(genfunction):
         constants, sweep, linkedsweep = parse_subs(self.varkeys,
                                                    self.substitutions)
         solution = SolutionArray()
+        # sensitivities which are only found for compiled programs
+        compiledsens = {}
+        for key in ("curvature", "parametric"):
+            value = kwargs.pop(key, None)
+            if value is not None and value is not False:
+                compiledsens[key] = value
 
         # NOTE: SIDE EFFECTS: self.program is set below
-        if sweep:
+        if sweep and compiledsens:
+            raise ValueError("%s is not found during sweeps; solve a"
+                             " compiled program at each point instead."
+                             % " or ".join(sorted(compiledsens)))
+        elif sweep:
             run_sweep(genfunction, self, solution, skipsweepfailures,
                       constants, sweep, linkedsweep,
                       solver, verbosity-1, *args, **kwargs)
         else:
-            self.program, solvefn = genfunction(self, verbosity-1)
+            if compiledsens:
+                # derivatives need the constants left as parameters
+                curvature = compiledsens.get("curvature", True)
+                parameters = None if curvature is True else curvature
+                self.program = self.compile(verbosity-1,
+                                            parameters=parameters)
+                solvefn = self.program.solve
+                kwargs.update(compiledsens)
+            else:
+                self.program, solvefn = genfunction(self, verbosity-1)
             result = solvefn(solver, verbosity-1, *args, **kwargs)
             solution.append(result)
         solution.program = self.program
@@ -1,6 +1,6 @@
 "Implements ConstraintSet"
 from ..small_classes import HashVector
-from ..keydict import KeySet, KeyDict
+from ..keydict import KeySet, TrackedKeyDict
 from ..small_scripts import try_str_without
 from ..repr_conventions import _str, _repr, _repr_latex_
 
@@ -21,8 +21,8 @@ class ConstraintSet(list):
         else:
             # grab the substitutions dict from the top constraintset
             subs.update(constraints.substitutions)  # pylint: disable=no-member
-        self.substitutions = KeyDict.with_keys(self.varkeys,
-                                               self._iter_subs(subs))
+        self.substitutions = TrackedKeyDict.with_keys(self.varkeys,
+                                                      self._iter_subs(subs))
         # initializations for attributes used elsewhere
         self.posymap = []
 
@@ -141,6 +141,13 @@ class ConstraintSet(list):
             posylist.extend(posys)
         return posylist
 
+    def compile_evaluator(self):
+        """Returns a NomialEvaluator of this set's posynomials <= 1 (as
+        given by `as_posyslt1()`, with this set's substitutions), for
+        evaluating their values and violations at many points at once"""
+        from ..evaluator import NomialEvaluator
+        return NomialEvaluator(self.as_posyslt1())
+
     def sens_from_dual(self, las, nus):
         """Computes constraint and variable sensitivities from dual solution
 
@@ -0,0 +1,146 @@
+"""Decomposes a GeometricProgram into independent blocks, which can be
+solved separately (and in parallel), and stitches their solutions together
+
+Two constraints are in the same block if they share a free variable, as are
+the variables of each of the cost's monomials. If the cost is separable,
+F = sum(f_b), over blocks, and each block's cost f_b only depends on its
+own variables, then minimizing each f_b subject to its block's constraints
+minimizes F. The duals of the full program are those of each block's,
+weighted by f_b/F.
+"""
+import sys
+import numpy as np
+from .small_classes import CootMatrix, SolverLog
+from .segment_ops import segment_logsumexp
+
+
+class Block(object):
+    """The arrays of one independent block of a GeometricProgram
+
+    Attributes
+    ----------
+    cs, A, p_idxs, k :
+        The block's arrays, to be passed to a solver.
+    rows, cols : int arrays
+        Indices of the block's monomials and variables in the full arrays
+    """
+
+    def __init__(self, csr, cs, p_idxs, rows, cols):
+        self.rows, self.cols = rows, cols
+        self.cs = cs[rows]
+        posys, self.p_idxs = np.unique(p_idxs[rows], return_inverse=True)
+        self.k = np.bincount(self.p_idxs, minlength=len(posys)).tolist()
+        coo = csr[rows][:, cols].tocoo()
+        self.A = CootMatrix(coo.row, coo.col, coo.data)
+        self.A.shape = [len(rows), len(cols)]
+
+    def log_cost(self, primal):
+        "Returns the log of the block's cost at primal."
+        logmonos = np.log(self.cs) + self.A.dot(primal)
+        return segment_logsumexp(logmonos, self.p_idxs, len(self.k))[0]
+
+
+def find_blocks(cs, A, p_idxs):
+    """Finds the independent blocks of a GeometricProgram's arrays
+
+    Components without any of the cost's monomials have no effect on the
+    cost; they're added to the first block, along with any monomials that
+    have no variables.
+
+    Returns
+    -------
+    list of Blocks, or None if there are fewer than two
+    """
+    from scipy.sparse import coo_matrix, bmat
+    from scipy.sparse.csgraph import connected_components
+    csr = A.tocsr()
+    n_monos, n_vars = csr.shape
+    n_cost = np.sum(p_idxs == 0)
+    # each cost monomial and each constraint posynomial is a group,
+    # connecting its variables in a bipartite graph of groups and variables
+    groups = np.where(p_idxs == 0, np.arange(n_monos), p_idxs + n_cost - 1)
+    n_groups = n_cost + p_idxs[-1]
+    coo = csr.tocoo()
+    nonzero = coo.data != 0
+    incidence = coo_matrix((np.ones(nonzero.sum()),
+                            (groups[coo.row[nonzero]], coo.col[nonzero])),
+                           shape=(n_groups, n_vars))
+    graph = bmat([[None, incidence], [incidence.T, None]])
+    _, labels = connected_components(graph, directed=False)
+    group_labels, var_labels = labels[:n_groups], labels[n_groups:]
+    has_vars = np.bincount(coo.row[nonzero], minlength=n_monos) > 0
+    cost_labels = group_labels[:n_cost][has_vars[:n_cost]]
+    blocklabels = np.unique(cost_labels)
+    if len(blocklabels) < 2:
+        return None
+    # map each component to its block, sending the rest to the first
+    blockidx = np.zeros(labels.max() + 1, dtype=int)
+    blockidx[blocklabels] = np.arange(len(blocklabels))
+    row_blocks = blockidx[group_labels[groups]]
+    var_blocks = blockidx[var_labels]
+    return [Block(csr, cs, p_idxs, np.flatnonzero(row_blocks == b),
+                  np.flatnonzero(var_blocks == b))
+            for b in range(len(blocklabels))]
+
+
+def _solve_block(task):
+    "Solves one block in a worker process, returning its output and log."
+    from .geometric_program import get_solver
+    solver, cs, (row, col, data, shape), p_idxs, k, args, kwargs = task
+    A = CootMatrix(row, col, data)
+    A.shape = shape
+    solverfn, _ = get_solver(solver, *args, **kwargs)
+    original_stdout = sys.stdout
+    log = SolverLog()
+    try:
+        sys.stdout = log
+        solver_out = solverfn(c=cs, A=A, p_idxs=p_idxs, k=k, *args, **kwargs)
+    finally:
+        sys.stdout = original_stdout
+    return solver_out, list(log)
+
+
+def solve_blocks(solver, blocks, processes=None, *args, **kwargs):
+    """Solves each block with solver in a pool of processes
+
+    Arguments
+    ---------
+    solver : str or function
+        As for GeometricProgram.solve; functions have to be picklable.
+    blocks : list of Blocks
+    processes : int (optional)
+        Number of processes to use; by default, the number of CPUs.
+    *args, **kwargs :
+        Passed to solver constructor and solver function.
+
+    Returns
+    -------
+    list of (solver output, solver log) for each block
+    """
+    from multiprocessing import Pool
+    tasks = [(solver, block.cs, (block.A.row, block.A.col, block.A.data,
+                                 block.A.shape),
+              block.p_idxs, block.k, args, kwargs) for block in blocks]
+    pool = Pool(processes)
+    try:
+        return pool.map(_solve_block, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def stitch_blocks(blocks, outs, shape):
+    """Combines the solutions of each block into one of the full arrays
+
+    Each of outs has the "primal" and "nu" of its block, and shape is that
+    of the full A matrix.
+    """
+    primal, nu = np.zeros(shape[1]), np.zeros(shape[0])
+    log_costs = np.array([block.log_cost(out["primal"])
+                          for block, out in zip(blocks, outs)])
+    log_cost = np.logaddexp.reduce(log_costs)
+    for block, out, weight in zip(blocks, outs, np.exp(log_costs - log_cost)):
+        primal[block.cols] = out["primal"]
+        nu[block.rows] = weight*out["nu"]
+    return dict(status="optimal", primal=primal, nu=nu,
+                objective=np.exp(log_cost))
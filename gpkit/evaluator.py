@@ -0,0 +1,192 @@
+"""Evaluates nomials (and posynomial constraints) at many points at once
+
+Substituting a point into a nomial (e.g. with `sub` or `subsummag`) builds
+new nomials, which is slow when done for each of many candidate points.
+A NomialEvaluator instead keeps the arrays a GeometricProgram would: the
+log of the magnitude of each monomial's coefficient, the sign of each,
+a sparse matrix A of each monomial's exponents and the index of each
+monomial's nomial, so that for an array of points the log of every
+monomial at every point is
+
+    log|c| + log(x).dot(A.T)
+
+and each nomial's value and log-gradient follow from one vectorized
+logsumexp over the monomials of each nomial.
+"""
+import numpy as np
+from .nomials import NomialData
+from .keydict import KeySet
+from .small_scripts import mag
+
+
+class NomialEvaluator(object):
+    """Evaluates a list of nomials at many points at once
+
+    Values are the magnitudes of each nomial (in its own units) at points
+    given in the units of each variable. Usually made by
+    `Signomial.compile()` or `ConstraintSet.compile_evaluator()`.
+
+    Arguments
+    ---------
+    nomials : list of Signomials
+        The nomials to evaluate; any constants should be substituted first.
+
+    Attributes
+    ----------
+    varkeys : list of VarKeys
+        The variables, in the column order of points
+    logcs, signs : arrays
+        Log of the magnitude, and sign, of each monomial's coefficient
+    A : scipy.sparse.csr_matrix
+        Exponent of each variable (column) in each monomial (row)
+    p_idxs : int array
+        Index of each monomial's nomial
+    k : list of ints
+        Number of monomials in each nomial
+
+    Examples
+    --------
+    >>> ev = (x**2 + 3*y).compile()
+    >>> ev.values({x: [1, 2, 3], y: [1, 1, 2]})
+    array([[ 4.],
+           [ 7.],
+           [15.]])
+    """
+
+    def __init__(self, nomials):
+        from scipy.sparse import coo_matrix
+        nomials = list(nomials)
+        data = NomialData.fromnomials(nomials)
+        self.k = [len(nomial.cs) for nomial in nomials]
+        self.p_idxs = np.repeat(np.arange(len(self.k)), self.k)
+        self._starts = np.cumsum([0] + self.k[:-1])
+        self.varkeys = list(data.varlocs)
+        self._keyset = KeySet(data.varlocs)
+        rows, cols, exps = [], [], []
+        for j, var in enumerate(self.varkeys):
+            locs = data.varlocs[var]
+            rows.extend(locs)
+            cols.extend([j]*len(locs))
+            exps.extend(data.exps[i][var] for i in locs)
+        self.A = coo_matrix((exps, (rows, cols)),
+                            shape=(len(data.exps), len(self.varkeys))).tocsr()
+        cs = np.array(mag(data.cs), dtype=float)
+        self.signs = np.sign(cs)
+        with np.errstate(divide="ignore"):
+            self.logcs = np.log(np.abs(cs))
+        self._gradmap = None
+
+    def logpoints(self, points):
+        """Returns the log of points, as an (N_points x N_vars) array
+
+        Arguments
+        ---------
+        points : array or dict
+            Either an (N_points x N_vars) array of positive values, in the
+            column order of `varkeys`, or a dict whose keys are variables
+            (or anything identifying them, e.g. strings) and whose values
+            are each variable's N_points values. A VectorVariable's values
+            can be given as an (N_points x its shape) array.
+        """
+        if isinstance(points, dict):
+            columns = {}
+            for key, value in points.items():
+                value = np.asarray(mag(value), dtype=float)
+                for var in self._keyset[key]:
+                    idx = var.idx
+                    if idx and value.ndim > 1:
+                        columns[var] = value[(Ellipsis,) + tuple(idx)]
+                    else:
+                        columns[var] = value
+            missing = [var for var in self.varkeys if var not in columns]
+            if missing:
+                raise ValueError("no values were given for %s." % missing)
+            if self.varkeys:
+                points = np.column_stack([columns[var]
+                                          for var in self.varkeys])
+            else:
+                points = np.empty((1, 0))
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        if points.shape[1] != len(self.varkeys):
+            raise ValueError("points have %i columns, but there are %i"
+                             " variables." % (points.shape[1],
+                                              len(self.varkeys)))
+        with np.errstate(divide="ignore"):
+            return np.log(points)
+
+    def _shifted_terms(self, points):
+        """Returns the signed monomials at points, scaled by the largest
+        of each nomial's, the log of those scales, and the nomials' sums"""
+        logmonos = self.logcs + self.A.dot(self.logpoints(points).T).T
+        maxes = np.maximum.reduceat(logmonos, self._starts, axis=1)
+        maxes[~np.isfinite(maxes)] = 0
+        terms = self.signs*np.exp(logmonos - maxes[:, self.p_idxs])
+        return terms, maxes, np.add.reduceat(terms, self._starts, axis=1)
+
+    def logvalues(self, points):
+        """Returns the log of the magnitude of each nomial at each point
+
+        Returns
+        -------
+        (N_points x N_nomials) array
+        """
+        _, maxes, sums = self._shifted_terms(points)
+        with np.errstate(divide="ignore"):
+            return np.log(np.abs(sums)) + maxes
+
+    def values(self, points):
+        """Returns the value of each nomial at each point
+
+        Returns
+        -------
+        (N_points x N_nomials) array
+        """
+        _, maxes, sums = self._shifted_terms(points)
+        return sums*np.exp(maxes)
+
+    def loggradients(self, points):
+        """Returns the gradient of each nomial's log(|value|) with respect
+        to the log of each variable, at each point
+
+        For a posynomial these are the exponents of its monomials, weighted
+        by their shares of its value.
+
+        Returns
+        -------
+        (N_points x N_nomials x N_vars) array
+        """
+        terms, _, sums = self._shifted_terms(points)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = terms/sums[:, self.p_idxs]
+        if self._gradmap is None:
+            # maps each monomial's weight onto its nomial's row of gradients
+            from scipy.sparse import csr_matrix
+            coo = self.A.tocoo()
+            self._gradmap = csr_matrix(
+                (coo.data, (coo.row,
+                            self.p_idxs[coo.row]*len(self.varkeys) + coo.col)),
+                shape=(len(self.p_idxs), len(self.k)*len(self.varkeys)))
+        grads = self._gradmap.T.dot(weights.T).T
+        return grads.reshape((len(weights), len(self.k), len(self.varkeys)))
+
+    def violations(self, points):
+        """Returns how far each nomial is above 1, in log space, at each point
+
+        For the posynomials <= 1 of a ConstraintSet's evaluator this is how
+        much each constraint is violated: 0 where it's satisfied, and
+        log(value) where it isn't.
+
+        Returns
+        -------
+        (N_points x N_nomials) array
+        """
+        return np.maximum(self.logvalues(points), 0)
+
+    def feasible(self, points, tol=1e-8):
+        """Returns whether every nomial is at most 1 (+tol) at each point
+
+        Returns
+        -------
+        bool array of N_points
+        """
+        return np.all(self.logvalues(points) <= np.log1p(tol), axis=1)
@@ -1,11 +1,29 @@
 """Implement the GeometricProgram class"""
 import sys
+from contextlib import contextmanager
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # python 2
+    from collections import MutableMapping
+from collections import OrderedDict
 from time import time
 import numpy as np
 from .nomials import NomialData
+from .nomials.data import ExponentMatrix
 from .small_classes import CootMatrix, HashVector
 from .keydict import KeyDict
 from .small_classes import SolverLog
+from .small_scripts import mag
+from .segment_ops import segment_sum, segment_softmax, segment_logsumexp
+from .presolve import presolve_arrays, propagate_bounds
+from .scaling import scale_arrays
+from .decompose import find_blocks, solve_blocks, stitch_blocks
+from ._analytic import degree_of_difficulty
+from .parallel_compile import constraint_posys, parallel_posys
+from .oracles import Oracles
+from ._linprog import has_highs
+
+CHECK_LEVELS = ("full", "cheap", "off")
 
 
 class GeometricProgram(NomialData):
@@ -23,6 +41,9 @@ class GeometricProgram(NomialData):
     verbosity : int (optional)
         If verbosity is greater than zero, warns about missing bounds
         on creation.
+    processes : int or True (optional)
+        If given, constraints are converted to posynomials in that many
+        worker processes (one per CPU if True); see gpkit.parallel_compile.
 
     Attributes with side effects
     ----------------------------
@@ -40,7 +61,8 @@ class GeometricProgram(NomialData):
     >>> gp.solve()
     """
 
-    def __init__(self, cost, constraints, substitutions=None, verbosity=1):
+    def __init__(self, cost, constraints, substitutions=None, verbosity=1,
+                 processes=None):
         # pylint: disable=too-many-locals,super-init-not-called
         # note: any substitutions in constraints are ignored -- overwritten
         # by substitutions kwarg. This will be fixed when GeometricProgram
@@ -59,18 +81,52 @@ class GeometricProgram(NomialData):
             if verbosity > 0:
                 print ("Warning: %s has a substitution but was not found in"
                        " the cost or any constraints." % key)
-        for constraint in constraints:
-            constraint.substitutions = self.substitutions
-            try:
-                constr_posys = constraint.as_posyslt1()
-            except TypeError as err:
-                if err.message == ("SignomialInequality could not simplify to"
-                                   "a PosynomialInequality"):
-                    raise ValueError("GeometricPrograms cannot contain"
-                                     " SignomialInequalities: try forming your"
-                                     " program as SignomialProgram or calling"
-                                     " Model.localsolve().")
-                raise
+        merged = None
+        if processes:
+            merged = parallel_posys(list(constraints), self.substitutions,
+                                    processes)
+        if merged is not None:
+            self._init_from_merged(merged)
+        else:
+            self._init_from_posys(constraints)
+        if self.any_nonpositive_cs:
+            raise ValueError("GeometricPrograms cannot contain Signomials.")
+        if verbosity > 0:
+            for var, bound in sorted(self.missingbounds.items()):
+                print("%s has no %s bound" % (var, bound))
+
+        # the state result sensitivities depend on, which later programs of
+        # the same constraints may change; see _constraint_state_restored
+        self._constraint_state = [(constr, constr.substitutions,
+                                   getattr(constr, "pmap", None))
+                                  for constr in iter_constraints(constraints)]
+
+        # initialize attributes modified by internal methods
+        self.result = None
+        self.solver_log = None
+        self.solver_out = None
+        self.presolved = None
+        self.scaled = None
+        self.blocks = None
+        self.bounds = None
+        self._logbounds = None
+        # of the program's own arrays, until solve() presolves them
+        self.degree_of_difficulty = degree_of_difficulty(self.cs, self.A)
+
+    # pylint: disable=too-many-statements
+    def _init_from_posys(self, constraints):
+        "Sets up the program's arrays from each constraint's posynomials."
+        try:
+            posys = constraint_posys(constraints, self.substitutions)
+        except TypeError as err:
+            if err.message == ("SignomialInequality could not simplify to"
+                               "a PosynomialInequality"):
+                raise ValueError("GeometricPrograms cannot contain"
+                                 " SignomialInequalities: try forming your"
+                                 " program as SignomialProgram or calling"
+                                 " Model.localsolve().")
+            raise
+        for constraint, constr_posys in zip(constraints, posys):
             if not all(constr_posys):
                 raise ValueError("%s is an invalid constraint for a"
                                  " GeometricProgram" % constraint)
@@ -80,32 +136,42 @@ class GeometricProgram(NomialData):
 
         ## Init NomialData to create self.exps, self.cs and so on
         super(GeometricProgram, self).init_from_nomials(self.posynomials)
-        if self.any_nonpositive_cs:
-            raise ValueError("GeometricPrograms cannot contain Signomials.")
 
         ## Generate various maps into the posy- and monomials
         # k [j]: number of monomials (columns of F) present in each constraint
         self.k = [len(p.cs) for p in self.posynomials]
         # p_idxs [i]: posynomial index of each monomial
+        self.p_idxs = np.repeat(np.arange(len(self.k)), self.k)
         # m_idxs [i]: monomial indices of each posynomial
-        p_idxs = []
-        self.m_idxs = []
-        for i, p_len in enumerate(self.k):
-            self.m_idxs.append(list(range(len(p_idxs), len(p_idxs) + p_len)))
-            p_idxs += [i]*p_len
-        self.p_idxs = np.array(p_idxs)
+        self.m_idxs = np.split(np.arange(len(self.p_idxs)),
+                               np.cumsum(self.k[:-1]))
         # A [i, v]: sparse matrix of variable's powers in each monomial
         self.A, self.missingbounds = genA(self.exps, self.varlocs)
-        if verbosity > 0:
-            for var, bound in sorted(self.missingbounds.items()):
-                print("%s has no %s bound" % (var, bound))
 
-        # initialize attributes modified by internal methods
-        self.result = None
-        self.solver_log = None
-        self.solver_out = None
+    def _init_from_merged(self, merged):
+        """Sets up the program's arrays from the MergedPosys of its
+        constraints, without making their Posynomials"""
+        cost = self.posynomials[0]
+        start_idx = 1
+        for ps_added in merged.n_posys:
+            self.constr_idxs.append(range(start_idx, start_idx + ps_added))
+            start_idx += ps_added
+        self.posynomials = merged.posynomials(cost)
+        expmatrix = ExponentMatrix.concatenate([cost.expmatrix,
+                                                merged.expmatrix])
+        NomialData.__init__(self, expmatrix,
+                            np.hstack([mag(cost.cs), merged.cs]),
+                            simplify=False)
+        # in the order of A's columns
+        varlocs = expmatrix.to_varlocs()
+        self.varlocs = OrderedDict((key, varlocs[key])
+                                   for key in expmatrix.keys)
+        self.k = [len(cost.cs)] + merged.k.tolist()
+        self.p_idxs = np.repeat(np.arange(len(self.k)), self.k)
+        self.m_idxs = np.split(np.arange(len(self.p_idxs)),
+                               np.cumsum(self.k[:-1]))
+        self.A, self.missingbounds = genA_from_expmatrix(expmatrix)
 
-    # pylint: disable=too-many-statements
     def solve(self, solver=None, verbosity=1, *args, **kwargs):
         """Solves a GeometricProgram and returns the solution.
 
@@ -115,16 +181,45 @@ class GeometricProgram(NomialData):
             By default uses one of the solvers found during installation.
             If set to "mosek", "mosek_cli", or "cvxopt", uses that solver.
             If set to a function, passes that function cs, A, p_idxs, and k.
+            If None, every posynomial (including the cost) has a single
+            monomial and scipy's linprog has the HiGHS solver (scipy 1.7
+            or later), solves the program as a linear program in log space
+            with it (also available as "linprog"). If set to "analytic",
+            solves a program with zero degrees of difficulty from its dual,
+            falling back to the default solver if that point isn't optimal.
         verbosity : int (optional)
             If greater than 0, prints solver name and solve time.
+        check : str (optional)
+            How thoroughly to verify the solver's solution; one of "full"
+            (the default), "cheap" (only the cost and primal feasibility)
+            or "off". See check_solution().
+        presolve : bool (optional)
+            If True (by default it's False), the program's arrays are
+            presolved (see gpkit.presolve) before being passed to the
+            solver, and the solver's solution is mapped back to them
+            afterwards; constraints removed as redundant then have zero
+            duals and sensitivities. Bounds on the variables are also
+            propagated first (see self.bounds), and a RuntimeWarning is
+            raised without solving if they show the program to be
+            infeasible.
+        scale : bool (optional)
+            If True (by default it's False), the (presolved) arrays are
+            rescaled (see gpkit.scaling) before being passed to the solver,
+            and the solver's solution is unscaled afterwards.
+        parallel : bool or int (optional)
+            If True or a number of processes, the program is split into
+            blocks which share no variables (see gpkit.decompose); if
+            there are several, they're solved in parallel in a process
+            pool, and their solutions are stitched together.
         *args, **kwargs :
             Passed to solver constructor and solver function.
 
 
         Returns
         -------
-        result : dict
-            A dictionary containing the translated solver result; keys below.
+        result : LazyResult
+            A dict-like translation of the solver result, whose items (below)
+            are computed when first accessed.
 
             cost : float
                 The value of the objective at the solution.
@@ -136,51 +231,77 @@ class GeometricProgram(NomialData):
                 posynomials : array of floats
                     Each posynomials's dual variable value at the solution.
         """
-        def _get_solver(solver):
-            """Get the solverfn and solvername associated with solver"""
-            if solver is None:
-                from . import settings
-                solver = settings.get("default_solver", None)
-                if not solver:
-                    raise ValueError(
-                        "No solver was given; perhaps gpkit was not properly"
-                        " installed, or found no solvers during the"
-                        " installation process.")
-
-            if solver == "cvxopt":
-                from ._cvxopt import cvxoptimize_fn
-                solverfn = cvxoptimize_fn(*args, **kwargs)
-            elif solver == "mosek_cli":
-                from ._mosek import cli_expopt
-                solverfn = cli_expopt.imize_fn(*args, **kwargs)
-            elif solver == "mosek":
-                from ._mosek import expopt
-                solverfn = expopt.imize
-            elif hasattr(solver, "__call__"):
-                solverfn = solver
-                solver = solver.__name__
-            else:
-                raise ValueError("Unknown solver '%s'." % solver)
-            return solverfn, solver
-
-        solverfn, solvername = _get_solver(solver)
+        check = kwargs.pop("check", "full")
+        presolve = kwargs.pop("presolve", False)
+        scale = kwargs.pop("scale", False)
+        parallel = kwargs.pop("parallel", False)
+        if check not in CHECK_LEVELS:
+            raise ValueError("check must be one of %s, not '%s'."
+                             % (", ".join(CHECK_LEVELS), check))
+
+        self.presolved = self.bounds = self._logbounds = None
+        if presolve:
+            self._propagate_bounds()
+            self.presolved = presolve_arrays(self.cs, self.A, self.p_idxs,
+                                             self.k)
+        arrays = self.presolved if self.presolved else self
+        self.scaled = None
+        if scale:
+            bounds = self._logbounds if presolve else (None, None)
+            if self.presolved and presolve:
+                bounds = [np.delete(bound, self.presolved.eliminated)
+                          for bound in bounds]
+            self.scaled = scale_arrays(arrays.cs, arrays.A, arrays.p_idxs,
+                                       arrays.k, *bounds)
+        solved = self.scaled if self.scaled else arrays
+        self.blocks = None
+        if parallel:
+            self.blocks = find_blocks(solved.cs, solved.A, solved.p_idxs)
+        self.degree_of_difficulty = degree_of_difficulty(arrays.cs, arrays.A)
+        solvers = [solver]
+        if solver is None and max(arrays.k) == 1 and has_highs():
+            solvers = ["linprog"]
+        elif solver == "analytic":
+            # falls back to the default solver if the dual point isn't optimal
+            solvers.append(None)
 
         if verbosity > 0:
-            print("Using solver '%s'" % solvername)
             print("Solving for %i variables." % len(self.varlocs))
+            if self.presolved:
+                print(self.presolved.summary())
+            print("Degree of difficulty: %i" % self.degree_of_difficulty)
+            if self.blocks:
+                print("Solving %i independent blocks in parallel."
+                      % len(self.blocks))
             tic = time()
 
-        # NOTE: SIDE EFFECTS AS WE LOG SOLVER'S STDOUT AND OUTPUT
-        original_stdout = sys.stdout
-        self.solver_log = SolverLog(verbosity-1, original_stdout)
-        try:
-            sys.stdout = self.solver_log   # CAPTURED
-            solver_out = solverfn(c=self.cs, A=self.A, p_idxs=self.p_idxs,
-                                  k=self.k, *args, **kwargs)
-            self.solver_out = solver_out
-        finally:
-            sys.stdout = original_stdout
-         # STDOUT HAS BEEN RETURNED. ENDING SIDE EFFECTS.
+        for solver in solvers:
+            solverfn, solvername = get_solver(solver, *args, **kwargs)
+            if verbosity > 0:
+                print("Using solver '%s'" % solvername)
+            # NOTE: SIDE EFFECTS AS WE LOG SOLVER'S STDOUT AND OUTPUT
+            original_stdout = sys.stdout
+            self.solver_log = SolverLog(verbosity-1, original_stdout)
+            try:
+                sys.stdout = self.solver_log   # CAPTURED
+                if self.blocks:
+                    processes = None if parallel is True else parallel
+                    solver_out = self._solve_blocks(solver, processes,
+                                                    solved.A.shape,
+                                                    *args, **kwargs)
+                else:
+                    solver_out = solverfn(c=solved.cs, A=solved.A,
+                                          p_idxs=solved.p_idxs, k=solved.k,
+                                          *args, **kwargs)
+                self.solver_out = solver_out
+            finally:
+                sys.stdout = original_stdout
+             # STDOUT HAS BEEN RETURNED. ENDING SIDE EFFECTS.
+            if solver_out.get("status", None) in ["optimal", "OPTIMAL"]:
+                break
+            elif verbosity > 0 and solver != solvers[-1]:
+                print("Solver '%s' returned status '%s'."
+                      % (solvername, solver_out.get("status", None)))
 
         if verbosity > 0:
             soltime = time() - tic
@@ -197,6 +318,15 @@ class GeometricProgram(NomialData):
                 " feasibility-finding relaxation with model.feasibility()." %
                 (solvername, solver_out.get("status", None)))
 
+        if self.scaled:
+            self._generate_nula(solver_out, self.scaled)
+            self.scaled.unscale(solver_out)
+        if self.presolved:
+            self._generate_nula(solver_out, self.presolved)
+            solver_out["primal"], solver_out["nu"] = \
+                self.presolved.postsolve(solver_out["primal"],
+                                         solver_out["nu"])
+            del solver_out["la"]
         self._generate_nula(solver_out)
         self.result = self._compile_result(solver_out)  # NOTE: SIDE EFFECTS
         if verbosity > 1:
@@ -204,8 +334,10 @@ class GeometricProgram(NomialData):
                    ((time() - tic) / soltime * 100))
             tic = time()
 
-        self.check_solution(self.result["cost"], solver_out['primal'],
-                            nu=solver_out["nu"], la=solver_out["la"])
+        if check != "off":
+            self.check_solution(self.result["cost"], solver_out['primal'],
+                                nu=solver_out["nu"], la=solver_out["la"],
+                                check=check)
         if verbosity > 1:
             print ("solution checking took %.2g%% of solve time" %
                    ((time() - tic) / soltime * 100))
@@ -220,33 +352,91 @@ class GeometricProgram(NomialData):
 
         return self.result
 
-    def _generate_nula(self, solver_out):
+    def _solve_blocks(self, solver, processes, shape, *args, **kwargs):
+        "Solves self.blocks in parallel, returning the stitched solver_out."
+        outs = []
+        for block, (out, log) in zip(self.blocks, solve_blocks(
+                solver, self.blocks, processes, *args, **kwargs)):
+            for line in log:
+                print(line)
+            if out.get("status", None) not in ["optimal", "OPTIMAL"]:
+                return out
+            self._generate_nula(out, block)
+            outs.append(out)
+        return stitch_blocks(self.blocks, outs, shape)
+
+    def _propagate_bounds(self):
+        """Finds bounds on the variables implied by the constraints
+
+        Sets self.bounds, which maps each variable to its (lower, upper)
+        bounds (0 and inf if it has none). Only called by solve() when
+        presolving; otherwise self.bounds is None.
+
+        Raises
+        ------
+        RuntimeWarning, if a constraint can't be satisfied within the bounds
+        set by the others (in which case there's no point in solving).
+        """
+        lower, upper, infeasible = propagate_bounds(self.cs, self.A,
+                                                    self.p_idxs, self.k)
+        self._logbounds = (lower, upper)
+        self.bounds = {var: (np.exp(lower[j]), np.exp(upper[j]))
+                       for j, var in enumerate(self.varlocs)}
+        if infeasible is not None:
+            if infeasible < len(self.posynomials):
+                infeasible = self.posynomials[infeasible]
+            else:  # programs compiled from streams or caches only keep arrays
+                infeasible = "posynomial %i" % infeasible
+            raise RuntimeWarning(
+                "presolve found the program to be infeasible: the constraint"
+                " %s <= 1 cannot be satisfied within the bounds the other"
+                " constraints put on its variables. You can generate a"
+                " feasibility-finding relaxation with model.feasibility()."
+                % infeasible)
+
+    def _generate_nula(self, solver_out, arrays=None):
+        """Fills in solver_out's "nu" from its "la" or vice versa
+
+        `arrays` (by default self) holds the cs, A, p_idxs and k that
+        were passed to the solver.
+        """
+        arrays = arrays if arrays else self
+        n_posys = len(arrays.k)
         solver_out["primal"] = np.ravel(solver_out['primal'])
 
         ## Get full dual solution
         if "nu" in solver_out:
             # solver gave us monomial sensitivities, generate posynomial ones
             nu = np.ravel(solver_out["nu"])
-            la = np.array([sum(nu[self.p_idxs == i])
-                           for i in range(len(self.posynomials))])
+            la = segment_sum(nu, arrays.p_idxs, n_posys)
         elif "la" in solver_out:
             # solver gave us posynomial sensitivities, generate monomial ones
             la = np.ravel(solver_out["la"])
-            if len(la) == len(self.posynomials) - 1:
+            if len(la) == n_posys - 1:
                 # assume the solver dropped the cost's sensitivity (always 1.0)
                 la = np.hstack(([1.0], la))
-            Ax = np.ravel(self.A.dot(solver_out['primal']))
-            z = Ax + np.log(self.cs)
-            m_iss = [self.p_idxs == i for i in range(len(la))]
-            nu = np.hstack([la[p_i]*np.exp(z[m_is])/sum(np.exp(z[m_is]))
-                            for p_i, m_is in enumerate(m_iss)])
+            Ax = np.ravel(arrays.A.dot(solver_out['primal']))
+            z = Ax + np.log(arrays.cs)
+            nu = la[arrays.p_idxs]*segment_softmax(z, arrays.p_idxs, len(la))
         else:
             raise RuntimeWarning("The dual solution was not returned.")
         solver_out["nu"], solver_out["la"] = nu, la
 
+    @contextmanager
+    def _constraint_state_restored(self):
+        """Points constraints at this program's substitutions and pmaps
+        within the context, and back at their previous ones afterwards"""
+        previous = [(constr, constr.substitutions,
+                     constr.__dict__.get("pmap", None))
+                    for constr, _, _ in self._constraint_state]
+        _set_constraint_state(self._constraint_state)
+        try:
+            yield
+        finally:
+            _set_constraint_state(previous)
+
     def _compile_result(self, solver_out):
-        # pylint: disable=too-many-locals
-        """Creates a result dict (as returned by solve() from solver output
+        """Creates a result dict (as returned by solve()) from solver output
 
         This internal method is called from within the solve() method, unless
         solver_out["status"] is not "optimal", in which case a RuntimeWarning
@@ -261,60 +451,23 @@ class GeometricProgram(NomialData):
 
         Returns
         -------
-        result: dict
+        result: LazyResult
             dict in format returned by GeometricProgram.solve()
         """
-        primal = solver_out["primal"]
-        nu, la = solver_out["nu"], solver_out["la"]
-        # confirm lengths before calling zip
-        assert len(self.varlocs) == len(primal)
-        result = {"freevariables": KeyDict(zip(self.varlocs, np.exp(primal)))}
-
-        ## Get cost
-        if "objective" in solver_out:
-            result["cost"] = float(solver_out["objective"])
-        else:
-            # use self.posynomials[0] because the cost may have had constants
-            freev = result["freevariables"]
-            result["cost"] = self.posynomials[0].subsummag(freev)
-
-        ## Get sensitivities
-        result["sensitivities"] = {"constraints": {}, "nu": nu, "la": la}
-        # initialize the var_senss dict with the cost's constants...
-        var_senss = {var: sum([self.cost.exps[i][var]*nu[i] for i in locs])
-                     for (var, locs) in self.cost.varlocs.items()
-                     if (var in self.cost.varlocs
-                         and var not in self.posynomials[0].varlocs)}
-        var_senss = HashVector(var_senss)
-        for c_i, posy_idxs in enumerate(self.constr_idxs):
-            constr = self.constraints[c_i]
-            las = [la[p_i] for p_i in posy_idxs]
-            nus = [[nu[i] for i in self.m_idxs[p_i]] for p_i in posy_idxs]
-            constr_sens, p_var_senss = \
-                constr.sens_from_dual(las, nus)
-            # ...then add to it the constant sensitivities of each constraint
-            var_senss += p_var_senss
-            # also, add each constraint's sensitivities to the results
-            result["sensitivities"]["constraints"][str(constr)] = constr_sens
-        result["sensitivities"]["constants"] = KeyDict(var_senss)
-
-        ## Get constants
-        const = {}
-        for k, v in self.substitutions.items():
-            if k in self.unusedsubkeys:
-                continue
-            if isinstance(k, str):
-                k, = self.constraints.varkeys[k]
-            else:
-                k = k.key
-            const[k] = v
-        result["constants"] = KeyDict(const)
-        result["variables"] = KeyDict(result["freevariables"])
-        result["variables"].update(result["constants"])
+        # confirm lengths before building the result
+        assert len(self.varlocs) == len(solver_out["primal"])
+        return LazyResult(self, solver_out)
 
-        return result
+    def oracles(self):
+        """Returns Oracles of this program's log-space form, for NLP solvers
 
-    def check_solution(self, cost, primal, nu, la, tol=1e-5):
+        See gpkit.oracles: these give the log of each posynomial, their
+        gradients and the Hessian of the Lagrangian, with fixed sparsity
+        patterns, in terms of the log of each variable in self.varlocs.
+        """
+        return Oracles(self)
+
+    def check_solution(self, cost, primal, nu, la, tol=1e-5, check="full"):
         """Run a series of checks to mathematically confirm sol solves this GP
 
         Arguments
@@ -327,6 +480,11 @@ class GeometricProgram(NomialData):
             monomial lagrange multiplier
         la:     numpy.ndarray
             posynomial lagrange multiplier
+        tol:    float
+            relative tolerance of each check
+        check:  str
+            "cheap" checks only the cost and primal feasibility;
+            "full" also checks dual feasibility and the duality gap.
 
         Raises
         ------
@@ -336,17 +494,21 @@ class GeometricProgram(NomialData):
             "local almost equal test"
             return num1 == num2 or abs((num1 - num2) / (num1 + num2)) < tol
         A = self.A.tocsr()
+        n_posys = len(self.k)
+        b = np.log(self.cs)
         # check primal sol
-        primal_exp_vals = self.cs * np.exp(A.dot(primal))   # c*e^Ax
-        if not _almost_equal(primal_exp_vals[self.m_idxs[0]].sum(), cost):
+        posy_vals = np.exp(segment_logsumexp(b + A.dot(primal),
+                                             self.p_idxs, n_posys))
+        if not _almost_equal(posy_vals[0], cost):
             raise RuntimeWarning("Primal solution computed cost did not match"
                                  " solver-returned cost: %s vs %s" %
-                                 (primal_exp_vals[self.m_idxs[0]].sum(), cost))
-        for mi in self.m_idxs[1:]:
-            if primal_exp_vals[mi].sum() > 1 + tol:
-                raise RuntimeWarning("Primal solution violates constraint:"
-                                     " %s is greater than 1." %
-                                     primal_exp_vals[mi].sum())
+                                 (posy_vals[0], cost))
+        if n_posys > 1 and posy_vals[1:].max() > 1 + tol:
+            raise RuntimeWarning("Primal solution violates constraint:"
+                                 " %s is greater than 1." %
+                                 posy_vals[1:].max())
+        if check == "cheap":
+            return
         # check dual sol
         # note: follows dual formulation in section 3.1 of
         # http://web.mit.edu/~whoburg/www/papers/hoburg_phd_thesis.pdf
@@ -354,20 +516,19 @@ class GeometricProgram(NomialData):
         if not _almost_equal(nu0.sum(), 1.):
             raise RuntimeWarning("Dual variables associated with objective"
                                  " sum to %s, not 1" % nu0.sum())
-        if any(nu < 0):
-            if all(nu > -tol/1000.):  # HACK, see issue 528
+        if nu.min() < 0:
+            if nu.min() > -tol/1000.:  # HACK, see issue 528
                 print("Allowing negative dual variable(s) as small as"
-                      " %s." % min(nu))
+                      " %s." % nu.min())
             else:
                 raise RuntimeWarning("Dual solution has negative entries as"
-                                     " small as %s." % min(nu))
+                                     " small as %s." % nu.min())
         ATnu = A.T.dot(nu)
-        if any(np.abs(ATnu) > tol):
+        if np.abs(ATnu).max() > tol:
             raise RuntimeWarning("sum of nu^T * A did not vanish")
-        b = np.log(self.cs)
-        dual_cost = sum(nu[mi].dot(b[mi]) -
-                        (nu[mi].dot(np.log(nu[mi]/la[i])) if la[i] else 0)
-                        for i, mi in enumerate(self.m_idxs))
+        la_m = la[self.p_idxs]  # each monomial's posynomial sensitivity
+        nz = la_m != 0
+        dual_cost = nu.dot(b) - nu[nz].dot(np.log(nu[nz]/la_m[nz]))
         if not _almost_equal(np.exp(dual_cost), cost):
             raise RuntimeWarning("Dual cost %s does not match primal"
                                  " cost %s" % (np.exp(dual_cost), cost))
@@ -395,6 +556,205 @@ class GeometricProgram(NomialData):
                          ["\\end{array}"])
 
 
+class LazyResult(MutableMapping):
+    """The result of a GeometricProgram solve, built as it is accessed
+
+    Only the solver's primal and dual solutions are stored when a
+    GeometricProgram is solved; the "cost", "freevariables", "constants",
+    "variables" and "sensitivities" items are computed the first time they
+    are accessed. Otherwise a LazyResult behaves like the result dict;
+    copying it (e.g. with `dict(result)`) builds every item.
+
+    Arguments
+    ---------
+    program : GeometricProgram
+        The program which was solved
+    solver_out : dict
+        Solver output, with "primal", "nu", "la" and optionally "objective"
+    """
+    lazy_keys = ("cost", "freevariables", "constants", "variables",
+                 "sensitivities")
+
+    def __init__(self, program, solver_out):
+        self.program = program
+        self.primal = solver_out["primal"]
+        self.nu, self.la = solver_out["nu"], solver_out["la"]
+        self.objective = solver_out.get("objective", None)
+        # CompiledGeometricPrograms update their substitutions in place
+        self.substitutions = dict(program.substitutions)
+        self.pending = set(self.lazy_keys)
+        self._items = {}
+
+    def __getitem__(self, key):
+        if key in self.pending:
+            self[key] = getattr(self, "_build_" + key)()
+        return self._items[key]
+
+    def __setitem__(self, key, value):
+        self.pending.discard(key)
+        self._items[key] = value
+
+    def __delitem__(self, key):
+        if key in self.pending:
+            self.pending.remove(key)
+        else:
+            del self._items[key]
+
+    def __contains__(self, key):
+        return key in self.pending or key in self._items
+
+    def __iter__(self):
+        for key in self.lazy_keys:
+            if key in self:
+                yield key
+        for key in list(self._items):
+            if key not in self.lazy_keys:
+                yield key
+
+    def __len__(self):
+        return len(self.pending) + len(self._items)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def _build_cost(self):
+        "Returns the solver's objective, or the cost at the solution."
+        if self.objective is not None:
+            return float(self.objective)
+        # use posynomials[0] because the cost may have had constants
+        return self.program.posynomials[0].subsummag(self["freevariables"])
+
+    def _build_freevariables(self):
+        "Returns the value of each free variable."
+        return KeyDict(zip(self.program.varlocs, np.exp(self.primal)))
+
+    def _build_constants(self):
+        "Returns the value of each substituted constant."
+        const = {}
+        for k, v in self.substitutions.items():
+            if k in self.program.unusedsubkeys:
+                continue
+            if isinstance(k, str):
+                k, = self.program.constraints.varkeys[k]
+            else:
+                k = k.key
+            const[k] = v
+        return KeyDict(const)
+
+    def _build_variables(self):
+        "Returns the value of each free variable and constant."
+        variables = KeyDict(self["freevariables"])
+        variables.update(self["constants"])
+        return variables
+
+    def _build_sensitivities(self):
+        "Returns the dual solution and constraint and constant sensitivities."
+        program = self.program
+        # pylint: disable=protected-access
+        with program._constraint_state_restored():
+            return _sensitivities(program, self.nu, self.la)
+
+
+def _sensitivities(program, nu, la):
+    """Returns the dual solution and constraint and constant sensitivities
+    of program, whose constraints have its substitutions and pmaps"""
+    sensitivities = {"constraints": {}, "nu": nu, "la": la}
+    # initialize the var_senss dict with the cost's constants...
+    cost = program.cost
+    var_senss = {var: sum([cost.exps[i][var]*nu[i] for i in locs])
+                 for (var, locs) in cost.varlocs.items()
+                 if var not in program.posynomials[0].varlocs}
+    var_senss = HashVector(var_senss)
+    for c_i, posy_idxs in enumerate(program.constr_idxs):
+        constr = program.constraints[c_i]
+        las = [la[p_i] for p_i in posy_idxs]
+        nus = [nu[program.m_idxs[p_i]] for p_i in posy_idxs]
+        constr_sens, p_var_senss = constr.sens_from_dual(las, nus)
+        # ...then add to it the constant sensitivities of each constraint
+        var_senss += p_var_senss
+        # also, add each constraint's sensitivities to the results
+        sensitivities["constraints"][str(constr)] = constr_sens
+    sensitivities["constants"] = KeyDict(var_senss)
+    return sensitivities
+
+
+def _set_constraint_state(state):
+    "Sets each constraint's substitutions and pmap from (constr, subs, pmap)s"
+    for constr, subs, pmap in state:
+        constr.substitutions = subs
+        if pmap is not None:
+            constr.pmap = pmap
+        elif "pmap" in constr.__dict__:
+            del constr.pmap
+
+
+def get_solver(solver, *args, **kwargs):
+    "Returns the solverfn and solvername associated with solver."
+    if solver is None:
+        from . import settings
+        solver = settings.get("default_solver", None)
+        if not solver:
+            raise ValueError(
+                "No solver was given; perhaps gpkit was not properly"
+                " installed, or found no solvers during the"
+                " installation process.")
+
+    if solver == "cvxopt":
+        from ._cvxopt import cvxoptimize_fn
+        solverfn = cvxoptimize_fn(*args, **kwargs)
+    elif solver == "linprog":
+        from ._linprog import linprog_fn
+        solverfn = linprog_fn(*args, **kwargs)
+    elif solver == "analytic":
+        from ._analytic import analytic_fn
+        solverfn = analytic_fn()
+    elif solver == "mosek_cli":
+        from ._mosek import cli_expopt
+        solverfn = cli_expopt.imize_fn(*args, **kwargs)
+    elif solver == "mosek":
+        from ._mosek import expopt
+        solverfn = expopt.imize
+    elif hasattr(solver, "__call__"):
+        solverfn = solver
+        solver = solver.__name__
+    else:
+        raise ValueError("Unknown solver '%s'." % solver)
+    return solverfn, solver
+
+
+def iter_constraints(constraints):
+    "Yields each constraint and each of their subconstraints."
+    for constraint in constraints:
+        yield constraint
+        if hasattr(constraint, "flat"):
+            for subconstraint in constraint.flat():
+                yield subconstraint
+
+
+def genA_from_expmatrix(expmatrix):
+    """Generates A matrix from an ExponentMatrix, as genA does from exps
+
+    The columns of A are those of expmatrix (the order of its keys).
+    """
+    n_vars = len(expmatrix.keys)
+    row, col, data = expmatrix.row, expmatrix.col, expmatrix.data
+    # constant monomials are kept as zeros in column 0, as in genA
+    constant_rows = np.flatnonzero(np.bincount(
+        row, minlength=expmatrix.n_terms) == 0)
+    A = CootMatrix(np.concatenate([row, constant_rows]),
+                   np.concatenate([col, np.zeros(len(constant_rows),
+                                                 dtype=int)]),
+                   np.concatenate([data, np.zeros(len(constant_rows))]))
+    A.shape = [expmatrix.n_terms, max(n_vars, 1)]
+    has_pos, has_neg = [np.bincount(col[sign*data > 0], minlength=n_vars) > 0
+                        for sign in (1, -1)]
+    missingbounds = {}
+    for var, pos, neg in zip(expmatrix.keys, has_pos, has_neg):
+        if "value" not in var.descr and not (pos and neg):
+            missingbounds[var] = "lower" if pos else "upper"
+    return A, missingbounds
+
+
 def genA(exps, varlocs):
     # pylint: disable=invalid-name
     """Generates A matrix from exps and varlocs
@@ -410,38 +770,46 @@ def genA(exps, varlocs):
     -------
         A : sparse Cootmatrix
             Exponents of the various free variables for each monomial: rows
-            of A are monomials, columns of A are variables.
+            of A are monomials, columns of A are variables. Its row, col
+            and data attributes are numpy arrays.
         missingbounds : dict
             Keys: variables that lack bounds. Values: which bounds are missed.
     """
 
     missingbounds = {}
-    A = CootMatrix([], [], [])
+    # count entries first so that A can be filled into preallocated arrays
+    nnz = sum(len(locs) for locs in varlocs.values())
+    constant_rows = [i for i, exp in enumerate(exps) if not exp]
+    row = np.empty(nnz + len(constant_rows), dtype="int")
+    col = np.empty(nnz + len(constant_rows), dtype="int")
+    data = np.empty(nnz + len(constant_rows), dtype="float")
+    start = 0
     for j, var in enumerate(varlocs):
-        varsign = "both" if "value" in var.descr else None
-        for i in varlocs[var]:
-            exp = exps[i][var]
-            A.append(i, j, exp)
-            if varsign is "both":
-                pass
-            elif varsign is None:
-                varsign = np.sign(exp)
-            elif np.sign(exp) != varsign:
-                varsign = "both"
-
-        if varsign != "both":
-            if varsign == 1:
-                bound = "lower"
-            elif varsign == -1:
-                bound = "upper"
-            else:
-                # just being safe
-                raise RuntimeWarning("Unexpected varsign %s" % varsign)
-            missingbounds[var] = bound
+        locs = varlocs[var]
+        end = start + len(locs)
+        row[start:end] = locs
+        col[start:end] = j
+        data[start:end] = [exps[i][var] for i in locs]
+
+        if "value" not in var.descr:
+            signs = np.sign(data[start:end])
+            varsign = signs[0]
+            if (signs == varsign).all():
+                if varsign == 1:
+                    bound = "lower"
+                elif varsign == -1:
+                    bound = "upper"
+                else:
+                    # just being safe
+                    raise RuntimeWarning("Unexpected varsign %s" % varsign)
+                missingbounds[var] = bound
+        start = end
 
     # add constant terms
-    for i, exp in enumerate(exps):
-        if not exp:
-            A.append(i, 0, 0)
+    row[nnz:] = constant_rows
+    col[nnz:] = 0
+    data[nnz:] = 0
 
+    A = CootMatrix(row, col, data)
+    A.shape = [len(exps), max(len(varlocs), 1)]
     return A, missingbounds
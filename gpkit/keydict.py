@@ -170,3 +170,27 @@ class KeySet(KeyDict):
         if len(varkeys) == 1:
             varkeys = varkeys[0]
         return varkeys
+
+
+class TrackedKeyDict(KeyDict):
+    """A KeyDict which records the keys set or deleted in it.
+
+    The `changed` set holds every VarKey modified since it was last cleared,
+    so that programs built from these substitutions can be patched instead
+    of rebuilt (see Model.solve).
+    """
+    def __init__(self, *args, **kwargs):
+        self.changed = set()
+        KeyDict.__init__(self, *args, **kwargs)
+
+    def __setitem__(self, key, value):
+        "Sets the item and marks its VarKeys as changed"
+        KeyDict.__setitem__(self, key, value)
+        key, _ = self.parse_and_index(key)
+        self.changed.update(self.keymap[key])
+
+    def __delitem__(self, key):
+        "Deletes the item and marks its VarKeys as changed"
+        parsedkey, _ = self.parse_and_index(key)
+        self.changed.update(self.keymap[parsedkey])
+        KeyDict.__delitem__(self, key)
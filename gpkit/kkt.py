@@ -0,0 +1,122 @@
+"""Differentiates the solution of a GP with respect to its parameters
+
+In log space a GP is: minimize f_0(y) subject to f_i(y) <= 0, where
+f_i(y) = log(sum_{m in i} exp(z_m)) and z = log(c) + A y. When the log of
+the coefficients depends on the log of some parameters q, as
+log(c) = log(c_0) + P q (see CompiledGeometricProgram), the optimum y and
+the multipliers la of the active constraints S satisfy
+
+    grad_y L(y, la, q) = 0,    f_S(y, q) = 0,
+
+with L = f_0 + sum_{i in S} la_i f_i, and differentiating those gives the
+KKT system
+
+    [ H_yy  J_y^T ] [ dy/dq  ]     [ H_yq ]
+    [ J_y   0     ] [ dla/dq ] = - [ J_q  ],
+
+where H is the Hessian of L and J the Jacobian of f_S, in y and q. Both
+come from M = [A P] and the solver's duals: since each monomial's nu_m is
+its posynomial's la times its share of that posynomial's value,
+
+    H = M^T diag(nu) M - sum_i (M_i^T nu_i)(M_i^T nu_i)^T / la_i,
+    J_i = M_i^T nu_i / la_i,
+
+so the system can be built at any solution without the coefficients it
+was found with.
+"""
+import numpy as np
+
+
+class KKTSystem(object):
+    """The factorized KKT system of a GP at an optimum
+
+    Arguments
+    ---------
+    A : CootMatrix or scipy.sparse matrix
+        Exponents of the program's free variables in each monomial
+    P : scipy.sparse matrix
+        Exponents of the program's parameters in each monomial
+    p_idxs : int array
+        Posynomial index of each monomial
+    nu, la : arrays
+        The solution's monomial and posynomial duals
+    tol : float (optional)
+        Constraints whose la is at most this are taken to be inactive.
+
+    Attributes
+    ----------
+    active : int array
+        The constraints (indices of posynomials) in the system; of several
+        active constraints with the same or opposite gradients, such as
+        the two sides of a MonomialEquality, only the first is kept.
+    dprimal : array
+        d(log x_i)/d(log p_j), for each free variable (row) and parameter
+    dla : array
+        d(la_i)/d(log p_j), for each active constraint (row) and parameter
+    hessian, jacobian : scipy.sparse matrices
+        Those of the Lagrangian and of the active constraints, in the
+        free variables followed by the parameters
+
+    Raises
+    ------
+    ValueError, if the system is singular (e.g. if some variable isn't
+    determined by the cost and active constraints at the optimum)
+    """
+
+    def __init__(self, A, P, p_idxs, nu, la, tol=1e-6):
+        # pylint: disable=too-many-arguments,too-many-locals
+        from scipy.sparse import csr_matrix, diags, hstack, bmat
+        from scipy.sparse.linalg import splu
+        A = A.tocsr()
+        n_vars = A.shape[1]
+        p_idxs = np.asarray(p_idxs)
+        nu, la = np.ravel(nu), np.ravel(la)
+        M = hstack([A, csr_matrix(P)]).tocsr()
+        # each posynomial's gradient, times its la
+        incidence = csr_matrix((nu, (p_idxs, np.arange(len(p_idxs)))),
+                               shape=(len(la), len(p_idxs)))
+        laJ = incidence.dot(M).tocsr()
+        laJ.eliminate_zeros()
+        laJ.sort_indices()
+        used = np.flatnonzero(la > tol)
+        self.hessian = (M.T.dot(diags(nu).dot(M)) -
+                        laJ[used].T.dot(diags(1/la[used])
+                                        .dot(laJ[used]))).tocsc()
+        self.active = _independent(laJ, la, used[used > 0])
+        self.jacobian = diags(1/la[self.active]).dot(laJ[self.active]).tocsc()
+
+        n_active = len(self.active)
+        H_yy = self.hessian[:n_vars, :n_vars]
+        H_yq = self.hessian[:n_vars, n_vars:]
+        J_y, J_q = self.jacobian[:, :n_vars], self.jacobian[:, n_vars:]
+        kkt = bmat([[H_yy, J_y.T], [J_y, None]], format="csc")
+        try:
+            self.lu = splu(kkt)
+        except RuntimeError:
+            raise ValueError("the KKT system at this optimum is singular,"
+                             " so the solution's sensitivities are not"
+                             " defined; perhaps some variable is not"
+                             " determined by the cost and the active"
+                             " constraints.")
+        rhs = -np.vstack([H_yq.toarray(), J_q.toarray()])
+        if rhs.shape[1]:
+            solution = self.lu.solve(rhs)
+        else:
+            solution = np.zeros((n_vars + n_active, 0))
+        self.dprimal, self.dla = solution[:n_vars], solution[n_vars:]
+
+
+def _independent(laJ, la, active):
+    """Returns the active constraints whose gradients aren't the same as or
+    the opposite of an earlier one's"""
+    seen, independent = set(), []
+    for i in active:
+        row = laJ[i]
+        scale = 1/la[i]
+        grad = tuple(zip(row.indices, np.round(row.data*scale, 12)))
+        if grad in seen:
+            continue
+        seen.add(grad)
+        seen.add(tuple((j, -x) for j, x in grad))
+        independent.append(i)
+    return np.array(independent, dtype=int)
@@ -145,6 +145,25 @@ class NomialArray(np.ndarray):
         "Returns the array and argument's outer product."
         return NomialArray(np.outer(self, other))
 
+    def sum(self, axis=None, dtype=None, out=None, keepdims=False):
+        """Returns the sum of the array's elements, over an axis if given
+
+        Nomials are summed with a NomialSum, which simplifies their terms
+        once rather than after adding each element.
+        """
+        # pylint: disable=arguments-differ
+        if (dtype is not None or out is not None or keepdims or
+                isinstance(axis, tuple)):
+            return np.ndarray.sum(self, axis, dtype, out, keepdims)
+        from .nomial_math import NomialSum
+        if axis is None or self.ndim <= 1:
+            return NomialSum(self.flat).nomial()
+        rows = np.rollaxis(np.asarray(self), axis, self.ndim)
+        sums = np.empty(rows.shape[:-1], dtype=object)
+        for idx in np.ndindex(*sums.shape):
+            sums[idx] = NomialSum(rows[idx]).nomial()
+        return NomialArray(sums)
+
     def sub(self, subs, val=None, require_positive=True):
         "Substitutes into the array"
         return self.vectorize(lambda nom: nom.sub(subs, val, require_positive))
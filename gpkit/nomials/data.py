@@ -1,7 +1,6 @@
 """Machinery for exps, cs, varlocs data -- common to nomials and programs"""
-from collections import defaultdict
-from functools import reduce as functools_reduce
-from operator import add
+from collections import defaultdict, Counter
+from itertools import chain
 import numpy as np
 from ..small_classes import HashVector, Quantity
 from ..keydict import KeySet, KeyDict
@@ -14,26 +13,32 @@ class NomialData(object):
     cs: array (coefficient of each monomial term)
     exps: tuple of {VarKey: float} (exponents of each monomial term)
     varlocs: {VarKey: list} (terms each variable appears in)
+    expmatrix: ExponentMatrix (exponents of each monomial term)
     units: pint.UnitsContainer
+
+    `exps` may instead be given as an ExponentMatrix, in which case exps
+    and varlocs are only built from it when they're first accessed (and
+    likewise expmatrix, for NomialData made from exps).
     """
     # pylint: disable=too-many-instance-attributes
+    _exps, _varlocs, _expmatrix = None, None, None
+
     def __init__(self, exps=None, cs=None, simplify=True):
         if exps is None and cs is None:
             # pass through for classmethods to get a NomialData object,
             # which they will then call __init__ on
             return
-        if simplify:
-            exps, cs = simplify_exps_and_cs(exps, cs)
-        self.exps, self.cs = exps, cs
+        if isinstance(exps, ExponentMatrix):
+            if simplify:
+                exps, cs = exps.simplify(cs)
+            self._exps, self._expmatrix = None, exps
+        else:
+            if simplify:
+                exps, cs = simplify_exps_and_cs(exps, cs)
+            self._exps, self._expmatrix = exps, None
+        self.cs = cs
         self.any_nonpositive_cs = any(mag(c) <= 0 for c in self.cs)
-
-        varlocs = {}
-        for i, exp in enumerate(exps):
-            for var in exp:
-                if var not in varlocs:
-                    varlocs[var] = []
-                varlocs[var].append(i)
-        self.varlocs = varlocs
+        self._varlocs = None
         self._varkeys, self._values = None, None
         if hasattr(self.cs, "units"):
             self.units = Quantity(1, self.cs.units)  #pylint: disable=no-member
@@ -44,11 +49,53 @@ class NomialData(object):
 
     def __hash__(self):
         if self._hashvalue is None:
-            # confirm lengths before calling zip
-            assert len(self.exps) == len(self.cs)
-            self._hashvalue = hash(tuple(zip(self.exps, self.cs)))
+            expmatrix = self.expmatrix
+            cs = np.ravel(np.array(mag(self.cs), dtype=float)) + 0.0
+            assert len(cs) == expmatrix.n_terms
+            # summed, as the order of the monomials doesn't matter (see
+            # __eq__); found from the arrays, without building any exps
+            terms = _mix64(expmatrix.row_hashes() ^ _mix64(cs.view(np.uint64)))
+            self._hashvalue = hash(int(terms.sum(dtype=np.uint64)))
         return self._hashvalue
 
+    @property
+    def exps(self):
+        "The exponents of each monomial, as a tuple of HashVectors."
+        if self._exps is None and self._expmatrix is not None:
+            self._exps = self._expmatrix.to_exps()
+        return self._exps
+
+    @exps.setter
+    def exps(self, exps):
+        self._exps, self._expmatrix = exps, None
+
+    @property
+    def varlocs(self):
+        "The monomials (row indices) each variable appears in."
+        if self._varlocs is None:
+            if self._exps is None and self._expmatrix is not None:
+                self._varlocs = self._expmatrix.to_varlocs()
+            elif self._exps is not None:
+                varlocs = {}
+                for i, exp in enumerate(self._exps):
+                    for var in exp:
+                        if var not in varlocs:
+                            varlocs[var] = []
+                        varlocs[var].append(i)
+                self._varlocs = varlocs
+        return self._varlocs
+
+    @varlocs.setter
+    def varlocs(self, varlocs):
+        self._varlocs = varlocs
+
+    @property
+    def expmatrix(self):
+        "The exponents of each monomial, as an ExponentMatrix."
+        if self._expmatrix is None:
+            self._expmatrix = ExponentMatrix.from_exps(self._exps)
+        return self._expmatrix
+
     @classmethod
     def fromnomials(cls, nomials):
         """Construct a NomialData from an iterable of Signomial objects"""
@@ -75,8 +122,8 @@ class NomialData(object):
         """Way to initialize from nomials. Calls __init__.
         Used by subclass __init__ methods.
         """
-        exps = functools_reduce(add, (tuple(s.exps) for s in nomials))
-        cs = np.hstack((mag(s.cs) for s in nomials))
+        exps = tuple(chain.from_iterable(s.exps for s in nomials))
+        cs = np.hstack([mag(s.cs) for s in nomials])
         # nomials are already simplified, so simplify=False
         NomialData.__init__(self, exps, cs, simplify=False)
         self.units = tuple(s.units for s in nomials)
@@ -122,13 +169,250 @@ class NomialData(object):
         """Equality test"""
         if not all(hasattr(other, a) for a in ("exps", "cs", "units")):
             return NotImplemented
-        if self.exps != other.exps:
+        if self.units != other.units:
             return False
-        if not all(mag(self.cs) == mag(other.cs)):
+        if self.exps == other.exps:
+            return all(mag(self.cs) == mag(other.cs))
+        # the same monomials in a different order are still equal
+        if len(self.exps) != len(other.exps):
             return False
-        if self.units != other.units:
+        return (Counter(zip(self.exps, mag(self.cs)))
+                == Counter(zip(other.exps, mag(other.cs))))
+
+
+class ExponentMatrix(object):
+    """The exponents of each monomial of a nomial, as a sparse matrix
+
+    The matrix has a row for each monomial and a column for each of its
+    variables, and is stored as coordinate arrays sorted by row and then
+    column, without zeros or variables that don't appear. Adding,
+    substituting into and simplifying nomials with these arrays doesn't
+    build the HashVector of each monomial, which NomialData.exps then only
+    does if it's asked for. ExponentMatrices aren't changed once made.
+
+    Arguments
+    ---------
+    keys : iterable of VarKeys
+        The variable of each column
+    row, col : int arrays
+        The monomial and variable of each exponent
+    data : float array
+        The exponents
+    n_terms : int
+        The number of monomials (rows), some of which may be constants
+    """
+
+    def __init__(self, keys, row, col, data, n_terms):
+        row = np.asarray(row, dtype=int)
+        col = np.asarray(col, dtype=int)
+        data = np.asarray(data, dtype=float)
+        nonzero = data != 0
+        if not nonzero.all():
+            row, col, data = row[nonzero], col[nonzero], data[nonzero]
+        keys = tuple(keys)
+        used = np.bincount(col, minlength=len(keys)) > 0
+        if not used.all():
+            keys = tuple(key for key, use in zip(keys, used) if use)
+            col = (np.cumsum(used) - 1)[col]
+        order = np.lexsort((col, row))
+        self.keys = keys
+        self.row, self.col, self.data = row[order], col[order], data[order]
+        self.n_terms = n_terms
+
+    def __len__(self):
+        return self.n_terms
+
+    @classmethod
+    def from_exps(cls, exps):
+        "Returns the ExponentMatrix of a list of exponent dicts."
+        idxs, row, col, data = {}, [], [], []
+        for i, exp in enumerate(exps):
+            for key, x in exp.items():
+                if key not in idxs:
+                    idxs[key] = len(idxs)
+                row.append(i)
+                col.append(idxs[key])
+                data.append(x)
+        return cls(sorted(idxs, key=idxs.get), row, col, data, len(exps))
+
+    @classmethod
+    def concatenate(cls, matrices):
+        "Returns the ExponentMatrix of the monomials of each of matrices."
+        idxs, rows, cols, datas, n_terms = {}, [], [], [], 0
+        for matrix in matrices:
+            remap = np.array([idxs.setdefault(key, len(idxs))
+                              for key in matrix.keys], dtype=int)
+            rows.append(matrix.row + n_terms)
+            cols.append(remap[matrix.col])
+            datas.append(matrix.data)
+            n_terms += matrix.n_terms
+        return cls(sorted(idxs, key=idxs.get), np.concatenate(rows),
+                   np.concatenate(cols), np.concatenate(datas), n_terms)
+
+    def multiply(self, other):
+        """Returns the ExponentMatrix of the products of each of self's
+        monomials with each of other's, in row-major (self, other) order
+
+        Each product's exponents are the sum of its factors' rows, so the
+        product's entries are self's entries repeated for each of other's
+        monomials and other's tiled for each of self's, with any entries
+        at the same row and variable then summed.
+        """
+        idxs = dict((key, j) for j, key in enumerate(self.keys))
+        remap = np.array([idxs.setdefault(key, len(idxs))
+                          for key in other.keys], dtype=int)
+        n_other = other.n_terms
+        row = np.concatenate([
+            (self.row[:, None]*n_other + np.arange(n_other)).ravel(),
+            (np.arange(self.n_terms)[:, None]*n_other + other.row).ravel()])
+        col = np.concatenate([np.repeat(self.col, n_other),
+                              np.tile(remap[other.col], self.n_terms)])
+        data = np.concatenate([np.repeat(self.data, n_other),
+                               np.tile(other.data, self.n_terms)])
+        entries, which = np.unique(row*len(idxs) + col, return_inverse=True)
+        data = np.bincount(which, weights=data, minlength=len(entries))
+        row, col = np.divmod(entries, max(len(idxs), 1))
+        return ExponentMatrix(sorted(idxs, key=idxs.get), row, col, data,
+                              self.n_terms*n_other)
+
+    def to_exps(self):
+        "Returns the exponents of each monomial, as a tuple of HashVectors."
+        bounds = np.searchsorted(self.row, np.arange(self.n_terms + 1))
+        keys = [self.keys[j] for j in self.col]
+        data = self.data.tolist()
+        return tuple(HashVector(zip(keys[start:end], data[start:end]))
+                     for start, end in zip(bounds[:-1], bounds[1:]))
+
+    def to_varlocs(self):
+        "Returns a dict of the monomials (rows) each variable appears in."
+        order = np.argsort(self.col, kind="mergesort")
+        bounds = np.searchsorted(self.col[order],
+                                 np.arange(len(self.keys) + 1))
+        rows = self.row[order].tolist()
+        return {key: rows[start:end] for key, start, end
+                in zip(self.keys, bounds[:-1], bounds[1:])}
+
+    def row_hashes(self):
+        """Returns a hash of each monomial's exponents, as uint64s
+
+        Each (variable, exponent) entry is hashed from the variable's hash
+        and the exponent's bits, and a row's hash is the sum (wrapping
+        around) of its entries', so it doesn't depend on the matrix's
+        column order: equal monomials get equal hashes in any matrix.
+        """
+        keyhashes = np.array([hash(key) for key in self.keys],
+                             dtype=np.int64).view(np.uint64)
+        entries = _mix64(keyhashes[self.col]
+                         ^ _mix64((self.data + 0.0).view(np.uint64)))
+        sums = np.concatenate([np.zeros(1, dtype=np.uint64),
+                               np.cumsum(entries, dtype=np.uint64)])
+        bounds = np.searchsorted(self.row, np.arange(self.n_terms + 1))
+        return sums[bounds[1:]] - sums[bounds[:-1]]
+
+    def _rows_equal(self, other):
+        "True if each row has the same entries as the row other gives for it."
+        bounds = np.searchsorted(self.row, np.arange(self.n_terms + 1))
+        starts, lengths = bounds[:-1], np.diff(bounds)
+        if (lengths != lengths[other]).any():
             return False
-        return True
+        # the index of the entry in the same place of the other row
+        others = (starts[other] - starts)[self.row] + np.arange(len(self.row))
+        return ((self.col == self.col[others]).all()
+                and (self.data == self.data[others]).all())
+
+    def _exact_row_groups(self):
+        """Returns the first row and the group of each row, grouping equal
+        rows by their sequences of (column, exponent), as np.unique would"""
+        bounds = np.searchsorted(self.row, np.arange(self.n_terms + 1))
+        cols, data = self.col.tolist(), self.data.tolist()
+        groups, first = {}, []
+        inverse = np.empty(self.n_terms, dtype=int)
+        for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            row = (tuple(cols[start:end]), tuple(data[start:end]))
+            if row not in groups:
+                groups[row] = len(first)
+                first.append(i)
+            inverse[i] = groups[row]
+        return np.array(first, dtype=int), inverse
+
+    def simplify(self, cs):
+        """Merges monomials with the same exponents, like simplify_exps_and_cs
+
+        Returns
+        -------
+        expmatrix : ExponentMatrix
+            Of the simplified monomials, in the order of their first
+            appearance in self
+        cs : array of floats or Quantity
+            Coefficients of the simplified monomials
+        """
+        cs, units = _magnitudes(cs)
+        cs = np.array(cs, dtype="float")
+        _, first, inverse = np.unique(self.row_hashes(), return_index=True,
+                                      return_inverse=True)
+        if not self._rows_equal(first[inverse]):
+            first, inverse = self._exact_row_groups()  # a hash collision
+        # number the groups of equal rows by their first appearance
+        order = np.argsort(first)
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        group, first = rank[inverse], first[order]
+        cs = np.bincount(group, weights=cs, minlength=len(first))
+        if len(cs) > 1:
+            nonzero = cs != 0
+            cs, first = cs[nonzero], first[nonzero]
+        newrow = np.full(self.n_terms, -1, dtype=int)
+        newrow[first] = np.arange(len(first))
+        kept = newrow[self.row] >= 0
+        matrix = ExponentMatrix(self.keys, newrow[self.row[kept]],
+                                self.col[kept], self.data[kept], len(cs))
+        if units:
+            return matrix, Quantity(cs, units)
+        return matrix, cs
+
+    def substitute(self, cs, values):
+        """Returns the matrix and cs with numbers substituted for variables
+
+        Arguments
+        ---------
+        cs : array of floats
+            Magnitude of each monomial's coefficient (which is modified)
+        values : dict
+            Nonnegative number substituted for each VarKey
+        """
+        vals = np.ones(len(self.keys))
+        subbed = np.zeros(len(self.keys), dtype=bool)
+        for j, key in enumerate(self.keys):
+            if key in values:
+                vals[j], subbed[j] = values[key], True
+        entries = subbed[self.col]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factors = vals[self.col[entries]]**self.data[entries]
+        np.multiply.at(cs, self.row[entries], factors)
+        kept = ~entries
+        return ExponentMatrix(self.keys, self.row[kept], self.col[kept],
+                              self.data[kept], self.n_terms), cs
+
+
+def _mix64(x):
+    "Scrambles the bits of a uint64 array (with splitmix64's finalizer)."
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _magnitudes(cs):
+    "Returns the magnitudes of cs, and their units (or None)."
+    if isinstance(cs, Quantity):
+        return cs.magnitude, cs.units
+    elif isinstance(cs[0], Quantity):
+        units = cs[0].units
+        if len(cs) == 1:
+            return [cs[0].magnitude], units
+        return [c.to(units).magnitude for c in cs], units
+    return cs, None
 
 
 def simplify_exps_and_cs(exps, cs, return_map=False):
@@ -155,32 +439,23 @@ def simplify_exps_and_cs(exps, cs, return_map=False):
         List for each new monomial of {originating indexes: fractions}
     """
     matches = defaultdict(float)
+    order = []  # so that monomials keep the order they first appear in
     if return_map:
         expmap = defaultdict(dict)
-    if isinstance(cs, Quantity):
-        units = cs.units
-        cs = cs.magnitude
-    elif isinstance(cs[0], Quantity):
-        units = cs[0].units
-        if len(cs) == 1:
-            cs = [cs[0].magnitude]
-        else:
-            cs = [c.to(units).magnitude for c in cs]
-    else:
-        units = None
+    cs, units = _magnitudes(cs)
     for i, exp in enumerate(exps):
         exp = HashVector({var: x for (var, x) in exp.items() if x != 0})
+        if exp not in matches:
+            order.append(exp)
         matches[exp] += cs[i]
         if return_map:
             expmap[exp][i] = cs[i]
 
     if len(matches) > 1:
-        zeroed_terms = (exp for exp, c in matches.items() if mag(c) == 0)
-        for exp in zeroed_terms:
-            del matches[exp]
+        order = [exp for exp in order if mag(matches[exp]) != 0]
 
-    exps_ = tuple(matches.keys())
-    cs_ = list(matches.values())
+    exps_ = tuple(order)
+    cs_ = [matches[exp] for exp in order]
     if units:
         cs_ = Quantity(cs_, units)
     else:
@@ -190,8 +465,8 @@ def simplify_exps_and_cs(exps, cs, return_map=False):
         return exps_, cs_
     else:
         mmap = [HashVector() for c in cs_]
-        for i, item in enumerate(matches.items()):
-            exp, c = item
+        for i, exp in enumerate(order):
+            c = matches[exp]
             for j in expmap[exp]:
                 mmap[i][j] = mag(expmap[exp][j]/c)
         return exps_, cs_, mmap
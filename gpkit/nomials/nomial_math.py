@@ -1,25 +1,29 @@
 """Signomial, Posynomial, Monomial, Constraint, & MonoEQCOnstraint classes"""
 import numpy as np
-from .data import simplify_exps_and_cs
+from .data import simplify_exps_and_cs, ExponentMatrix
 from .array import NomialArray
 from .nomial_core import Nomial, fast_monomial_str
-from .substitution import substitution, parse_subs
+from .substitution import substitution, parse_subs, matrix_substitution
 from ..constraints import SingleEquationConstraint
 from ..small_classes import Strings, Numbers, Quantity
 from ..small_classes import HashVector
-from ..keydict import KeySet
+from ..keydict import KeySet, KeyDict
 from ..varkey import VarKey
 from ..small_scripts import mag
 from .. import units as ureg
 from .. import DimensionalityError
 
 
+# the exponents of a constant monomial, for adding numbers to nomials
+CONSTANT_EXPMATRIX = ExponentMatrix((), [], [], [], 1)
+
+
 class Signomial(Nomial):
     """A representation of a Signomial.
 
         Arguments
         ---------
-        exps: tuple of dicts
+        exps: tuple of dicts, or ExponentMatrix
             Exponent dicts for each monomial term
         cs: tuple
             Coefficient values for each monomial term
@@ -66,12 +70,15 @@ class Signomial(Nomial):
         elif isinstance(exps, Nomial):
             simplify = False
             cs = exps.cs  # pylint: disable=no-member
-            exps = exps.exps  # pylint: disable=no-member
+            # pylint: disable=protected-access
+            if exps._expmatrix is not None:
+                exps = exps._expmatrix  # to not build exps that aren't needed
+            else:
+                exps = exps.exps
         else:
             try:
                 # test for presence of length and identical lengths
                 assert len(cs) == len(exps)
-                exps_ = list(range(len(exps)))
                 if not all(isinstance(c, Quantity) for c in cs):
                     try:
                         cs = np.array(cs, dtype='float')
@@ -88,12 +95,14 @@ class Signomial(Nomial):
                     except DimensionalityError:
                         raise ValueError("cannot add monomials of"
                                          " different units together")
-                for i, k in enumerate(exps):
-                    exps_[i] = HashVector(k)
-                    for key in exps_[i]:
-                        if isinstance(key, Strings+(Monomial,)):
-                            exps_[i][VarKey(key)] = exps_[i].pop(key)
-                exps = tuple(exps_)
+                if not isinstance(exps, ExponentMatrix):
+                    exps_ = list(range(len(exps)))
+                    for i, k in enumerate(exps):
+                        exps_[i] = HashVector(k)
+                        for key in exps_[i]:
+                            if isinstance(key, Strings+(Monomial,)):
+                                exps_[i][VarKey(key)] = exps_[i].pop(key)
+                    exps = tuple(exps_)
             except AssertionError:
                 raise TypeError("cs and exps must have the same length.")
 
@@ -114,7 +123,7 @@ class Signomial(Nomial):
         else:
             self.__class__ = Posynomial
 
-        if len(self.exps) == 1:
+        if len(self.cs) == 1:
             if self.__class__ is Posynomial:
                 self.__class__ = Monomial
             self.exp = self.exps[0]
@@ -211,24 +220,38 @@ class Signomial(Nomial):
         -------
         Returns substituted nomial.
         """
-        _, exps, cs, _ = substitution(self, substitutions, val)
-        return Signomial(exps, cs, require_positive=require_positive)
+        expmatrix, cs = matrix_substitution(self, substitutions, val)
+        return Signomial(expmatrix, cs, require_positive=require_positive)
 
     def subinplace(self, substitutions, value=None):
         "Substitutes in place."
-        _, exps, cs, _ = substitution(self, substitutions, value)
-        super(Signomial, self).__init__(exps, cs)
+        expmatrix, cs = matrix_substitution(self, substitutions, value)
+        super(Signomial, self).__init__(expmatrix, cs)
 
     def subsummag(self, substitutions, val=None):
         "Returns the sum of the magnitudes of the substituted Nomial."
-        _, exps, cs, _ = substitution(self, substitutions, val)
-        if any(exps):
-            keys = set()
-            for exp in exps:
-                keys.update(exp)
-            raise ValueError("could not substitute for %s" % keys)
+        expmatrix, cs = matrix_substitution(self, substitutions, val)
+        if expmatrix.keys:
+            raise ValueError("could not substitute for %s"
+                             % set(expmatrix.keys))
         return mag(cs).sum()
 
+    def compile(self, substitutions=None):
+        """Returns a NomialEvaluator of this nomial, for evaluating it at
+        many points at once (see gpkit.evaluator)
+
+        Arguments
+        ---------
+        substitutions : dict (optional)
+            Substituted before compiling; by default, the values of any
+            variables which have them.
+        """
+        from ..evaluator import NomialEvaluator
+        if substitutions is None:
+            substitutions = self.values
+        return NomialEvaluator([self.sub(substitutions,
+                                         require_positive=False)])
+
     def __le__(self, other):
         if isinstance(other, NomialArray):
             return NotImplemented
@@ -246,14 +269,16 @@ class Signomial(Nomial):
     def __add__(self, other):
         if isinstance(other, Numbers):
             if other == 0:
-                return Signomial(self.exps, self.cs)
+                return Signomial(self.expmatrix, self.cs)
             else:
                 cs = self.cs.tolist() + [other]  # pylint: disable=no-member
-                return Signomial(self.exps + ({},), cs)
+                return Signomial(ExponentMatrix.concatenate(
+                    [self.expmatrix, CONSTANT_EXPMATRIX]), cs)
         elif isinstance(other, Signomial):
              # pylint: disable=no-member
             cs = self.cs.tolist() + other.cs.tolist()
-            return Signomial(self.exps + other.exps, cs)
+            return Signomial(ExponentMatrix.concatenate(
+                [self.expmatrix, other.expmatrix]), cs)
         elif isinstance(other, NomialArray):
             return np.array(self)+other
         else:
@@ -267,7 +292,7 @@ class Signomial(Nomial):
             if not other:
                 # assume other is multiplicative zero
                 return other
-            return Signomial(self.exps, other*self.cs)
+            return Signomial(self.expmatrix, other*self.cs)
         elif isinstance(other, Signomial):
             C = np.outer(self.cs, other.cs)
             if isinstance(self.cs, Quantity) or isinstance(other.cs, Quantity):
@@ -281,11 +306,8 @@ class Signomial(Nomial):
                     ounits = Quantity(1, other.cs[0].units)
                 # HACK: fix for pint not working with np.outer
                 C = C * sunits * ounits
-            Exps = np.empty((len(self.exps), len(other.exps)), dtype="object")
-            for i, exp_s in enumerate(self.exps):
-                for j, exp_o in enumerate(other.exps):
-                    Exps[i, j] = exp_s + exp_o
-            return Signomial(Exps.flatten(), C.flatten())
+            return Signomial(self.expmatrix.multiply(other.expmatrix),
+                             C.flatten())
         elif isinstance(other, NomialArray):
             return np.array(self)*other
         else:
@@ -294,7 +316,7 @@ class Signomial(Nomial):
     def __div__(self, other):
         """Support the / operator in Python 2.x"""
         if isinstance(other, Numbers):
-            return Signomial(self.exps, self.cs/other)
+            return Signomial(self.expmatrix, self.cs/other)
         elif isinstance(other, Monomial):
             return other.__rdiv__(self)
         elif isinstance(other, NomialArray):
@@ -305,10 +327,15 @@ class Signomial(Nomial):
     def __pow__(self, expo):
         if isinstance(expo, int):
             if expo >= 0:
-                p = Monomial({}, 1)
+                # by squaring, so that only about log2(expo) products of
+                # large signomials are taken
+                p, power = Monomial({}, 1), self
                 while expo > 0:
-                    p *= self
-                    expo -= 1
+                    if expo % 2:
+                        p *= power
+                    expo //= 2
+                    if expo:
+                        power *= power
                 return p
             else:
                 raise ValueError("Signomials are only closed under"
@@ -427,6 +454,69 @@ class Monomial(Posynomial):
 #######################################################
 
 
+class NomialSum(object):
+    """Collects terms to be summed into a single nomial
+
+    Adding two nomials concatenates and simplifies all of their terms, so
+    building an n-term nomial by adding one term at a time takes O(n^2)
+    time. A NomialSum only stores the terms added to it (with `+=` or
+    `add`), and concatenates and simplifies them once, when `nomial()` is
+    called. NomialArray.sum() uses one.
+
+    Arguments
+    ---------
+    terms : iterable of Signomials or numbers (optional)
+        Terms to start the sum with
+
+    Example
+    -------
+    >>> total = NomialSum()
+    >>> for i in range(1, 20):
+    ...     total += x**i/i
+    >>> posy = total.nomial()
+    """
+
+    def __init__(self, terms=()):
+        self._matrices, self._cs, self._numbers = [], [], []
+        self.n_nomials = 0
+        for term in terms:
+            self.add(term)
+
+    def add(self, term):
+        "Adds a Signomial or number to the sum, returning the sum"
+        if isinstance(term, Signomial):
+            self._matrices.append(term.expmatrix)
+            self._cs.append(term.cs)
+            self.n_nomials += 1
+        elif isinstance(term, Numbers):
+            self._numbers.append(term)
+            if term != 0:
+                self._matrices.append(CONSTANT_EXPMATRIX)
+                self._cs.append(term*np.ones(1))
+        else:
+            raise TypeError("cannot add a %s to a NomialSum." % type(term))
+        return self
+
+    def __iadd__(self, term):
+        return self.add(term)
+
+    def nomial(self):
+        """Returns the sum of the terms added so far
+
+        Returns
+        -------
+        Signomial (or Posynomial or Monomial), or the sum of the numbers
+        added, if no nomials have been.
+        """
+        if not self.n_nomials:
+            return sum(self._numbers)
+        if any(isinstance(cs, Quantity) for cs in self._cs):
+            cs = [c for cs in self._cs for c in cs.tolist()]
+        else:
+            cs = np.concatenate(self._cs)
+        return Signomial(ExponentMatrix.concatenate(self._matrices), cs)
+
+
 class ScalarSingleEquationConstraint(SingleEquationConstraint):
     "A SingleEquationConstraint with scalar left and right sides."
     nomials = []
@@ -685,6 +775,7 @@ class SignomialInequality(ScalarSingleEquationConstraint):
         if x0 is None:
             x0 = {vk: vk.descr["sp_init"] for vk in negy.varlocs
                   if "sp_init" in vk.descr}
+        x0 = KeyDict(x0)  # so that x0's keys can be Variables or VarKeys
         x0.update({var: 1 for var in negy.varlocs if var not in x0})
         x0.update(self.substitutions)
         pc = PosynomialInequality(posy, "<=", negy.mono_lower_bound(x0))
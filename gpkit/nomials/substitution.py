@@ -124,17 +124,7 @@ def substitution(nomial, substitutions, val=None):
             if len(varlocs_[var]) == 0:
                 del varlocs_[var]
             if isinstance(sub, Numbers):
-                if hasattr(sub, "units") and hasattr(sub, "to"):
-                    if sub.units != var.units:
-                        try:
-                            vu = getattr(var.units, "units", "dimensionless")
-                            sub = sub.to(vu)
-                        except DimensionalityError:
-                            raise ValueError("the units of '%s' are"
-                                             " not compatible with those of"
-                                             " those of the original '%s'"
-                                             " [%s]." % (sub, var, vu))
-                    sub = sub.magnitude
+                sub = _magnitude(var, sub)
                 # NOTE: uncomment the below to require Quantity'd subs
                 # elif hasattr(var.units, "units"):
                 #     try:
@@ -194,3 +184,64 @@ def substitution(nomial, substitutions, val=None):
                 raise TypeError("could not substitute with value"
                                 " of type '%s'" % type(sub))
     return varlocs_, exps_, cs_, subs
+
+
+def _magnitude(var, sub):
+    "Returns the magnitude of the number sub in the units of var."
+    if hasattr(sub, "units") and hasattr(sub, "to"):
+        if sub.units != var.units:
+            try:
+                vu = getattr(var.units, "units", "dimensionless")
+                sub = sub.to(vu)
+            except DimensionalityError:
+                raise ValueError("the units of '%s' are"
+                                 " not compatible with those of"
+                                 " those of the original '%s'"
+                                 " [%s]." % (sub, var, vu))
+        sub = sub.magnitude
+    return sub
+
+
+def matrix_substitution(nomial, substitutions, val=None):
+    """Substitution into a nomial's ExponentMatrix
+
+    Substitutions of nonnegative numbers are made on the matrix's arrays;
+    if there are any others (e.g. of variables or monomials), falls back
+    on `substitution`, and makes the matrix of its exps.
+
+    Arguments
+    ---------
+    nomial : Signomial
+    substitutions, val :
+        As for `substitution`
+
+    Returns
+    -------
+    expmatrix : ExponentMatrix
+        Exponents of each monomial
+    cs_ : array or Quantity
+        Coefficients of each monomial
+    """
+    from .data import ExponentMatrix
+    if val is not None:
+        substitutions = {substitutions: val}
+    subs = None
+    if substitutions:
+        subs, _, _ = parse_subs(nomial.varkeys, substitutions)
+    if not subs:
+        return nomial.expmatrix, nomial.cs
+    values = {}
+    for var, sub in subs.items():
+        if isinstance(sub, np.ndarray) and not sub.shape:
+            sub = sub.flatten()[0]
+        if isinstance(sub, Numbers):
+            sub = _magnitude(var, sub)
+        if not isinstance(sub, Numbers) or not sub >= 0:
+            _, exps, cs_, _ = substitution(nomial, subs)
+            return ExponentMatrix.from_exps(exps), cs_
+        values[var] = sub
+    cs_ = np.array(mag(nomial.cs), dtype="float")
+    expmatrix, cs_ = nomial.expmatrix.substitute(cs_, values)
+    if nomial.units:
+        cs_ = Quantity(cs_, nomial.cs.units)
+    return expmatrix, cs_
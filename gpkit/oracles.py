@@ -0,0 +1,145 @@
+"""Analytic derivatives of a GeometricProgram in log space, for NLP solvers
+
+In the variables y = log(x) each posynomial of a GP becomes a convex
+log-sum-exp function,
+
+    f_i(y) = log(sum_{m in i} exp(log(c_m) + A_m.y))
+
+whose gradient is A_i^T w_i, where w_i are the monomials' shares of the
+posynomial's value (a softmax within each posynomial), and whose Hessian is
+A_i^T (diag(w_i) - w_i w_i^T) A_i. The program is then
+
+    minimize f_0(y) subject to f_i(y) <= 0,
+
+and the Hessian of its Lagrangian sum_i la_i f_i is
+
+    A^T diag(la[p_idxs]*w) A - G^T diag(la) G,
+
+where G is the Jacobian of f. Its nonzeros can only be at pairs of
+variables which share a posynomial, which is a sparsity pattern that
+doesn't depend on y or la (see Oracles).
+"""
+import numpy as np
+from .segment_ops import segment_logsumexp, segment_softmax
+
+
+class Oracles(object):
+    """Values, Jacobian and Hessian of a GeometricProgram's log-space form
+
+    The program's variables are y = log(x), in the column order of its A
+    (that of its `varlocs`). f[0] is the log of the cost, and f[1:] the
+    log of each constraint posynomial, which must be <= 0. The program's
+    coefficients are read at every call, so the oracles of a
+    CompiledGeometricProgram follow its `update()`s.
+
+    Arguments
+    ---------
+    program : GeometricProgram
+        Or anything else with cs, A, p_idxs and k
+
+    Attributes
+    ----------
+    shape : tuple
+        (number of posynomials, number of variables)
+    jacobian_structure : (int array, int array)
+        Row (posynomial) and column (variable) of each of the Jacobian's
+        possible nonzeros, in the order `jacobian()` returns them
+    hessian_structure : (int array, int array)
+        Row and column of each of the possible nonzeros of the lower
+        triangle of the Lagrangian's Hessian, in the order `hessian()`
+        returns them
+
+    Examples
+    --------
+    >>> oracles = gp.oracles()
+    >>> f = oracles.values(y)
+    >>> J = csr_matrix((oracles.jacobian(y), oracles.jacobian_structure),
+                       shape=oracles.shape)
+    """
+
+    def __init__(self, program):
+        from scipy.sparse import csr_matrix, tril
+        self.program = program
+        self._A = program.A.tocsr()
+        self._p_idxs = np.asarray(program.p_idxs)
+        self.shape = (len(program.k), self._A.shape[1])
+        A = self._A.tocoo()
+        nonzero = A.data != 0
+        self._A_row, self._A_col = A.row[nonzero], A.col[nonzero]
+        self._A_data = A.data[nonzero]
+        # which variables appear in which posynomials (the Jacobian's pattern)
+        incidence = csr_matrix((np.ones(len(self._A_row)),
+                                (self._p_idxs[self._A_row], self._A_col)),
+                               shape=self.shape)
+        incidence.sum_duplicates()
+        incidence.sort_indices()
+        jac = incidence.tocoo()
+        self.jacobian_structure = (jac.row, jac.col)
+        # the position of each of A's nonzeros in that pattern
+        position = csr_matrix((np.arange(jac.nnz) + 1, (jac.row, jac.col)),
+                              shape=self.shape)
+        self._jac_idxs = np.asarray(
+            position[self._p_idxs[self._A_row], self._A_col]).ravel() - 1
+        # variables which share a posynomial (the Hessian's pattern)
+        pattern = tril(incidence.T.dot(incidence)).tocsr()
+        pattern.sort_indices()
+        hess = pattern.tocoo()
+        self.hessian_structure = (hess.row, hess.col)
+
+    def _logmonomials(self, y):
+        "Returns the log of each monomial at y."
+        return np.log(self.program.cs) + self._A.dot(y)
+
+    def values(self, y):
+        "Returns the log of each posynomial at y (f[0] is the log cost)."
+        return segment_logsumexp(self._logmonomials(y), self._p_idxs,
+                                 self.shape[0])
+
+    def jacobian(self, y):
+        """Returns the gradient of each f_i at y
+
+        Returns
+        -------
+        array of the values at `jacobian_structure`
+        """
+        shares = segment_softmax(self._logmonomials(y), self._p_idxs,
+                                 self.shape[0])
+        return np.bincount(self._jac_idxs,
+                           weights=shares[self._A_row]*self._A_data,
+                           minlength=len(self.jacobian_structure[0]))
+
+    def gradient(self, y):
+        "Returns the gradient of the log cost, f[0], at y."
+        grad = np.zeros(self.shape[1])
+        rows, cols = self.jacobian_structure
+        jac = self.jacobian(y)
+        grad[cols[rows == 0]] = jac[rows == 0]
+        return grad
+
+    def hessian(self, y, la):
+        """Returns the Hessian of the Lagrangian sum_i la_i f_i at y
+
+        Arguments
+        ---------
+        y : array
+            Log of each variable
+        la : array
+            Weight of each posynomial; la[0] weighs the cost (usually 1),
+            and the others are the constraints' multipliers, as in a
+            result's ["sensitivities"]["la"].
+
+        Returns
+        -------
+        array of the values at `hessian_structure` (the lower triangle)
+        """
+        from scipy.sparse import csr_matrix, diags
+        la = np.asarray(la, dtype=float)
+        shares = segment_softmax(self._logmonomials(y), self._p_idxs,
+                                 self.shape[0])
+        weighted = diags(la[self._p_idxs]*shares).dot(self._A)
+        hess = self._A.T.dot(weighted)
+        rows, cols = self.jacobian_structure
+        jac = csr_matrix((self.jacobian(y), (rows, cols)), shape=self.shape)
+        hess = hess - jac.T.dot(diags(la).dot(jac))
+        rows, cols = self.hessian_structure
+        return np.asarray(hess.tocsr()[rows, cols]).ravel()
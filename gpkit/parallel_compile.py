@@ -0,0 +1,257 @@
+"""Converts the constraints of a GeometricProgram into posynomials, in
+parallel worker processes if asked to
+
+Each constraint's `as_posyslt1()` substitutes into and simplifies its
+posynomials in pure Python, which for large models is most of the time
+spent building a program. The worker processes are forked, so they inherit
+the constraints instead of having them pickled (VarKeys can't be); each
+sends back the exponents of its chunk's monomials as COO triples (with
+columns indexing a list of the constraints' varkeys made beforehand), their
+coefficients and the name of each posynomial's units, and the state
+`as_posyslt1()` leaves on each constraint (its `pmap` and `posymap`), which
+is then set on the parent's constraints so that they can compute their
+sensitivities. The chunks' triples are merged in order into preallocated
+arrays, from which the program's A matrix is made directly; its
+Posynomials are only made if they're asked for.
+"""
+import os
+try:
+    from collections.abc import Sequence
+except ImportError:  # python 2
+    from collections import Sequence
+import numpy as np
+from .nomials import Posynomial, SignomialInequality
+from .nomials.data import ExponentMatrix
+from .small_classes import Numbers, Quantity
+from .small_scripts import mag
+
+# (constraints, substitutions, varkey indices), inherited by forked workers
+_WORK = None
+STATE_ATTRS = ("pmap", "posymap")
+
+
+def constraint_posys(constraints, substitutions):
+    """Returns the posynomials <= 1 of each constraint, as a list of lists
+
+    Arguments
+    ---------
+    constraints : iterable
+        Constraints whose `as_posyslt1()` to call
+    substitutions : dict
+        Set as each constraint's substitutions first
+    """
+    posys = []
+    for constraint in constraints:
+        constraint.substitutions = substitutions
+        posys.append(constraint.as_posyslt1())
+    return posys
+
+
+def parallel_posys(constraints, substitutions, processes):
+    """Converts constraints into posynomials <= 1 in worker processes
+
+    Arguments
+    ---------
+    constraints : list
+        Constraints whose `as_posyslt1()` to call
+    substitutions : dict
+        Set as each constraint's substitutions first
+    processes : int or True
+        The constraints are split into chunks which are converted by that
+        many worker processes (one per CPU if True).
+
+    Returns
+    -------
+    MergedPosys, or None if the constraints can't be converted in worker
+    processes: if they can't be forked, if some substitutions aren't
+    numbers (and could introduce new variables), or if there are
+    SignomialInequalities (which change class when converted).
+
+    Raises
+    ------
+    ValueError, if a constraint has an invalid posynomial
+    """
+    if not _parallelizable(constraints, substitutions):
+        return None
+
+    # pylint: disable=global-statement
+    global _WORK
+    from .geometric_program import iter_constraints
+    try:
+        from multiprocessing import get_context
+        pool_class = get_context("fork").Pool
+    except ImportError:  # python 2, which always forks
+        from multiprocessing import Pool as pool_class
+    from multiprocessing import cpu_count
+    processes = cpu_count() if processes is True else processes
+    varkeys = set()
+    for constraint in constraints:
+        varkeys.update(constraint.varkeys)
+    varkeys = list(varkeys)
+    bounds = np.linspace(0, len(constraints),
+                         min(4*processes, len(constraints)) + 1).astype(int)
+    chunks = list(zip(bounds[:-1], bounds[1:]))
+    _WORK = (constraints, substitutions,
+             {varkey: i for i, varkey in enumerate(varkeys)})
+    pool = pool_class(processes)
+    try:
+        results = pool.map(_convert_chunk, chunks)
+    finally:
+        pool.close()
+        pool.join()
+        _WORK = None
+
+    for result in results:
+        if result.invalid is not None:
+            raise ValueError("%s is an invalid constraint for a"
+                             " GeometricProgram" % constraints[result.invalid])
+    for (start, end), result in zip(chunks, results):
+        for subconstraint, state in zip(
+                iter_constraints(constraints[start:end]), result.states):
+            subconstraint.substitutions = substitutions
+            subconstraint.__dict__.update(state)
+    return MergedPosys(varkeys, results)
+
+
+def _parallelizable(constraints, substitutions):
+    "True if parallel_posys can convert constraints in worker processes."
+    from .geometric_program import iter_constraints
+    if not hasattr(os, "fork"):
+        return False
+    for value in substitutions.values():
+        value = mag(value)
+        if not isinstance(value, Numbers) and not (
+                isinstance(value, np.ndarray) and value.dtype.kind in "fiu"):
+            return False
+    return not any(isinstance(constraint, SignomialInequality)
+                   for constraint in iter_constraints(constraints))
+
+
+class _ChunkResult(object):
+    "The posynomials of a chunk of constraints, as sent back by a worker."
+    # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.row, self.col, self.data, self.cs = [], [], [], []
+        self.units, self.k, self.n_posys, self.states = [], [], [], []
+        self.invalid = None
+
+
+def _convert_chunk(bounds):
+    "Converts the constraints in bounds, in a worker process."
+    from .geometric_program import iter_constraints
+    constraints, substitutions, varidxs = _WORK
+    start, end = bounds
+    result = _ChunkResult()
+    n_terms = 0
+    for i, constraint in enumerate(constraints[start:end]):
+        constraint.substitutions = substitutions
+        posys = constraint.as_posyslt1()
+        if not all(posys):
+            result.invalid = start + i  # GeometricProgram will say so
+            return result
+        for posy in posys:
+            matrix = posy.expmatrix
+            remap = np.array([varidxs[key] for key in matrix.keys],
+                             dtype=int)
+            result.row.append(matrix.row + n_terms)
+            result.col.append(remap[matrix.col])
+            result.data.append(matrix.data)
+            result.cs.append(np.ravel(mag(posy.cs)))
+            result.units.append(str(posy.cs.units)
+                                if isinstance(posy.cs, Quantity) else None)
+            result.k.append(matrix.n_terms)
+            n_terms += matrix.n_terms
+        result.n_posys.append(len(posys))
+    for subconstraint in iter_constraints(constraints[start:end]):
+        result.states.append({attr: subconstraint.__dict__[attr]
+                              for attr in STATE_ATTRS
+                              if attr in subconstraint.__dict__})
+    for attr, dtype in [("row", int), ("col", int), ("data", float),
+                        ("cs", float)]:
+        setattr(result, attr, np.concatenate(
+            getattr(result, attr) + [np.zeros(0, dtype=dtype)]))
+    return result
+
+
+class MergedPosys(object):
+    """The posynomials <= 1 of constraints converted by parallel_posys
+
+    Attributes
+    ----------
+    expmatrix : ExponentMatrix
+        The exponents of every posynomial's monomials, in order
+    cs : array of floats
+        The magnitude of each of those monomials' coefficients
+    units : list
+        The name of each posynomial's units (or None)
+    k : int array
+        The number of monomials in each posynomial
+    n_posys : list
+        The number of posynomials of each constraint
+    """
+    def __init__(self, varkeys, results):
+        n_nnz = sum(len(result.row) for result in results)
+        n_terms = sum(len(result.cs) for result in results)
+        row = np.empty(n_nnz, dtype=int)
+        col = np.empty(n_nnz, dtype=int)
+        data = np.empty(n_nnz)
+        self.cs = np.empty(n_terms)
+        self.units, self.k, self.n_posys = [], [], []
+        nnz_start = term_start = 0
+        for result in results:
+            nnz_end = nnz_start + len(result.row)
+            term_end = term_start + len(result.cs)
+            row[nnz_start:nnz_end] = result.row + term_start
+            col[nnz_start:nnz_end] = result.col
+            data[nnz_start:nnz_end] = result.data
+            self.cs[term_start:term_end] = result.cs
+            self.units.extend(result.units)
+            self.k.extend(result.k)
+            self.n_posys.extend(result.n_posys)
+            nnz_start, term_start = nnz_end, term_end
+        self.k = np.array(self.k, dtype=int)
+        self.expmatrix = ExponentMatrix(varkeys, row, col, data, n_terms)
+
+    def posynomials(self, cost):
+        "Returns cost and these posynomials, each made when it's accessed."
+        return _MergedPosynomials(cost, self)
+
+
+class _MergedPosynomials(Sequence):
+    "A program's cost and the MergedPosys of its constraints, made lazily."
+    def __init__(self, cost, merged):
+        self.merged = merged
+        self.starts = np.cumsum(merged.k) - merged.k
+        self._made = {0: cost}
+
+    def __len__(self):
+        return len(self.merged.k) + 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("posynomial index out of range")
+        if i not in self._made:
+            self._made[i] = self._make(i - 1)
+        return self._made[i]
+
+    def __setitem__(self, i, posy):
+        self._made[i % len(self)] = posy
+
+    def _make(self, p_i):
+        "Returns the Posynomial of the p_i-th of the merged posynomials."
+        merged = self.merged
+        matrix = merged.expmatrix
+        start, end = self.starts[p_i], self.starts[p_i] + merged.k[p_i]
+        entries = slice(*np.searchsorted(matrix.row, [start, end]))
+        cols, col = np.unique(matrix.col[entries], return_inverse=True)
+        exps = ExponentMatrix([matrix.keys[j] for j in cols],
+                              matrix.row[entries] - start, col,
+                              matrix.data[entries], end - start)
+        cs = merged.cs[start:end]
+        if merged.units[p_i]:
+            cs = Quantity(cs, merged.units[p_i])
+        return Posynomial(exps, cs, simplify=False)
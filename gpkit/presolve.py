@@ -0,0 +1,465 @@
+"""Presolve routines, which shrink the arrays of a GeometricProgram before
+they are passed to a solver and map the solver's solution back afterwards
+
+All of them work in log space, where the monomial with coefficient c_i and
+exponents A_i is log(c_i) + A_i.dot(y) for y = log(x).
+"""
+from collections import defaultdict
+import numpy as np
+from .small_classes import CootMatrix
+from .segment_ops import segment_sum, segment_logsumexp
+
+REMOVAL_REASONS = ("equalities", "constant", "parallel", "dominated")
+
+
+class PresolvedProgram(object):
+    """The arrays of a GeometricProgram after presolve
+
+    Arguments
+    ---------
+    cs, A, p_idxs, k :
+        The GeometricProgram's arrays, as passed to a solver.
+
+    Attributes
+    ----------
+    cs, A, p_idxs, k :
+        The presolved arrays, to be passed to a solver instead.
+    eliminated : list
+        Indices (into A's columns) of the variables eliminated
+    removed : dict
+        Indices of the posynomials removed for each reason in
+        REMOVAL_REASONS; their duals are zero, except for the pairs
+        removed as "equalities", whose duals are recovered by postsolve.
+    """
+
+    def __init__(self, cs, A, p_idxs, k):
+        self.n_monomials, self.n_vars = len(cs), A.shape[1]
+        self.n_posys = len(k)
+        self._logcs = np.log(cs)
+        self._csr = A.tocsr()
+        self._rows = _LazyRows(self._csr)
+        self._p_idxs = p_idxs
+        self._k = np.array(k, dtype=int)
+        self._touched = set()  # rows changed by eliminations
+        # each elimination is (pivot, row, twin row, row at elimination,
+        #                      log coefficient at elimination, touched rows)
+        self._eliminations = []
+        self.eliminated = []
+        self.removed = {reason: [] for reason in REMOVAL_REASONS}
+        self.cs, self.A, self.p_idxs, self.k = cs, A, p_idxs, k
+
+    def eliminate_equalities(self):
+        """Eliminates a variable with each monomial equality
+
+        A monomial equality appears in a GeometricProgram as a pair of
+        single-monomial posynomials (left/right <= 1 and right/left <= 1)
+        whose log-space rows are negatives of each other. Each pair's row
+        a.dot(y) + b = 0 is solved for one variable (preferring those in the
+        fewest monomials, to limit fill-in), which is then substituted out
+        of every other monomial by Gaussian elimination. Both posynomials
+        are then removed.
+        """
+        pairs = monomial_equalities(self._rows, self._logcs, self._p_idxs,
+                                    self.n_posys)
+        if not pairs:
+            return
+        rows, logcs = self._rows, self._logcs
+        col_rows = defaultdict(set)
+        csc = self._csr.tocsc()
+        for col in range(self.n_vars):
+            col_rows[col] = set(csc.indices[csc.indptr[col]:
+                                            csc.indptr[col+1]])
+        for eq_row, twin in pairs:
+            row = rows[eq_row]
+            if not row:
+                continue  # a constant equality; left to the solver
+            biggest = max(abs(coef) for coef in row.values())
+            pivot = min((col for col, coef in row.items()
+                         if abs(coef) >= 0.01*biggest),
+                        key=lambda col: (len(col_rows[col]), -abs(row[col])))
+            coef = row[pivot]
+            for col in rows[twin]:
+                col_rows[col].discard(twin)  # it's the same constraint
+            touched = []
+            for i in col_rows.pop(pivot):
+                if i == eq_row:
+                    continue
+                other = rows[i]
+                factor = other.pop(pivot)/coef
+                for col, value in row.items():
+                    if col == pivot:
+                        continue
+                    newvalue = other.get(col, 0) - factor*value
+                    if abs(newvalue) > 1e-12*biggest:
+                        other[col] = newvalue
+                        col_rows[col].add(i)
+                    elif col in other:
+                        del other[col]
+                        col_rows[col].discard(i)
+                logcs[i] -= factor*logcs[eq_row]
+                touched.append((i, factor))
+                self._touched.add(i)
+            for col in row:
+                if col != pivot:
+                    col_rows[col].discard(eq_row)
+            touched_rows, factors = zip(*touched) if touched else ([], [])
+            self._eliminations.append((pivot, eq_row, twin, dict(row),
+                                       logcs[eq_row],
+                                       np.array(touched_rows, dtype=int),
+                                       np.array(factors)))
+        self.eliminated = [elim[0] for elim in self._eliminations]
+        self.removed["equalities"] = sorted(self._p_idxs[elim[i]]
+                                            for elim in self._eliminations
+                                            for i in (1, 2))
+
+    def remove_redundant(self):
+        """Removes constraints which are implied by other constraints
+
+        Removes posynomials which are:
+          - "constant": have no variables left and are at most 1
+          - "parallel": single monomials whose log-space rows are positive
+            multiples of another's, which bounds the same direction tighter
+          - "dominated": have the same monomials as another posynomial, but
+            coefficients no larger (so identical duplicates are removed too)
+
+        Removed constraints are inactive at any solution of the rest of the
+        program, so their duals are zero.
+        """
+        # pylint: disable=too-many-locals
+        rows, logcs, p_idxs, k = self._rows, self._logcs, self._p_idxs, self._k
+        excluded = np.zeros(self.n_posys, dtype=bool)
+        excluded[self.removed_posys] = True
+        excluded[0] = True  # the cost
+        nnz = np.diff(self._csr.indptr)
+        for i in self._touched:
+            nnz[i] = len(rows[i])
+        posy_nnz = segment_sum(nnz, p_idxs, self.n_posys)
+        posy_logs = segment_logsumexp(logcs, p_idxs, self.n_posys)
+        constant = ~excluded & (posy_nnz == 0) & (posy_logs <= 1e-12)
+        self.removed["constant"] = list(np.flatnonzero(constant))
+        excluded |= constant
+
+        m_starts = np.cumsum(k) - k
+        tightest = {}
+        for p_i in np.flatnonzero(~excluded & (k == 1) & (posy_nnz > 0)):
+            i = m_starts[p_i]
+            scale = abs(rows[i][min(rows[i])])
+            key = frozenset((col, round(value/scale, 12))
+                            for col, value in rows[i].items())
+            # this constraint is key.dot(y) <= -bound
+            bound = logcs[i]/scale
+            if key not in tightest:
+                tightest[key] = (p_i, bound)
+                continue
+            other, otherbound = tightest[key]
+            if bound > otherbound:
+                tightest[key] = (p_i, bound)
+                p_i = other
+            self.removed["parallel"].append(p_i)
+        self.removed["parallel"].sort()
+        excluded[self.removed["parallel"]] = True
+
+        # group posynomials by a hash of their exponents, then compare
+        weights = np.sqrt(np.arange(2, self.n_vars + 2))
+        hashes = self._csr.dot(weights)
+        for i in self._touched:
+            hashes[i] = sum(value*weights[col]
+                            for col, value in rows[i].items())
+        hashsums = segment_sum(hashes, p_idxs, self.n_posys)
+        hashsquares = segment_sum(hashes**2, p_idxs, self.n_posys)
+        groups = defaultdict(list)
+        for p_i in np.flatnonzero(~excluded & (k > 1)):
+            groups[(k[p_i], "%.10g" % hashsums[p_i],
+                    "%.10g" % hashsquares[p_i])].append(p_i)
+        dominated = set()
+        for group in groups.values():
+            if len(group) > 1:
+                dominated.update(self._dominated(group, m_starts))
+        self.removed["dominated"] = sorted(dominated)
+
+    def _dominated(self, posys, m_starts):
+        "Returns those of posys dominated by another in posys."
+        monomials = []
+        for p_i in posys:
+            start = m_starts[p_i]
+            monomials.append({frozenset(self._rows[i].items()): self._logcs[i]
+                              for i in range(start, start + self._k[p_i])})
+        dominated = set()
+        for a, monos_a in enumerate(monomials):
+            for b in range(a + 1, len(posys)):
+                monos_b = monomials[b]
+                if posys[b] in dominated or set(monos_a) != set(monos_b):
+                    continue
+                if all(monos_a[exp] <= monos_b[exp] for exp in monos_a):
+                    dominated.add(posys[a])
+                    break
+                elif all(monos_b[exp] <= monos_a[exp] for exp in monos_a):
+                    dominated.add(posys[b])
+        return dominated
+
+    @property
+    def removed_posys(self):
+        "Indices of every posynomial removed."
+        return sorted(p_i for removed in self.removed.values()
+                      for p_i in removed)
+
+    def is_trivial(self):
+        "True if presolve didn't change anything."
+        return not self.removed_posys
+
+    def summary(self):
+        "Describes what presolve removed."
+        removed = ", ".join("%i %s" % (len(self.removed[reason]), reason)
+                            for reason in REMOVAL_REASONS
+                            if self.removed[reason])
+        return ("Presolve eliminated %i variables and removed %i"
+                " posynomials (%s)." % (len(self.eliminated),
+                                        len(self.removed_posys), removed))
+
+    def assemble(self):
+        """Builds the presolved cs, A, p_idxs and k
+
+        Returns False if the presolved program can't be solved as is
+        (if it has no variables left, or if a variable was left only in
+        removed monomials), in which case the original arrays should be used.
+        """
+        kept_posys = np.ones(self.n_posys, dtype=bool)
+        kept_posys[self.removed_posys] = False
+        kept_rows = np.flatnonzero(kept_posys[self._p_idxs])
+        kept_cols = np.ones(self.n_vars, dtype=bool)
+        kept_cols[self.eliminated] = False
+        self._kept_rows, self._kept_cols = kept_rows, np.flatnonzero(kept_cols)
+        new_cols = np.cumsum(kept_cols) - 1
+        rowlens = [max(len(self._rows[i]), 1) for i in kept_rows]
+        row = np.repeat(np.arange(len(kept_rows)), rowlens)
+        col = np.zeros(len(row), dtype=int)
+        data = np.zeros(len(row))
+        used = np.zeros(self.n_vars, dtype=bool)
+        n = 0
+        for i in kept_rows:
+            for j, value in self._rows[i].items():
+                col[n], data[n] = new_cols[j], value
+                used[j] = True
+                n += 1
+            if not self._rows[i]:
+                n += 1  # a constant monomial; left as a zero at (row, 0)
+        if not len(self._kept_cols) or not used[kept_cols].all():
+            return False
+        A = CootMatrix(row, col, data)
+        A.shape = [len(kept_rows), len(self._kept_cols)]
+        new_posys = np.cumsum(kept_posys) - 1
+        self.cs = np.exp(self._logcs[kept_rows])
+        self.A = A
+        self.p_idxs = new_posys[self._p_idxs[kept_rows]]
+        self.k = np.bincount(self.p_idxs, minlength=kept_posys.sum()).tolist()
+        return True
+
+    def postsolve(self, primal, nu):
+        """Maps a solution of the presolved program back to the original
+
+        Arguments
+        ---------
+        primal : array
+            Log-space values of the presolved program's variables
+        nu : array
+            Dual variables of the presolved program's monomials
+
+        Returns
+        -------
+        primal, nu : arrays
+            The same for the original program
+        """
+        full_primal = np.zeros(self.n_vars)
+        full_primal[self._kept_cols] = primal
+        full_nu = np.zeros(self.n_monomials)
+        full_nu[self._kept_rows] = nu
+        # each variable in terms of those eliminated after it
+        for pivot, _, _, row, logc, _, _ in reversed(self._eliminations):
+            dot = sum(value*full_primal[col]
+                      for col, value in row.items() if col != pivot)
+            full_primal[pivot] = -(logc + dot)/row[pivot]
+        # equality multipliers, from stationarity on each eliminated variable;
+        # each is the difference between the duals of its two monomials
+        multipliers = {}
+        for _, eq_row, _, _, _, touched, factors in \
+                reversed(self._eliminations):
+            multiplier = -full_nu[touched].dot(factors)
+            full_nu[eq_row] = multipliers[eq_row] = multiplier
+        for _, eq_row, twin, _, _, _, _ in self._eliminations:
+            multiplier = multipliers[eq_row]
+            full_nu[eq_row] = max(multiplier, 0)
+            full_nu[twin] = max(-multiplier, 0)
+        return full_primal, full_nu
+
+
+class _LazyRows(dict):
+    "Each row of a CSR matrix as a dict of {column: value}, made on access."
+    def __init__(self, csr):
+        dict.__init__(self)
+        self.csr = csr
+
+    def __missing__(self, i):
+        start, end = self.csr.indptr[i], self.csr.indptr[i+1]
+        row = self[i] = dict(zip(self.csr.indices[start:end],
+                                 self.csr.data[start:end]))
+        return row
+
+
+def monomial_equalities(rows, logcs, p_idxs, n_posys):
+    """Finds pairs of single-monomial posynomials forming an equality
+
+    Arguments
+    ---------
+    rows : dict or list of dicts
+        Each monomial's exponents, as {column: exponent}
+    logcs : array
+        Each monomial's log coefficient
+    p_idxs : array
+        Each monomial's posynomial index
+    n_posys : int
+        Number of posynomials
+
+    Returns
+    -------
+    list of (row, twin row) pairs, ordered by number of variables
+    """
+    single = np.bincount(p_idxs, minlength=n_posys) == 1
+    single[0] = False  # the cost
+    candidates = {}
+    pairs = []
+    for i in np.flatnonzero(single[p_idxs]):
+        row = rows[i]
+        if not row:
+            continue
+        twin = candidates.pop(frozenset((c, -v) for c, v in row.items()), None)
+        if twin is not None and abs(logcs[i] + logcs[twin]) <= \
+                1e-12*max(1, abs(logcs[i])):
+            pairs.append((twin, i))
+        else:
+            candidates[frozenset(row.items())] = i
+    pairs.sort(key=lambda pair: len(rows[pair[0]]))
+    return pairs
+
+
+def presolve_arrays(cs, A, p_idxs, k):
+    """Returns a PresolvedProgram of the given arrays, or None
+
+    None is returned if presolve would not change the arrays.
+    """
+    presolved = PresolvedProgram(cs, A, p_idxs, k)
+    presolved.eliminate_equalities()
+    presolved.remove_redundant()
+    if presolved.is_trivial() or not presolved.assemble():
+        return None
+    return presolved
+
+
+def split_monomial_rows(cs, A, k):
+    """Sorts the rows of a GeometricProgram into blocks for a solver
+
+    Posynomial constraints with a single monomial are linear inequalities in
+    log space, and pairs of them forming a monomial equality are linear
+    equalities, which solvers can handle more cheaply than general
+    posynomials.
+
+    Arguments
+    ---------
+    cs, A, k :
+        The GeometricProgram's arrays, as passed to a solver.
+
+    Returns
+    -------
+    blocks : dict of int arrays
+        "posynomial": rows of the cost and of multi-monomial posynomials
+        "inequality": rows of the other single-monomial posynomials
+        "equality": rows of one half of each monomial equality
+        "twin": rows of the other half of each monomial equality
+    Since each of the last three is its own posynomial, their rows can be
+    mapped to posynomial indices with the GeometricProgram's p_idxs.
+    """
+    k = np.array(k, dtype=int)
+    p_idxs = np.repeat(np.arange(len(k)), k)
+    single = (k == 1)[p_idxs]
+    single[0] = False  # the cost stays in the posynomial block
+    pairs = monomial_equalities(_LazyRows(A.tocsr()), np.log(cs), p_idxs,
+                                len(k))
+    equality = np.array([eq_row for eq_row, _ in pairs], dtype=int)
+    twin = np.array([twin for _, twin in pairs], dtype=int)
+    inequality = single.copy()
+    inequality[equality] = False
+    inequality[twin] = False
+    return {"posynomial": np.flatnonzero(~single),
+            "inequality": np.flatnonzero(inequality),
+            "equality": equality, "twin": twin}
+
+
+def propagate_bounds(cs, A, p_idxs, k, passes=20, tol=1e-9):
+    """Bounds each variable by interval arithmetic on the constraints
+
+    Every monomial of a constraint posynomial is at most one minus the
+    others, so with the log-space bounds y_lo <= y <= y_hi each row gives
+
+        log(c_i) + A_i.dot(y) <= log(1 - sum of the others' minima)
+
+    which bounds each of its variables in terms of the others' bounds.
+    Starting from the bounds given by single-variable monomial constraints,
+    this is repeated until the bounds stop changing (or for `passes`
+    passes). If the smallest value a posynomial can take within the bounds
+    is more than 1 the program is infeasible.
+
+    Arguments
+    ---------
+    cs, A, p_idxs, k :
+        The GeometricProgram's arrays, as passed to a solver.
+
+    Returns
+    -------
+    lower, upper : arrays
+        Log-space bounds of each variable (possibly infinite)
+    infeasible : int or None
+        Index of a posynomial which can't be satisfied within the bounds
+    """
+    # pylint: disable=too-many-locals
+    n_posys, n_vars = len(k), A.shape[1]
+    logcs = np.log(cs)
+    coo = A.tocsr().tocoo()
+    keep = (coo.data != 0) & (p_idxs[coo.row] != 0)  # the cost has no bound
+    rows, cols, data = coo.row[keep], coo.col[keep], coo.data[keep]
+    lower, upper = np.full(n_vars, -np.inf), np.full(n_vars, np.inf)
+    positive = data > 0
+    for _ in range(passes + 1):
+        # the smallest log value of each term and monomial within the bounds
+        terms = np.where(positive, data*lower[cols], data*upper[cols])
+        finite = np.isfinite(terms)
+        n_infinite = np.bincount(rows[~finite], minlength=len(cs))
+        finite_sums = segment_sum(np.where(finite, terms, 0), rows, len(cs))
+        monomials = np.where(n_infinite == 0, logcs + finite_sums, -np.inf)
+        monomials[p_idxs == 0] = -np.inf
+        posys = segment_logsumexp(monomials, p_idxs, n_posys)
+        if posys.max() > tol:
+            return lower, upper, int(np.argmax(posys))
+        # the largest log value each monomial can take
+        others = segment_sum(np.exp(monomials), p_idxs, n_posys)[p_idxs]
+        others -= np.exp(monomials)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            allowances = np.where(others < 1, np.log1p(-others), 0)
+        # the smallest log value of the rest of each term's monomial
+        # (if a term is the only infinite one, that's the rest's finite sum)
+        rests = np.full(len(terms), -np.inf)
+        only_finite = finite & (n_infinite[rows] == 0)
+        rests[only_finite] = (finite_sums[rows[only_finite]]
+                              - terms[only_finite])
+        only_infinite = ~finite & (n_infinite[rows] == 1)
+        rests[only_infinite] = finite_sums[rows[only_infinite]]
+        limits = (allowances[rows] - logcs[rows] - rests)/data
+        new_lower, new_upper = lower.copy(), upper.copy()
+        np.minimum.at(new_upper, cols[positive], limits[positive])
+        np.maximum.at(new_lower, cols[~positive], limits[~positive])
+        with np.errstate(invalid="ignore"):  # from infinite bounds
+            tightened = np.hstack((upper - new_upper, new_lower - lower))
+            scale = 1 + abs(np.hstack((new_upper, new_lower)))
+            changed = (tightened > 1e-6*scale).any()
+        lower, upper = new_lower, new_upper
+        if not changed:
+            break
+    return lower, upper, None
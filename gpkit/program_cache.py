@@ -0,0 +1,161 @@
+"""Caches the arrays of compiled programs on disk, keyed by model structure
+
+Compiling a large model (substituting into and simplifying each of its
+constraints) can take far longer than solving it, and is repeated in every
+new process or session. The arrays of a CompiledGeometricProgram don't
+depend on the values of its parameters, so a program whose cost,
+constraints and variables have the same structure as one compiled before
+can load them from disk instead (see ProgramCache).
+"""
+import os
+import hashlib
+from zipfile import BadZipfile
+import numpy as np
+from .nomials import PosynomialInequality
+from .small_scripts import mag
+
+# changes whenever the entries' arrays do, so that old entries are not loaded
+CACHE_FORMAT = 1
+
+
+class ProgramCache(object):
+    """A directory of the arrays of compiled programs
+
+    Each entry is a .npz file named by the structural key of the model it
+    was compiled from (see structure_key), holding the program's A matrix,
+    the number of monomials in each posynomial, the log of its coefficients
+    with all parameters at 1 and the matrix P which maps the log of the
+    parameters to the log of the coefficients, as well as the position of
+    each of its free variables and parameters in the key's variable order.
+
+    Arguments
+    ---------
+    directory : str
+        Where the entries are kept; created if it doesn't exist yet.
+
+    Examples
+    --------
+    >>> cgp = m.compile(cache="gpkit_cache")  # compiles m, saving its arrays
+    >>> cgp = m.compile(cache="gpkit_cache")  # (later) loads them instead
+    >>> cgp.from_cache
+    True
+    """
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+
+    def path(self, key):
+        "Returns the path of key's entry."
+        return os.path.join(self.directory, key + ".npz")
+
+    def load(self, key):
+        "Returns the arrays saved under key, or None if there are none."
+        try:
+            npz = np.load(self.path(key))
+        except IOError:
+            return None
+        try:
+            return {name: npz[name] for name in npz.files}
+        except (IOError, ValueError, BadZipfile):
+            return None  # an unfinished or corrupted entry; it'll be replaced
+        finally:
+            npz.close()
+
+    def save(self, key, arrays):
+        """Saves a dict of arrays under key
+
+        The entry is written to a temporary file which then replaces any
+        previous one, so processes loading the entry never see half of it.
+        """
+        tmppath = os.path.join(self.directory,
+                               "%s.%i.tmp.npz" % (key, os.getpid()))
+        np.savez(tmppath, **arrays)
+        os.rename(tmppath, self.path(key))
+
+
+def structure_key(cost, constraints, varkeys, constants, parameters):
+    """Returns a hash of a program's structure, and its variables in order
+
+    The hash covers the description of each variable (apart from its value),
+    the exponents and coefficients of the cost and of each constraint's
+    unsubstituted posynomials, which constants are parameters, and the
+    values of those which aren't. The variables are ordered by their
+    descriptions, so that each can be found in a later session.
+
+    Arguments
+    ---------
+    cost : Posynomial
+    constraints : ConstraintSet
+    varkeys : KeySet
+        The VarKeys of the cost and constraints
+    constants : dict
+        Every substitution, by VarKey
+    parameters : set or dict
+        The constants which are parameters
+
+    Returns
+    -------
+    (str, list of VarKeys), or (None, None) if the structure can't be hashed:
+    if two variables have the same description, or if there are constraints
+    other than PosynomialInequalities, MonomialEqualities and sets of them
+    (whose posynomials <= 1 might depend on the values substituted into
+    them, as those of SignomialInequalities do).
+    """
+    signatures = {key: _signature(key) for key in varkeys}
+    order = sorted(signatures, key=signatures.get)
+    if len(set(signatures.values())) < len(order):
+        return None, None
+    idxs = {key: i for i, key in enumerate(order)}
+    sha = hashlib.sha1()
+    _update(sha, "gpkit program cache format %i\n" % CACHE_FORMAT)
+    for key in order:
+        _update(sha, signatures[key])
+    _update(sha, _nomial_str(cost, idxs))
+    if not _hash_constraints(sha, constraints, idxs):
+        return None, None
+    for key in order:
+        if key in parameters:
+            _update(sha, "parameter %i\n" % idxs[key])
+        elif key in constants:
+            _update(sha, "constant %i %r\n" % (idxs[key], constants[key]))
+    return sha.hexdigest(), order
+
+
+def _update(sha, string):
+    "Adds string to sha (encoded, as python 3's hashlib needs bytes)."
+    sha.update(string.encode("utf-8"))
+
+
+def _signature(varkey):
+    "Returns a description of varkey which doesn't depend on its value."
+    descr = sorted((name, repr(value)) for name, value in varkey.descr.items()
+                   if name != "value")
+    return "%r\n" % descr
+
+
+def _nomial_str(nomial, idxs):
+    "Returns a description of nomial's exponents (by variable), cs and units."
+    exps = [sorted((idxs[var], float(x)) for var, x in exp.items())
+            for exp in nomial.exps]
+    cs = [float(c) for c in np.ravel(mag(nomial.cs))]
+    units = str(nomial.cs.units) if hasattr(nomial.cs, "units") else None
+    return "%r\n" % ((exps, cs, units),)
+
+
+def _hash_constraints(sha, constraints, idxs):
+    "Adds constraints' structure to sha; returns False if it can't be."
+    # pylint: disable=protected-access
+    from .constraints.set import ConstraintSet
+    for constraint in constraints:
+        _update(sha, "%s\n" % constraint.__class__.__name__)
+        if isinstance(constraint, PosynomialInequality):
+            for posy in constraint._unsubbed:
+                _update(sha, _nomial_str(posy, idxs))
+        elif not isinstance(constraint, ConstraintSet):
+            return False
+        elif not _hash_constraints(sha, constraint, idxs):
+            return False
+        _update(sha, "end\n")
+    return True
@@ -0,0 +1,100 @@
+"""Rescales the arrays of a GeometricProgram before they are passed to a
+solver, and unscales the solver's solution afterwards
+
+Models whose constants have units like Pa and N can have coefficients
+spanning many orders of magnitude, which makes interior-point solvers take
+more iterations and sometimes stop short of optimality. In log space,
+with y = log(x), the monomial with coefficient c_i and exponents A_i is
+log(c_i) + A_i.dot(y), so shifting the variables (y = z + shifts) only
+moves the coefficients, and monomial constraints (which are linear) can
+be divided through by a positive number.
+"""
+import numpy as np
+from .small_classes import CootMatrix
+from .segment_ops import segment_max
+
+
+class ScaledProgram(object):
+    """The arrays of a GeometricProgram after scaling
+
+    The variables are shifted by the least-squares solution of
+    log(cs) + A.dot(shifts) = 0 (clipped into their bounds, if given),
+    which brings the coefficients as close to 1 as possible. The cost is
+    then divided by its largest coefficient, and each single-monomial
+    constraint is raised to the power which makes its largest exponent 1
+    in magnitude.
+
+    Arguments
+    ---------
+    cs, A, p_idxs, k :
+        The GeometricProgram's arrays, as passed to a solver.
+    lower, upper : arrays (optional)
+        Log-space bounds on each variable (as from presolve.propagate_bounds)
+
+    Attributes
+    ----------
+    cs, A, p_idxs, k :
+        The scaled arrays, to be passed to a solver instead.
+    shifts : array
+        How much the log of each variable was shifted by
+    cost_scale : float
+        What the cost was divided by
+    posy_scales : array
+        The power each posynomial was raised to the inverse of
+    """
+
+    def __init__(self, cs, A, p_idxs, k, lower=None, upper=None):
+        from scipy.sparse.linalg import lsqr
+        csr = A.tocsr()
+        logcs = np.log(cs)
+        self.shifts = np.zeros(csr.shape[1])
+        if csr.T.dot(logcs).any():  # otherwise lsqr prints that x = 0
+            self.shifts = lsqr(csr, -logcs, atol=1e-6, btol=1e-6)[0]
+        if lower is not None:
+            self.shifts = np.clip(self.shifts, lower, upper)
+        logcs = logcs + csr.dot(self.shifts)
+        is_cost = (p_idxs == 0)
+        logcost_scale = logcs[is_cost].max()
+        logcs[is_cost] -= logcost_scale
+        self.cost_scale = np.exp(logcost_scale)
+
+        row, col, data = map(np.asarray, (A.row, A.col, A.data))
+        single = (np.array(k) == 1)
+        single[0] = False  # the cost's duals have to sum to 1
+        row_scales = segment_max(abs(data), row, len(cs))
+        row_scales[~single[p_idxs] | (row_scales <= 0)] = 1
+        self.posy_scales = np.ones(len(k))
+        self.posy_scales[p_idxs] = row_scales
+        self.A = CootMatrix(row, col, data/row_scales[row])
+        self.A.shape = A.shape
+        self.cs = np.exp(logcs/row_scales)
+        self.p_idxs, self.k = p_idxs, k
+
+    def is_trivial(self):
+        "True if scaling didn't change anything."
+        return (not np.abs(self.shifts).max() > 1e-12
+                and abs(np.log(self.cost_scale)) <= 1e-12
+                and (self.posy_scales == 1).all())
+
+    def unscale(self, solver_out):
+        """Maps a solver's solution of the scaled arrays back to the originals
+
+        solver_out's "primal", "nu" and "la" (both are needed; see
+        GeometricProgram._generate_nula) and "objective" are changed in place.
+        """
+        solver_out["primal"] = solver_out["primal"] + self.shifts
+        solver_out["la"] = solver_out["la"]/self.posy_scales
+        solver_out["nu"] = solver_out["nu"]/self.posy_scales[self.p_idxs]
+        if "objective" in solver_out:
+            solver_out["objective"] = solver_out["objective"]*self.cost_scale
+
+
+def scale_arrays(cs, A, p_idxs, k, lower=None, upper=None):
+    """Returns a ScaledProgram of the given arrays, or None
+
+    None is returned if scaling would not change the arrays.
+    """
+    scaled = ScaledProgram(cs, A, p_idxs, k, lower, upper)
+    if scaled.is_trivial():
+        return None
+    return scaled
@@ -0,0 +1,55 @@
+"""Reductions over segments of a flat array, e.g. the monomials of each
+posynomial in a GeometricProgram (as given by its `p_idxs`)
+
+Each function takes `values`, an array with one entry per monomial, `idxs`,
+the segment (posynomial) index of each entry, and `n_segments`, the number
+of segments, and runs in time linear in len(values).
+"""
+import numpy as np
+
+
+def segment_sum(values, idxs, n_segments):
+    "Returns the sum of values in each segment (0 for empty segments)."
+    return np.bincount(idxs, weights=values, minlength=n_segments)
+
+
+def segment_max(values, idxs, n_segments):
+    "Returns the maximum value in each segment (-inf for empty segments)."
+    out = np.full(n_segments, -np.inf)
+    if len(values):
+        if np.all(idxs[1:] >= idxs[:-1]):
+            # sorted segments, as in GeometricProgram.p_idxs
+            starts = np.flatnonzero(np.hstack(([True],
+                                               idxs[1:] != idxs[:-1])))
+            out[idxs[starts]] = np.maximum.reduceat(values, starts)
+        else:
+            np.maximum.at(out, idxs, values)
+    return out
+
+
+def _shifted_exp(values, idxs, n_segments):
+    "Returns exp(values - segment_max) and the finite segment maxima."
+    maxes = segment_max(values, idxs, n_segments)
+    maxes[~np.isfinite(maxes)] = 0
+    return np.exp(values - maxes[idxs]), maxes
+
+
+def segment_logsumexp(values, idxs, n_segments):
+    """Returns log(sum(exp(values))) for each segment, without overflow
+
+    For the log-space monomials of a GeometricProgram, log(cs) + A.dot(x),
+    this is the log of the value of each posynomial at x.
+    """
+    exps, maxes = _shifted_exp(values, idxs, n_segments)
+    with np.errstate(divide="ignore"):
+        return np.log(segment_sum(exps, idxs, n_segments)) + maxes
+
+
+def segment_softmax(values, idxs, n_segments):
+    """Returns exp(values) normalized to sum to 1 within each segment
+
+    For the log-space monomials of a GeometricProgram this is each
+    monomial's fraction of its posynomial's value.
+    """
+    exps, _ = _shifted_exp(values, idxs, n_segments)
+    return exps / segment_sum(exps, idxs, n_segments)[idxs]
@@ -0,0 +1,191 @@
+"""Publishes the arrays of compiled programs in shared memory, so that
+worker processes can solve them for many parameter values
+
+Sending a Model (or a program) to each worker of a pool means pickling it
+for every task, and every worker then holds its own copy of it. The arrays
+of a CompiledGeometricProgram are all a solver needs, though, and they
+don't depend on the values of its parameters: a SharedProgram copies them
+once into a block of shared memory, which each worker attaches to (without
+copying) when it starts. Each task is then only the vector of the log of
+the parameters' values, and each result only the solver's primal and dual
+solutions, from which the parent program builds the usual result.
+
+Workers never see the program's VarKeys (which can't be pickled); they
+solve an array-only program whose variables and parameters are numbered in
+the parent's column order.
+"""
+import sys
+import numpy as np
+from .small_classes import SolverLog
+
+# order in which the arrays are laid out in shared memory
+ARRAY_NAMES = ("row", "col", "data", "k", "logcs0",
+               "P_data", "P_indices", "P_indptr")
+# the program solved by each worker process, set by _attach_worker
+_WORKER = None
+
+
+class SharedProgram(object):
+    """The arrays of a CompiledGeometricProgram, in shared memory
+
+    Uses multiprocessing.shared_memory where it exists (Python 3.8+), so
+    that any process on the same machine can attach by name; otherwise a
+    multiprocessing.sharedctypes.RawArray, which can only be passed to
+    processes as they are started (e.g. as `initargs` of a Pool).
+
+    Arguments
+    ---------
+    program : CompiledGeometricProgram
+        The program whose arrays to copy into shared memory
+
+    Attributes
+    ----------
+    handle : tuple
+        What `attach()` needs to find the arrays from another process
+
+    Examples
+    --------
+    >>> shared = cgp.share()
+    >>> outs = shared.solve([logparams_1, logparams_2], processes=4)
+    >>> shared.close()
+    """
+
+    def __init__(self, program):
+        # pylint: disable=protected-access
+        P = program._P.tocsc()
+        arrays = [program.A.row, program.A.col, program.A.data,
+                  program.k, program._logcs0, P.data, P.indices, P.indptr]
+        arrays = [np.ascontiguousarray(array) for array in arrays]
+        layout, nbytes = [], 0
+        for name, array in zip(ARRAY_NAMES, arrays):
+            layout.append((name, array.dtype.str, len(array), nbytes))
+            nbytes += -(-array.nbytes // 8)*8  # keeps each array aligned
+        self._memory, name = _allocate(max(nbytes, 1))
+        buf = _buffer(self._memory)
+        for (_, dtype, length, offset), array in zip(layout, arrays):
+            np.frombuffer(buf, dtype, length, offset)[:] = array
+        del buf  # shared_memory can't be closed while views exist
+        shapes = (tuple(program.A.shape), P.shape, len(program.varlocs))
+        self.handle = (name if name else self._memory, layout, shapes)
+
+    def pool(self, processes=None, solver=None, **kwargs):
+        """Returns a Pool of processes which have attached to the arrays
+
+        Arguments
+        ---------
+        processes : int (optional)
+            Number of processes; by default, the number of CPUs.
+        solver : str (optional)
+            Solver (as for GeometricProgram.solve) the workers use.
+        **kwargs :
+            Passed to each worker's GeometricProgram.solve.
+        """
+        from multiprocessing import Pool
+        return Pool(processes, _attach_worker,
+                    (self.handle, solver, kwargs))
+
+    def solve(self, tasks, processes=None, solver=None, pool=None, **kwargs):
+        """Solves the program for each vector of log parameter values
+
+        Arguments
+        ---------
+        tasks : iterable of arrays
+            The log of each parameter's value, in the column order of P
+        processes, solver, **kwargs :
+            As for `pool()`, which is used to make the Pool
+        pool : Pool (optional)
+            A Pool made by `pool()`, to use instead of making a new one.
+
+        Returns
+        -------
+        list of solver_out dicts (with "primal", "nu", "la", "objective"),
+        or of strings, the errors of the tasks whose solve failed
+        """
+        if pool is not None:
+            return pool.map(_solve_task, tasks)
+        pool = self.pool(processes, solver, **kwargs)
+        try:
+            return pool.map(_solve_task, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    def close(self):
+        "Frees the shared memory; processes attached to it keep their views."
+        if hasattr(self._memory, "unlink"):
+            self._memory.close()
+            self._memory.unlink()
+        self._memory, self.handle = None, None
+
+
+def attach(handle):
+    """Returns the arrays of the SharedProgram whose handle this is
+
+    Returns
+    -------
+    arrays : dict
+        Numpy views of each of the ARRAY_NAMES, the shapes of A and P,
+        and the number of free variables ("n_vars")
+    memory : object
+        The shared memory the views are of, to be kept while they're used
+    """
+    memory, layout, (shape, P_shape, n_vars) = handle
+    if isinstance(memory, str):
+        from multiprocessing.shared_memory import SharedMemory
+        memory = SharedMemory(name=memory)
+    buf = _buffer(memory)
+    arrays = {name: np.frombuffer(buf, dtype, length, offset)
+              for name, dtype, length, offset in layout}
+    arrays["shape"], arrays["P_shape"] = np.array(shape), np.array(P_shape)
+    arrays["n_vars"] = n_vars
+    return arrays, memory
+
+
+def _allocate(nbytes):
+    "Returns a block of nbytes of shared memory, and its name if it has one."
+    try:
+        from multiprocessing.shared_memory import SharedMemory
+    except ImportError:
+        from multiprocessing.sharedctypes import RawArray
+        return RawArray("b", nbytes), None
+    memory = SharedMemory(create=True, size=nbytes)
+    return memory, memory.name
+
+
+def _buffer(memory):
+    "Returns a buffer of memory's contents which numpy can view."
+    return getattr(memory, "buf", memory)
+
+
+def _attach_worker(handle, solver, kwargs):
+    "Pool initializer: builds this worker's program from the shared arrays."
+    # pylint: disable=global-statement,protected-access
+    global _WORKER
+    from .compiled_program import CompiledGeometricProgram
+    arrays, memory = attach(handle)
+    program = CompiledGeometricProgram.__new__(CompiledGeometricProgram)
+    program.cost, program.constraints = None, []
+    program.substitutions, program.posynomials = {}, []
+    program.unusedsubkeys = set()
+    n_vars, n_params = arrays["n_vars"], arrays["P_shape"][1]
+    program._load_arrays(arrays, range(n_vars), range(n_params),
+                         np.zeros(n_params), verbosity=0)
+    _WORKER = (program, memory, solver, kwargs)
+
+
+def _solve_task(logparams):
+    "Solves the worker's program with the parameters at exp(logparams)."
+    # pylint: disable=protected-access
+    program, _, solver, kwargs = _WORKER
+    program._logparams = np.array(logparams, dtype=float)
+    program._update_cs()
+    original_stdout = sys.stdout
+    try:
+        sys.stdout = SolverLog()
+        program.solve(solver, verbosity=0, **kwargs)
+    except (RuntimeWarning, ValueError) as err:
+        return str(err)
+    finally:
+        sys.stdout = original_stdout
+    return {key: program.solver_out[key]
+            for key in ("status", "primal", "nu", "la", "objective")}
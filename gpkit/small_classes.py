@@ -16,7 +16,7 @@ CootMatrixTuple = namedtuple('CootMatrix', ['row', 'col', 'data'])
 
 def matrix_converter(name):
     "Generates conversion function."
-    def to_(self):  # used in tocoo, tocsc, etc below
+    def to_(self):  # used in tocoo, todia, etc below
         "Converts to another type of matrix."
         # pylint: disable=unused-variable
         return getattr(self.tocsr(), "to"+name)()
@@ -24,8 +24,15 @@ def matrix_converter(name):
 
 
 class CootMatrix(CootMatrixTuple):
-    "A very simple sparse matrix representation."
+    """A very simple sparse matrix representation.
+
+    Can be built incrementally from lists with `append`, or all at once from
+    preallocated arrays (as `genA` does). Conversions to scipy's CSR and CSC
+    formats are cached, so repeated products with the same matrix are cheap;
+    `append` clears that cache.
+    """
     shape = None
+    _converted = None
 
     def append(self, row, col, data):
         "Appends entry to matrix."
@@ -40,17 +47,40 @@ class CootMatrix(CootMatrixTuple):
         self.row.append(row)
         self.col.append(col)
         self.data.append(data)
+        self._converted = None
+
+    def __eq__(self, other):
+        "Elementwise comparison, so that array-backed matrices compare."
+        if not isinstance(other, CootMatrixTuple):
+            return NotImplemented
+        return all(np.array_equal(a, b) for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        return not self == other
 
     tocoo = matrix_converter("coo")
-    tocsc = matrix_converter("csc")
     todia = matrix_converter("dia")
     todok = matrix_converter("dok")
     todense = matrix_converter("dense")
 
+    def _cached(self, fmt):
+        "Returns a (cached) scipy sparse matrix of format fmt."
+        if self._converted is None:
+            self._converted = {}
+        if fmt not in self._converted:
+            from scipy.sparse import coo_matrix
+            shape = tuple(self.shape) if self.shape else None
+            coo = coo_matrix((self.data, (self.row, self.col)), shape=shape)
+            self._converted[fmt] = getattr(coo, "to"+fmt)()
+        return self._converted[fmt]
+
     def tocsr(self):
         "Converts to a Scipy sparse csr_matrix"
-        from scipy.sparse import csr_matrix
-        return csr_matrix((self.data, (self.row, self.col)))
+        return self._cached("csr")
+
+    def tocsc(self):
+        "Converts to a Scipy sparse csc_matrix"
+        return self._cached("csc")
 
     def dot(self, arg):
         "Returns dot product with arg."
@@ -72,6 +102,11 @@ class SolverLog(list):
         if self.verbosity > 0:
             self.output.write(writ)
 
+    def flush(self):
+        "Flushes the output, if it's being written to."
+        if self.verbosity > 0 and hasattr(self.output, "flush"):
+            self.output.flush()
+
 
 class DictOfLists(dict):
     "A hierarchy of dicionaries, with lists at the bottom."
@@ -134,10 +169,10 @@ def _enray_and_unit_dict(d_in, d_out, unitless_keys=(), united=False):
     "Recursively turns lists into numpy arrays."
     for k, v in d_in.items():
         if isinstance(v, dict):
-            if k in unitless_keys:
-                united = False
+            # only the items under k are unitless, not k's siblings
+            subunited = united and k not in unitless_keys
             d_out[k] = _enray_and_unit_dict(v, v.__class__(),
-                                            unitless_keys, united)
+                                            unitless_keys, subunited)
         else:
             if hasattr(v[0], "units"):
                 # if the first element of the list alrady has units,
@@ -3,6 +3,7 @@ from collections import Iterable
 import numpy as np
 from .nomials import NomialArray, Monomial
 from .small_classes import Strings, DictOfLists
+from .small_classes import _enlist_dict, _append_dict, _enray_and_unit_dict
 from .small_scripts import unitstr, mag
 
 
@@ -45,12 +46,115 @@ class SolutionArray(DictOfLists):
                     "variables": "Variables",
                     "sensitivities": "Sensitivities"}
 
+    _results, _deferred, _unit_args = (), (), None
+
     def __len__(self):
         try:
             return len(self["cost"])
         except TypeError:
             return 1
 
+    def append(self, sol):
+        """Appends a result dict to the held lists
+
+        The items of a LazyResult (see GeometricProgram.solve) which haven't
+        been built when the first result is appended aren't built now, but
+        only when first accessed (for every appended result at once).
+        """
+        if not hasattr(self, "initialized"):
+            self._deferred = set(getattr(sol, "pending", ()))
+            self._results = []
+        if self._deferred:
+            self._results.append(sol)
+            sol = {key: sol[key] for key in sol if key not in self._deferred}
+        if not hasattr(self, "initialized"):
+            dict.update(self, _enlist_dict(sol, {}))
+            self.initialized = True
+        else:
+            _append_dict(sol, self)
+
+    def to_united_array(self, unitless_keys=(), united=False):
+        "Converts all lists into arrays, now or when they're first built."
+        self._unit_args = (unitless_keys, united)
+        _enray_and_unit_dict(dict(dict.items(self)), self,
+                             unitless_keys, united)
+
+    def _build(self, key):
+        "Builds a deferred item from each appended result."
+        built = DictOfLists()
+        for result in self._results:
+            built.append({key: result[key]})
+        if self._unit_args:
+            built.to_united_array(*self._unit_args)
+        self._deferred.discard(key)
+        if not self._deferred:
+            self._results = []
+        dict.__setitem__(self, key, built[key])
+
+    def _build_all(self):
+        "Builds every deferred item."
+        for key in list(self._deferred):
+            self._build(key)
+
+    def __getitem__(self, key):
+        if key in self._deferred:
+            self._build(key)
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        if key in self._deferred:
+            self._deferred.discard(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if key in self._deferred:
+            self._deferred.discard(key)
+        else:
+            dict.__delitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._deferred or dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        self._build_all()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self._build_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._build_all()
+        return dict.values(self)
+
+    def items(self):
+        self._build_all()
+        return dict.items(self)
+
+    if hasattr(dict, "iteritems"):  # python 2
+        def iterkeys(self):
+            self._build_all()
+            return dict.iterkeys(self)
+
+        def itervalues(self):
+            self._build_all()
+            return dict.itervalues(self)
+
+        def iteritems(self):
+            self._build_all()
+            return dict.iteritems(self)
+
+    def __repr__(self):
+        self._build_all()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        self._build_all()
+        return dict.__reduce__(self)
+
     def __call__(self, posy):
         posy_subbed = self.subinto(posy)
         if hasattr(posy_subbed, "exp") and not posy_subbed.exp:
@@ -0,0 +1,272 @@
+"""Implement the StreamedGeometricProgram class"""
+import os
+from shutil import rmtree
+from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:  # python 2
+    from collections import Mapping
+import numpy as np
+from .geometric_program import GeometricProgram
+from ._analytic import degree_of_difficulty
+from .small_classes import CootMatrix
+from .small_scripts import mag
+from .keydict import KeySet
+
+
+class StreamedGeometricProgram(GeometricProgram):
+    """A GeometricProgram compiled straight into arrays from a stream
+
+    Each constraint is substituted into and its posynomials are written
+    into the program's arrays as soon as it is generated, after which it
+    can be garbage-collected; only the arrays (cs, A, p_idxs and k) and the
+    cost are kept. This lets programs be built whose symbolic constraints
+    wouldn't fit in memory together.
+
+    Since the constraints aren't kept, results have no constraint
+    sensitivities, and only the cost's constants have sensitivities.
+
+    Arguments
+    ---------
+    cost : Posynomial
+        Posynomial to minimize when solving
+    constraints : iterable
+        Constraints (anything with an `as_posyslt1` method, such as
+        ConstraintSets), or iterables of them (e.g. chunks), or iterables of
+        those, and so on; generators are consumed once.
+    substitutions : dict (optional)
+        Substitutions to make in the cost and every constraint
+    verbosity : int (optional)
+        If verbosity is greater than zero, warns about missing bounds
+        on creation.
+    memmap : str or True (optional)
+        If given, the arrays are written to files in this directory as
+        they are built, and are then numpy.memmaps of those files. If True,
+        a temporary directory is used, which is removed when the program
+        is garbage-collected.
+    chunksize : int (optional)
+        Number of entries of A to buffer before writing them to the arrays
+
+    Attributes
+    ----------
+    varidxs : OrderedDict
+        The column of A of each variable
+    varlocs : Mapping
+        The monomials each variable is in, as for GeometricProgram; since
+        they are only stored in A, they are looked up there on access
+    n_constraints : int
+        Number of constraints compiled
+
+    Examples
+    --------
+    >>> constraints = (x[i+1] >= x[i] + y[i] for i in range(n - 1))
+    >>> gp = StreamedGeometricProgram(x[-1], constraints, memmap=True)
+    >>> gp.solve()
+    """
+
+    def __init__(self, cost, constraints, substitutions=None, verbosity=1,
+                 memmap=None, chunksize=2**16):
+        # pylint: disable=super-init-not-called
+        self._tempdir = None
+        if memmap is True:
+            self._tempdir = _TemporaryDirectory()
+            memmap = self._tempdir.name
+        self.memmap = memmap
+        self.cost = cost
+        self.substitutions = substitutions if substitutions else {}
+        self.posynomials = [cost.sub(self.substitutions)]
+        self.constr_idxs = []
+        self.varidxs = OrderedDict()
+        self.n_constraints = 0
+        self._constraint_state = []
+
+        arrays = {name: _ArrayBuffer(dtype, memmap and
+                                     os.path.join(memmap, name + ".dat"))
+                  for name, dtype in [("row", int), ("col", int),
+                                      ("data", float), ("cs", float)]}
+        self.k = []
+        varkeys = KeySet(self.cost.varlocs)
+        for posys in self._posys(constraints, varkeys):
+            for posy in posys:
+                self._append(posy, arrays, chunksize)
+        self.constraints = _StreamedConstraints(varkeys)
+        self.unusedsubkeys = set(key for key in self.substitutions
+                                 if getattr(key, "key", key)
+                                 not in varkeys.keymap)
+        for key in self.unusedsubkeys:
+            if verbosity > 0:
+                print ("Warning: %s has a substitution but was not found in"
+                       " the cost or any constraints." % key)
+
+        self.cs = arrays["cs"].finish()
+        if (self.cs <= 0).any():
+            raise ValueError("GeometricPrograms cannot contain Signomials.")
+        self.A = CootMatrix(arrays["row"].finish(), arrays["col"].finish(),
+                            arrays["data"].finish())
+        self.A.shape = [len(self.cs), max(len(self.varidxs), 1)]
+        self.varlocs = _StreamedVarlocs(self.varidxs, self.A)
+        self.p_idxs = np.repeat(np.arange(len(self.k)), self.k)
+        self.m_idxs = _MonomialIdxs(self.k)
+        self.missingbounds = {}
+        if len(self.varidxs):
+            signs = [np.bincount(self.A.col[sign*self.A.data > 0],
+                                 minlength=len(self.varidxs)) > 0
+                     for sign in (1, -1)]
+            for var, has_pos, has_neg in zip(self.varidxs, *signs):
+                if not (has_pos and has_neg):
+                    self.missingbounds[var] = "lower" if has_pos else "upper"
+        if verbosity > 0:
+            for var, bound in sorted(self.missingbounds.items()):
+                print("%s has no %s bound" % (var, bound))
+
+        # initialize attributes modified by internal methods
+        self.result = None
+        self.solver_log = None
+        self.solver_out = None
+        self.presolved = None
+        self.scaled = None
+        self.blocks = None
+        self.bounds = None
+        self._logbounds = None
+        # of the program's own arrays, until solve() presolves them
+        self.degree_of_difficulty = degree_of_difficulty(self.cs, self.A)
+
+    def _posys(self, constraints, varkeys):
+        """Yields the substituted posynomials of the cost and of each
+        constraint in the stream, adding the constraints' keys to varkeys"""
+        yield self.posynomials
+        stack = [iter(constraints)]
+        while stack:
+            for item in stack[-1]:
+                if hasattr(item, "as_posyslt1"):
+                    item.substitutions = self.substitutions
+                    varkeys.update(item.varkeys)
+                    self.n_constraints += 1
+                    yield item.as_posyslt1()
+                else:
+                    stack.append(iter(item))
+                    break
+            else:
+                stack.pop()
+
+    def _append(self, posy, arrays, chunksize):
+        "Writes posy into the arrays as the next posynomial."
+        columns = self.varidxs
+        row = arrays["cs"].length
+        for exp in posy.exps:
+            if not exp:
+                # a constant monomial; kept as a zero at (row, 0), as in genA
+                exp = {None: 0.0}
+            for var, x in exp.items():
+                if var is None:
+                    col = 0
+                elif var in columns:
+                    col = columns[var]
+                else:
+                    col = columns[var] = len(columns)
+                arrays["row"].append(row)
+                arrays["col"].append(col)
+                arrays["data"].append(x)
+            row += 1
+        arrays["cs"].extend(mag(posy.cs))
+        self.k.append(len(posy.exps))
+        if len(arrays["data"].buffer) >= chunksize:
+            for array in arrays.values():
+                array.flush()
+
+    def __str__(self):
+        "String representation of a StreamedGeometricProgram."
+        return "\n".join(["  # minimize",
+                          "    %s," % self.cost,
+                          "[ # subject to %i streamed constraints" %
+                          self.n_constraints, "]"])
+
+
+class _StreamedConstraints(tuple):
+    "Stands in for the constraints of a stream, keeping only their varkeys."
+    def __new__(cls, varkeys):
+        constraints = tuple.__new__(cls)
+        constraints.varkeys = varkeys
+        return constraints
+
+
+class _StreamedVarlocs(Mapping):
+    "The monomials each variable is in, found from the columns of A."
+    def __init__(self, varidxs, A):
+        self.varidxs, self.A = varidxs, A
+
+    def __getitem__(self, var):
+        # constant monomials are stored as zeros in column 0
+        in_col = (self.A.col == self.varidxs[var]) & (self.A.data != 0)
+        return self.A.row[in_col].tolist()
+
+    def __contains__(self, var):
+        return var in self.varidxs
+
+    def __iter__(self):
+        return iter(self.varidxs)
+
+    def __len__(self):
+        return len(self.varidxs)
+
+
+class _TemporaryDirectory(object):
+    "A temporary directory, removed with its files when garbage-collected."
+    def __init__(self):
+        from tempfile import mkdtemp
+        self.name = mkdtemp(prefix="gpkit")
+
+    def __del__(self):
+        rmtree(self.name, ignore_errors=True)
+
+
+class _ArrayBuffer(object):
+    "A growing 1D array, flushed in chunks to memory or to a file."
+    def __init__(self, dtype, path=None):
+        self.dtype, self.path = np.dtype(dtype), path
+        self.buffer, self.chunks, self.length = [], [], 0
+        if path:
+            self.file = open(path, "wb")
+
+    def append(self, value):
+        "Appends a value."
+        self.buffer.append(value)
+        self.length += 1
+
+    def extend(self, values):
+        "Appends each of values."
+        self.buffer.extend(values)
+        self.length += len(values)
+
+    def flush(self):
+        "Writes out the buffer."
+        chunk = np.array(self.buffer, dtype=self.dtype)
+        self.buffer = []
+        if self.path:
+            chunk.tofile(self.file)
+        else:
+            self.chunks.append(chunk)
+
+    def finish(self):
+        "Returns the array."
+        self.flush()
+        if not self.path:
+            return np.hstack(self.chunks)
+        self.file.close()
+        if not self.length:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r",
+                         shape=(self.length,))
+
+
+class _MonomialIdxs(object):
+    "The monomial indices of each posynomial, made on access."
+    def __init__(self, k):
+        self.starts = np.cumsum(k) - k
+        self.k = k
+
+    def __getitem__(self, p_i):
+        return np.arange(self.starts[p_i], self.starts[p_i] + self.k[p_i])
+
+    def __len__(self):
+        return len(self.k)
@@ -1,5 +1,6 @@
 """Unit tests for Constraint, MonomialEquality and SignomialInequality"""
 import unittest
+import numpy as np
 from gpkit import Variable, SignomialsEnabled, Posynomial, VectorVariable
 from gpkit.nomials import SignomialInequality, PosynomialInequality
 from gpkit.nomials import MonomialEquality
@@ -77,6 +78,21 @@ class TestConstraint(unittest.TestCase):
         c2 = (1 + x**2 <= y)  # same as c
         self.assertEqual(c2.as_posyslt1(), c.as_posyslt1())
 
+    def test_compile_evaluator(self):
+        """Test evaluating a ConstraintSet's violations at many points"""
+        x = Variable('x')
+        y = Variable('y')
+        z = VectorVariable(2, 'z')
+        a = Variable('a', 3)
+        m = Model(x, [x >= y + 1, y >= a, z >= x, z[0]*z[1] <= 100])
+        evaluator = m.compile_evaluator()
+        self.assertEqual(len(evaluator.k), 5)
+        points = {x: [5, 3], y: [3, 4], z: [[6, 6], [20, 20]]}
+        self.assertEqual(evaluator.feasible(points).tolist(), [True, False])
+        violations = evaluator.violations(points)
+        self.assertTrue((violations[0] == 0).all())
+        self.assertAlmostEqual(violations[1].max(), np.log(4))
+
 
 class TestMonomialEquality(unittest.TestCase):
     """Test monomial equality constraint class"""
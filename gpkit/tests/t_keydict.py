@@ -2,7 +2,7 @@
 import unittest
 import numpy as np
 from gpkit import Variable, VectorVariable
-from gpkit.keydict import KeyDict
+from gpkit.keydict import KeyDict, TrackedKeyDict
 from gpkit.tests.helpers import run_tests
 
 
@@ -47,6 +47,22 @@ class TestKeyDict(unittest.TestCase):
         self.assertEqual(kd[v][0], 6)
         self.assertTrue(all(kd[v] == np.array([6, 3, 4])))
 
+    def test_tracking(self):
+        x = Variable("x")
+        v = VectorVariable(3, "v")
+        kd = TrackedKeyDict({x: 1})
+        self.assertEqual(kd.changed, set([x.key]))
+        kd.changed.clear()
+        kd["x"] = 2
+        self.assertEqual(kd.changed, set([x.key]))
+        kd.changed.clear()
+        kd[v[0]] = 1
+        self.assertEqual(kd.changed, set([v.key]))
+        kd.changed.clear()
+        del kd[x]
+        self.assertEqual(kd.changed, set([x.key]))
+        self.assertNotIn(x, kd)
+
 
 TESTS = [TestKeyDict]
 
@@ -1,9 +1,19 @@
 """Tests for GP and SP classes"""
+import gc
 import math
+import os
 import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+import numpy as np
 from gpkit import (Model, Monomial, settings, VectorVariable, Variable,
-                   SignomialsEnabled, ArrayVariable)
+                   SignomialsEnabled, ArrayVariable, GeometricProgram,
+                   CompiledGeometricProgram, StreamedGeometricProgram)
 from gpkit.small_classes import CootMatrix
+from gpkit.small_scripts import mag
+from gpkit.presolve import split_monomial_rows
+from gpkit._analytic import analytic_fn
+from gpkit._linprog import has_highs
 from gpkit.feasibility import feasibility_model
 
 NDIGS = {"cvxopt": 5, "mosek": 7, "mosek_cli": 5}
@@ -133,6 +143,559 @@ class TestGP(unittest.TestCase):
         self.assertEqual(gp.cs[1], gp.cs[2])
         self.assertEqual(gp.A.data[1], gp.A.data[2])
 
+    def test_array_maps(self):
+        x = Variable('x')
+        y = Variable('y')
+        m = Model(x + 2*y + 3, [x*y >= 1, y >= 0.5 + x/4])
+        gp = m.gp(verbosity=0)
+        # pylint: disable=no-member
+        self.assertEqual(list(gp.p_idxs), [0, 0, 0, 1, 2, 2])
+        self.assertEqual([list(mi) for mi in gp.m_idxs],
+                         [[0, 1, 2], [3], [4, 5]])
+        self.assertEqual(tuple(gp.A.shape), (6, 2))
+        self.assertEqual(gp.A.tocsr().shape, (6, 2))
+        self.assertEqual(len(gp.A.data), 8)  # 7 exponents + constant term
+
+    def test_monomial_blocks(self):
+        x = Variable('x')
+        y = Variable('y')
+        gp = Model(x + y, [x*y >= 1, x == 2*y, x + y**2 <= 10,
+                           x <= 5]).gp(verbosity=0)
+        blocks = split_monomial_rows(gp.cs, gp.A, gp.k)
+        self.assertEqual(list(blocks["posynomial"]), [0, 1, 5, 6])
+        self.assertEqual(list(blocks["inequality"]), [2, 7])
+        self.assertEqual(list(blocks["equality"]), [3])
+        self.assertEqual(list(blocks["twin"]), [4])
+        sol = gp.solve(self.solver, verbosity=0, presolve=False)
+        self.assertAlmostEqual(sol["cost"], 3/np.sqrt(2), self.ndig)
+
+    def test_compiled_gp(self):
+        x = Variable('x')
+        y = Variable('y')
+        k = Variable('k', 0.5)
+        x_min = VectorVariable(2, 'x_{min}', [1, 2])
+        m = Model(x + y + 3, [1 >= x/4. + k, y >= x_min.prod()/x,
+                              x >= x_min[0]])
+        cgp = m.compile(verbosity=0)
+        self.assertEqual(len(cgp.parameters), 3)
+        self.assertEqual(len(m.compile(verbosity=0,
+                                       parameters=["x_{min}"]).parameters), 2)
+        A = cgp.A
+        for subs in [{}, {k: 0.25, "x_{min}": [1.5, 2]}, {x_min[1]: 3}]:
+            cgp.update(subs)
+            m.substitutions.update({key: np.array(val)
+                                    for key, val in subs.items()})
+            compiled = cgp.solve(self.solver, verbosity=0)
+            rebuilt = m.gp(verbosity=0).solve(self.solver, verbosity=0)
+            self.assertIs(cgp.A, A)
+            self.assertAlmostEqual(compiled["cost"]/rebuilt["cost"], 1,
+                                   self.ndig)
+            for key in ["x", "y"]:
+                self.assertAlmostEqual(compiled["variables"][key] /
+                                       rebuilt["variables"][key], 1, 4)
+            compiled_sens = compiled["sensitivities"]["constants"]
+            rebuilt_sens = rebuilt["sensitivities"]["constants"]
+            for i in range(2):
+                self.assertAlmostEqual(compiled_sens["x_{min}"][i],
+                                       rebuilt_sens["x_{min}"][i], 4)
+        self.assertRaises(ValueError, cgp.update, {x: 2})
+        self.assertRaises(ValueError, cgp.update, {k: 0})
+        self.assertRaises(ValueError, cgp.update, {k: 2, x_min[0]: -1})
+        self.assertEqual(cgp.substitutions[k.key], 0.25)  # failed updates are void
+
+    def test_program_cache(self):
+        x = Variable('x')
+        y = Variable('y')
+        k = Variable('k', 0.5)
+        x_min = VectorVariable(2, 'x_{min}', [1, 2])
+        m = Model(x + y + 3, [1 >= x/4. + k, y >= x_min.prod()/x,
+                              x >= x_min[0]])
+        tempdir = mkdtemp()
+        cgp = m.compile(verbosity=0, cache=tempdir)
+        self.assertFalse(cgp.from_cache)
+        m.substitutions.update({k: 0.25})
+        cached = m.compile(verbosity=0, cache=tempdir)
+        self.assertTrue(cached.from_cache)
+        self.assertEqual(cached.A, cgp.A)
+        cgp.update({k: 0.25})
+        sol = cgp.solve(self.solver, verbosity=0)
+        csol = cached.solve(self.solver, verbosity=0)
+        self.assertAlmostEqual(csol["cost"]/sol["cost"], 1, self.ndig)
+        self.assertAlmostEqual(csol["variables"]["x"]/sol["variables"]["x"],
+                               1, self.ndig)
+        for i in range(2):
+            self.assertAlmostEqual(
+                csol["sensitivities"]["constants"]["x_{min}"][i],
+                sol["sensitivities"]["constants"]["x_{min}"][i], 4)
+        # a model with a different structure gets its own entry
+        m = Model(x + y + 3, [1 >= x/4. + k, y >= x_min.prod()/x,
+                              x >= 2*x_min[0]])
+        self.assertFalse(m.compile(verbosity=0, cache=tempdir).from_cache)
+        # as does one whose coefficients only differ in their units
+        z = Variable('z', 'm')
+        meter, foot = z.units, Variable('l', 'ft').units
+        if meter:
+            for cost in [z*meter, z*foot]:
+                m = Model(cost, [z >= 2*meter])
+                cgp = m.compile(verbosity=0, cache=tempdir)
+                self.assertFalse(cgp.from_cache)
+        rmtree(tempdir)
+
+    def test_solve_many(self):
+        x = Variable('x')
+        y = Variable('y')
+        k = Variable('k', 0.5)
+        x_min = VectorVariable(2, 'x_{min}', [1, 2])
+        m = Model(x + y + 3, [1 >= x/4. + k, y >= x_min.prod()/x,
+                              x >= x_min[0]])
+        cgp = m.compile(verbosity=0)
+        points = [{}, {k: 0.25, "x_{min}": [1.5, 2]}, {x_min[1]: 3},
+                  {k: 2}]  # the last is infeasible
+        results = cgp.solve_many(points, 2, self.solver, skipfailures=True)
+        self.assertEqual(results[-1], None)
+        self.assertRaises(RuntimeWarning, cgp.solve_many, points, 2,
+                          self.solver)
+        self.assertEqual(cgp.substitutions[k.key], 0.5)  # left as they were
+        for subs, result in zip(points[:-1], results):
+            cgp.update(subs)
+            sol = cgp.solve(self.solver, verbosity=0)
+            cgp.update({k: 0.5, x_min: [1, 2]})
+            self.assertAlmostEqual(result["cost"]/sol["cost"], 1, self.ndig)
+            self.assertEqual(result["constants"][k], sol["constants"][k])
+            for i in range(2):
+                self.assertAlmostEqual(
+                    result["sensitivities"]["constants"]["x_{min}"][i],
+                    sol["sensitivities"]["constants"]["x_{min}"][i], 4)
+
+    def test_resolve_reuse(self):
+        x = Variable('x')
+        x_min = Variable('x_{min}', 2)
+        y_min = VectorVariable(2, 'y_{min}', [1, 2])
+        m = Model(x, [x >= x_min, x >= y_min.prod()])
+        m.solve(self.solver, verbosity=0)
+        self.assertEqual(type(m.program), GeometricProgram)
+        m.substitutions.update({x_min: 3})
+        self.assertAlmostEqual(m.solve(self.solver, verbosity=0)["cost"], 3,
+                               self.ndig)
+        cgp = m.program
+        self.assertEqual(type(cgp), CompiledGeometricProgram)
+        A = cgp.A
+        for subs, cost in [({x_min: 5}, 5), ({y_min: np.array([3, 4])}, 12),
+                           ({}, 12)]:
+            m.substitutions.update(subs)
+            sol = m.solve(self.solver, verbosity=0)
+            self.assertAlmostEqual(sol["cost"], cost, self.ndig)
+            self.assertIs(m.program, cgp)
+            self.assertIs(cgp.A, A)
+        m.substitutions.update({x_min: 0})  # can't be a parameter
+        m.solve(self.solver, verbosity=0)
+        self.assertEqual(type(m.program), GeometricProgram)
+        m.substitutions.update({x_min: 13})
+        self.assertAlmostEqual(m.solve(self.solver, verbosity=0)["cost"], 13,
+                               self.ndig)
+        self.assertIsNot(m.program, cgp)
+
+    def test_resolve_replaced_constraint(self):
+        x = Variable('x')
+        x_min = Variable('x_{min}', 2)
+        m = Model(x, [x >= x_min, x >= 1])
+        m.solve(self.solver, verbosity=0)
+        for value in [3, 4]:
+            m.substitutions.update({x_min: value})
+            self.assertAlmostEqual(m.solve(self.solver, verbosity=0)["cost"],
+                                   value, self.ndig)
+        cgp = m.program
+        m[0] = (x >= 2*x_min)  # same length and substitutions
+        self.assertAlmostEqual(m.solve(self.solver, verbosity=0)["cost"], 8,
+                               self.ndig)
+        self.assertIsNot(m.program, cgp)
+        for value, cost in [(6, 12), (5, 10)]:
+            m.substitutions.update({x_min: value})
+            self.assertAlmostEqual(m.solve(self.solver, verbosity=0)["cost"],
+                                   cost, self.ndig)
+        m[0] = (x >= 3*x_min)
+        m.substitutions.update({x_min: 4})
+        self.assertAlmostEqual(m.solve(self.solver, verbosity=0)["cost"], 12,
+                               self.ndig)
+
+    def test_presolve_equalities(self):
+        x = VectorVariable(20, 'x')
+        y = Variable('y')
+        z = Variable('z', 3)
+        constraints = [x[i+1] == 1.1*x[i]**0.9*z for i in range(19)]
+        constraints += [x[0] >= 2, x.sum() <= 1e6*y, y*x[-1] >= 4,
+                        x[1] == 1.1*x[0]**0.9*z]  # a duplicate equality
+        gp = Model(y + x[3], constraints).gp(verbosity=0)
+        sol = gp.solve(self.solver, verbosity=0, presolve=True)
+        self.assertEqual(len(gp.presolved.eliminated), 19)
+        # the duplicate equality's rows are left constant, and removed
+        self.assertEqual(len(gp.presolved.removed["constant"]), 2)
+        self.assertEqual(gp.presolved.A.shape, [gp.A.shape[0] - 40, 2])
+        unpresolved = gp.solve(self.solver, verbosity=0, presolve=False)
+        self.assertEqual(gp.presolved, None)
+        self.assertAlmostEqual(sol["cost"]/unpresolved["cost"], 1, self.ndig)
+        ratios = sol["variables"][x]/unpresolved["variables"][x]
+        for ratio in ratios:
+            self.assertAlmostEqual(ratio, 1, self.ndig)
+        self.assertAlmostEqual(sol["sensitivities"]["constants"][z],
+                               unpresolved["sensitivities"]["constants"][z],
+                               4)
+
+    def test_presolve_redundant(self):
+        x = Variable('x')
+        y = Variable('y')
+        a = Variable('a', 2)
+        gp = Model(1/x/y + x, [x >= 1, x >= a, 2*x**2 >= 3,
+                               x + y <= 10, x + y <= 10, x + 2*y <= 10,
+                               y >= 0.5, x*y >= 3]).gp(verbosity=0)
+        sol = gp.solve(self.solver, verbosity=0, presolve=True)
+        self.assertEqual(gp.presolved.removed["parallel"], [1, 3])
+        self.assertEqual(gp.presolved.removed["dominated"], [4, 5])
+        self.assertEqual(list(sol["sensitivities"]["la"][[1, 3, 4, 5]]),
+                         [0]*4)
+        unpresolved = gp.solve(self.solver, verbosity=0)
+        self.assertEqual(gp.presolved, None)  # presolving is opt-in
+        self.assertAlmostEqual(sol["cost"]/unpresolved["cost"], 1, self.ndig)
+        self.assertAlmostEqual(sol["sensitivities"]["constants"][a],
+                               unpresolved["sensitivities"]["constants"][a],
+                               4)
+
+    def test_linprog(self):
+        x = Variable('x')
+        y = Variable('y')
+        a = Variable('a', 2)
+        b = Variable('b', 3)
+        gp = Model(x**2*y, [x >= a, y >= b/x, x*y <= 100, y >= 1,
+                            x <= 1000]).gp(verbosity=0)
+        lpsol = gp.solve("linprog", verbosity=0)
+        self.assertAlmostEqual(lpsol["cost"], 6, 10)
+        sol = gp.solve(self.solver, verbosity=0)
+        self.assertAlmostEqual(lpsol["cost"]/sol["cost"], 1, self.ndig)
+        for var in [a, b]:
+            self.assertAlmostEqual(lpsol["sensitivities"]["constants"][var],
+                                   sol["sensitivities"]["constants"][var],
+                                   self.ndig)
+        # all-monomial GPs are solved as LPs by default, with HiGHS
+        self.assertAlmostEqual(gp.solve(verbosity=0)["cost"], 6,
+                               10 if has_highs() else self.ndig)
+        gp = Model(x + y, [x*y >= 1]).gp(verbosity=0)
+        self.assertRaises(ValueError, gp.solve, "linprog", verbosity=0)
+        # an infeasible LP is reported as the solver's status
+        gp = Model(x, [x >= a, x <= 1]).gp(verbosity=0)
+        self.assertRaises(RuntimeWarning, gp.solve, "linprog", verbosity=0)
+        self.assertEqual(gp.solver_out["status"], "infeasible")
+
+    def test_zero_dod(self):
+        x = Variable('x')
+        y = Variable('y')
+        a = Variable('a', 2)
+        gp = Model(a/(x*y), [x + y <= 1]).gp(verbosity=0)
+        self.assertEqual(gp.degree_of_difficulty, 0)  # known before solving
+        sol = gp.solve("analytic", verbosity=0)
+        self.assertEqual(gp.degree_of_difficulty, 0)
+        self.assertEqual(gp.solver_out["status"], "optimal")
+        self.assertAlmostEqual(sol["cost"], 8, 10)
+        self.assertAlmostEqual(sol["variables"][x], 0.5, 10)
+        sol2 = gp.solve(self.solver, verbosity=0)
+        self.assertAlmostEqual(sol["cost"]/sol2["cost"], 1, self.ndig)
+        self.assertAlmostEqual(sol["sensitivities"]["constants"][a],
+                               sol2["sensitivities"]["constants"][a],
+                               self.ndig)
+        # the dual point of x + y with x*y <= 1 is negative (it's unbounded)
+        gp = Model(x + y, [x*y <= 1]).gp(verbosity=0)
+        solverfn = analytic_fn()
+        self.assertEqual(solverfn(gp.cs, gp.A, gp.p_idxs, gp.k)["status"],
+                         "negative dual")
+
+    def test_bound_propagation(self):
+        x = Variable('x')
+        y = Variable('y')
+        gp = Model(x*y, [x >= 2, y >= 3*x, x + y <= 20]).gp(verbosity=0)
+        sol = gp.solve(self.solver, verbosity=0, presolve=True)
+        self.assertAlmostEqual(sol["cost"], 12, self.ndig)
+        for var, (lower, upper) in [(x, (2, 6)), (y, (6, 18))]:
+            self.assertAlmostEqual(gp.bounds[var.key][0], lower, 10)
+            self.assertAlmostEqual(gp.bounds[var.key][1], upper, 10)
+        # x*y >= 12 follows from the other constraints
+        gp = Model(x*y, [x >= 2, y >= 3*x, x*y <= 10]).gp(verbosity=0)
+        self.assertRaises(RuntimeWarning, gp.solve, self.solver, verbosity=0,
+                          presolve=True)
+        self.assertEqual(gp.solver_out, None)
+        # bounds are only propagated when presolving
+        gp = Model(x*y, [x >= 2, y >= 3*x, x + y <= 20]).gp(verbosity=0)
+        gp.solve(self.solver, verbosity=0, presolve=True)
+        gp.solve(self.solver, verbosity=0)
+        self.assertEqual(gp.bounds, None)
+
+    def test_scaling(self):
+        x = Variable('x')
+        y = Variable('y')
+        z = Variable('z')
+        m = Model(1e12*x/y + 1e-8*z, [x >= 1e-9 + 1e7/(y*z), y <= 1e6*x**0.5,
+                                      z*x >= 1e-3, y + 3e4*z <= 1e9])
+        gp = m.gp(verbosity=0)
+        sol = gp.solve(self.solver, verbosity=0, scale=True)
+        # the orders of magnitude spanned by the coefficients
+        spread, scaledspread = [np.log10(cs.max()/cs.min())
+                                for cs in [gp.cs, gp.scaled.cs]]
+        self.assertLess(scaledspread, spread/2)
+        unscaled = gp.solve(self.solver, verbosity=0)
+        self.assertEqual(gp.scaled, None)  # scaling is opt-in
+        self.assertAlmostEqual(sol["cost"]/unscaled["cost"], 1, self.ndig)
+        for var in [x, y, z]:
+            self.assertAlmostEqual(sol["variables"][var] /
+                                   unscaled["variables"][var], 1, self.ndig)
+
+    def test_parallel_blocks(self):
+        x = VectorVariable(3, 'x')
+        y = VectorVariable(3, 'y')
+        z = Variable('z')
+        m = Model(2*x.sum() + 3*y[0] + z,
+                  [x >= 1 + y/2, y >= [1, 2, 3], x*y <= 100, z >= 4])
+        gp = m.gp(verbosity=0)
+        sol = gp.solve(self.solver, verbosity=0)
+        self.assertEqual(gp.blocks, None)
+        psol = gp.solve(self.solver, verbosity=0, parallel=2)
+        self.assertEqual(len(gp.blocks), 4)  # z, and each (x_i, y_i)
+        self.assertAlmostEqual(psol["cost"], 19, self.ndig)
+        for var in [x[1], y[2], z]:
+            self.assertAlmostEqual(psol["variables"][var],
+                                   sol["variables"][var], self.ndig)
+        for la, pla in zip(sol["sensitivities"]["la"],
+                           psol["sensitivities"]["la"]):
+            self.assertAlmostEqual(la, pla, self.ndig)
+
+    def test_streamed_gp(self):
+        n = 20
+        x = VectorVariable(n, 'x')
+        y = VectorVariable(n, 'y')
+        a = Variable('a', 2)
+
+        def constraints():
+            "Yields constraints, and chunks of them."
+            for i in range(n - 1):
+                yield x[i+1] >= x[i] + y[i]
+                yield [y[i] >= a, x[i]*y[i] >= 1]
+            yield x[0] >= 1
+        m = Model(x[-1], list(constraints()))
+        sol = m.solve(self.solver, verbosity=0)
+        mgp = m.gp(verbosity=0)
+        tempdir = mkdtemp()
+        for memmap in [None, tempdir, True]:
+            gp = StreamedGeometricProgram(x[-1], constraints(), m.substitutions,
+                                          verbosity=0, memmap=memmap,
+                                          chunksize=10)
+            self.assertEqual(gp.n_constraints, 3*(n - 1) + 1)
+            self.assertEqual(isinstance(gp.cs, np.memmap), bool(memmap))
+            self.assertEqual(list(gp.varlocs), list(gp.varidxs))
+            for var in [x[0], x[5], y[5]]:
+                self.assertEqual(len(gp.varlocs[var.key]),
+                                 len(mgp.varlocs[var.key]))
+            ssol = gp.solve(self.solver, verbosity=0)
+            self.assertAlmostEqual(ssol["cost"]/sol["cost"], 1, self.ndig)
+            self.assertAlmostEqual(ssol["variables"][x[5]],
+                                   sol["variables"][x[5]], self.ndig)
+            self.assertEqual(ssol["variables"][a], 2)
+        # a temporary directory is removed with the program
+        memmapdir = gp.memmap
+        self.assertTrue(os.path.isdir(memmapdir))
+        del gp, ssol
+        gc.collect()
+        self.assertFalse(os.path.isdir(memmapdir))
+        rmtree(tempdir)
+
+    def test_parallel_compile(self):
+        x = VectorVariable(6, 'x')
+        y = Variable('y')
+        a = VectorVariable(6, 'a', [1, 2, 3, 4, 5, 6])
+        m = Model(x.prod()*y**2, [x >= a, y >= x[0] + 2*x[1] + a[2],
+                                  Model(y, [x[3] >= 3*x[4]/a[4]])])
+        gp = m.gp(verbosity=0)
+        pgp = m.gp(verbosity=0, processes=2)
+        self.assertEqual(pgp.k, gp.k)
+        self.assertEqual(pgp.varlocs, gp.varlocs)
+        self.assertEqual(pgp.missingbounds, gp.missingbounds)
+        self.assertEqual(pgp.posynomials[1:], gp.posynomials[1:])
+        # A's columns are in the order of each program's varlocs
+        order = [list(gp.varlocs).index(var) for var in pgp.varlocs]
+        self.assertTrue(np.array_equal(pgp.A.tocsr().toarray(),
+                                       gp.A.tocsr().toarray()[:, order]))
+        self.assertTrue(np.allclose(pgp.cs, gp.cs))
+        sol = gp.solve(self.solver, verbosity=0)
+        psol = pgp.solve(self.solver, verbosity=0)
+        self.assertAlmostEqual(psol["cost"]/sol["cost"], 1, self.ndig)
+        for var in a:
+            self.assertAlmostEqual(psol["sensitivities"]["constants"][var],
+                                   sol["sensitivities"]["constants"][var],
+                                   self.ndig)
+
+    def test_parallel_compile_units(self):
+        x = Variable('x', 'm')
+        a = Variable('a', 5, 'cm')
+        b = VectorVariable(2, 'b', [2, 3], 'm')
+        m = Model(x, [x >= a, x*b >= a**2])
+        gp = m.gp(verbosity=0)
+        pgp = m.gp(verbosity=0, processes=2)
+        self.assertTrue(np.allclose(pgp.cs, gp.cs))
+        for posy, pposy in zip(gp.posynomials, pgp.posynomials):
+            self.assertEqual(pposy.units, posy.units)
+        sol = gp.solve(self.solver, verbosity=0)
+        psol = pgp.solve(self.solver, verbosity=0)
+        self.assertAlmostEqual(mag(psol["cost"]/sol["cost"]), 1, self.ndig)
+
+    def test_oracles(self):
+        x = VectorVariable(3, 'x')
+        y = Variable('y')
+        a = Variable('a', 2)
+        m = Model(x[0]*y + x[1]/x[2] + 2*y**0.5,
+                  [x[0]*x[1] >= a + y, x[2] >= 3*y**2 + x[0], y >= 1,
+                   x.prod() <= 100])
+        oracles = m.gp(verbosity=0).oracles()
+        n_posys, n_vars = oracles.shape
+        point = np.linspace(-0.5, 0.5, n_vars)
+        la = np.linspace(1, 2, n_posys)
+        eye = np.eye(n_vars)*1e-6
+
+        def jacobian(point):
+            "The Jacobian, as a dense array."
+            J = np.zeros(oracles.shape)
+            J[oracles.jacobian_structure] = oracles.jacobian(point)
+            return J
+        J = jacobian(point)
+        H = np.zeros((n_vars, n_vars))
+        H[oracles.hessian_structure] = oracles.hessian(point, la)
+        for j in range(n_vars):
+            df = oracles.values(point + eye[j]) - oracles.values(point-eye[j])
+            self.assertTrue(np.allclose(J[:, j], df/2e-6, atol=1e-6))
+            dJ = jacobian(point + eye[j]) - jacobian(point - eye[j])
+            self.assertTrue(np.allclose(H[j:, j], la.dot(dJ)[j:]/2e-6,
+                                        atol=1e-6))
+        self.assertTrue(np.allclose(oracles.gradient(point), J[0]))
+
+    def test_variable_sensitivities(self):
+        x = Variable('x')
+        y = Variable('y')
+        z = Variable('z')
+        k = Variable('k', 2)
+        b = Variable('b', 3)
+        m = Model(x + y + 3 + z, [y >= k/x, z*x == b])
+        cgp = m.compile(verbosity=0)
+        self.assertRaises(ValueError, cgp.variable_sensitivities)
+        cgp.solve(self.solver, verbosity=0)
+        sens = cgp.variable_sensitivities()
+        for param, value in [(k, 2), (b, 3)]:
+            logs = []
+            for step in [1e-4, -1e-4]:
+                cgp.update({param: value*np.exp(step)})
+                sol = cgp.solve(self.solver, verbosity=0)
+                logs.append({var: np.log(sol["variables"][var])
+                             for var in [x, y, z]})
+            cgp.update({param: value})
+            for var in [x, y, z]:
+                self.assertAlmostEqual(sens[var][param],
+                                       (logs[0][var] - logs[1][var])/2e-4, 3)
+        # also found for the solution of the model itself
+        sol = m.solve(self.solver, verbosity=0, parametric=True)
+        parametric = sol["sensitivities"]["parametric"]
+        for var in [x, y, z]:
+            for param in [k, b]:
+                self.assertAlmostEqual(parametric[var][param],
+                                       sens[var][param], 4)
+        m.substitutions.update({k: ("sweep", [1, 2])})
+        self.assertRaises(ValueError, m.solve, self.solver, verbosity=0,
+                          parametric=True)
+
+    def test_cost_hessian(self):
+        x = Variable('x')
+        y = Variable('y')
+        z = Variable('z')
+        k = Variable('k', 2)
+        b = Variable('b', 3)
+        c = VectorVariable(2, 'c', [1.5, 4])
+        m = Model(x + y + 3*c[0] + z + c[1]*x**2,
+                  [y >= k/x, z*x == b, x >= 0.1])
+        sol = m.solve(self.solver, verbosity=0, curvature=[k, c])
+        curvature = sol["sensitivities"]["curvature"]
+        self.assertNotIn(b, curvature)
+        cgp = m.compile(verbosity=0)
+        hessian = cgp.cost_hessian(result=cgp.solve(self.solver, verbosity=0))
+        self.assertAlmostEqual(curvature[k][c[1]], hessian[k][c[1]], 4)
+        params = [(k, 2), (b, 3), (c[0], 1.5), (c[1], 4)]
+        for p, value in params:
+            senss = []
+            for step in [1e-4, -1e-4]:
+                cgp.update({p: value*np.exp(step)})
+                sol = cgp.solve(self.solver, verbosity=0)
+                senss.append(sol["sensitivities"]["constants"])
+            cgp.update({p: value})
+            for q, _ in params:
+                self.assertAlmostEqual(hessian[p][q],
+                                       (senss[0][q] - senss[1][q])/2e-4, 3)
+        self.assertRaises(ValueError, cgp.cost_hessian)  # update() cleared it
+
+    def test_lazy_result(self):
+        x = Variable('x')
+        x_min = Variable('x_{min}', 2)
+        constraints = [x >= x_min]
+        gp = Model(x, constraints).gp(verbosity=0)
+        result = gp.solve(self.solver, verbosity=0)
+        self.assertIn("sensitivities", result.pending)
+        self.assertAlmostEqual(result["variables"][x], 2, self.ndig)
+        self.assertIn("sensitivities", result)
+        self.assertEqual(len(result), 5)
+        # another program of the same constraints doesn't change the result
+        Model(x, constraints, {x_min: 3}).solve(self.solver, verbosity=0)
+        substitutions = constraints[0].substitutions
+        self.assertAlmostEqual(result["sensitivities"]["constants"][x_min],
+                               1, self.ndig)
+        # and reading the result doesn't change the constraints
+        self.assertIs(constraints[0].substitutions, substitutions)
+        self.assertEqual(result["constants"][x_min], 2)
+        copied = dict(result)
+        self.assertEqual(set(copied), set(result.lazy_keys))
+        self.assertFalse(result.pending)
+
+    def test_lazy_solution(self):
+        x = Variable('x')
+        x_min = Variable('x_{min}', 2)
+        m = Model(x, [x >= x_min])
+        sol = m.solve(self.solver, verbosity=0)
+        self.assertIn("sensitivities", m.program.result.pending)
+        self.assertIn("sensitivities", sol)
+        self.assertAlmostEqual(sol["sensitivities"]["constants"][x_min], 1,
+                               self.ndig)
+        self.assertNotIn("sensitivities", m.program.result.pending)
+        m.substitutions.update({x_min: ("sweep", [1, 2, 3])})
+        sol = m.solve(self.solver, verbosity=0)
+        self.assertTrue(all(program.result.pending
+                            for program in m.program))
+        senss = sol["sensitivities"]["constants"][x_min]
+        self.assertEqual(len(senss), 3)
+        for sens in senss:
+            self.assertAlmostEqual(sens, 1, self.ndig)
+        self.assertEqual(set(sol), set(sol.keys()))
+        self.assertEqual(len(sol.atindex(1)["variables"]), 2)
+
+    def test_check_levels(self):
+        x = Variable('x')
+        gp = Model(x, [x >= 2, x >= 1]).gp(verbosity=0)
+        gp.solve(self.solver, verbosity=0)
+        solver_out = {"status": "optimal", "primal": gp.solver_out["primal"],
+                      "la": gp.solver_out["la"]*[1, 2, 1]}
+
+        def bad_duals(**_):
+            "Returns the right primal with wrong dual variables."
+            return dict(solver_out)
+        # which are for the original arrays
+        unchanged = {"presolve": False, "scale": False}
+        self.assertRaises(RuntimeWarning, gp.solve, bad_duals, verbosity=0,
+                          **unchanged)
+        for check in ["cheap", "off"]:
+            sol = gp.solve(bad_duals, verbosity=0, check=check, **unchanged)
+            self.assertAlmostEqual(sol["cost"], 2, self.ndig)
+        self.assertRaises(ValueError, gp.solve, self.solver, verbosity=0,
+                          check="thorough")
+
     def test_zeroing(self):
         L = Variable("L")
         k = Variable("k", 0)
@@ -2,6 +2,8 @@
 import math
 import unittest
 from gpkit import Variable, Monomial, Posynomial, Signomial
+from gpkit import VectorVariable
+from gpkit.nomials import NomialSum
 from gpkit import units, SignomialsEnabled
 
 
@@ -299,6 +301,46 @@ class TestPosynomial(unittest.TestCase):
         # print("%s, %s" % (ps1, ps2))  # python 3 dict reordering
         self.assertEqual(p1, p2)
 
+    def test_large_mult(self):
+        "Test products and powers of posynomials with many terms"
+        x = VectorVariable(30, 'x')
+        y = Variable('y')
+        p1, p2 = x.sum() + y, (1/x).sum()
+        prod = p1*p2
+        # each x_i*x_i**-1 combines into the single constant term
+        self.assertEqual(len(prod.cs), 30*29 + 30 + 1)
+        self.assertEqual(prod.exps.index({}), 0)
+        self.assertAlmostEqual(prod.cs[0], 30)
+        point = dict(zip(x, range(1, 31)))
+        point[y] = 2.5
+        self.assertAlmostEqual(prod.subsummag(point),
+                               p1.subsummag(point)*p2.subsummag(point))
+        z = Variable('z')
+        self.assertEqual((y + z)**7, (y + z)**3*(y + z)**4)
+        self.assertEqual(((y + 2*z)**5).cs.tolist(),
+                         [1, 10, 40, 80, 80, 32])
+
+    def test_nomialsum(self):
+        "Test accumulating the terms of a posynomial with a NomialSum"
+        x = Variable('x')
+        y = Variable('y', units='m')
+        total = NomialSum()
+        self.assertEqual(total.nomial(), 0)
+        expected = 0
+        for i in range(1, 20):
+            total += x**i/i
+            expected = expected + x**i/i
+        total += 2
+        total += x
+        self.assertEqual(total.nomial(), expected + 2 + x)
+        self.assertEqual(len(total.nomial().cs), 20)
+        self.assertEqual(NomialSum([1, 2.5]).nomial(), 3.5)
+        if y.units:
+            self.assertEqual(NomialSum([y, 3*y, 2*units.m]).nomial(),
+                             4*y + 2*units.m)
+            self.assertRaises(ValueError, NomialSum([x, y]).nomial)
+        self.assertRaises(TypeError, NomialSum().add, "x")
+
     def test_constraint_gen(self):
         "Test creation of Constraints via operator overloading"
         x = Monomial('x')
@@ -358,6 +400,47 @@ class TestPosynomial(unittest.TestCase):
         m = p.mono_lower_bound({d: 1, h: 1})
         self.assertEqual(m, 2*(d*h)**1.5)
 
+    def test_compile(self):
+        "Test evaluating a compiled Posynomial at many points"
+        x = Variable('x')
+        y = Variable('y')
+        a = Variable('a', 3)
+        p = x**2 + a*y/x
+        evaluator = p.compile()
+        points = {x: [1, 2, 0.5], y: [1, 4, 2]}
+        values = evaluator.values(points)[:, 0]
+        for i, value in enumerate(values):
+            point = {x.key: points[x][i], y.key: points[y][i], a.key: 3}
+            self.assertAlmostEqual(value, p.subsummag(point))
+            grad = evaluator.loggradients(points)[i, 0]
+            for j, var in enumerate(evaluator.varkeys):
+                expected = point[var]*p.diff(var).subsummag(point)/value
+                self.assertAlmostEqual(grad[j], expected)
+        with SignomialsEnabled():
+            s = x - 2*y
+        self.assertEqual(s.compile().values({x: [1, 4], y: [1, 1]}).tolist(),
+                         [[-1], [2]])
+        self.assertRaises(ValueError, evaluator.values, {x: [1]})
+
+    def test_expmatrix(self):
+        "Test that nomials built from exponent matrices match dict exps"
+        x = Variable('x')
+        y = Variable('y')
+        a = Variable('a', 2)
+        p = x**2 + a*y + x**2 + 3*y*a
+        self.assertEqual(len(p.cs), 2)
+        self.assertEqual(p, 2*x**2 + 4*a*y)
+        self.assertEqual(set(p.varlocs), set([x.key, y.key, a.key]))
+        self.assertEqual(p.varlocs[x.key], [p.exps.index({x.key: 2})])
+        matrix = p.expmatrix
+        self.assertEqual(len(matrix), 2)
+        self.assertEqual(matrix.to_exps(), p.exps)
+        q = p.sub({a: 3})
+        self.assertEqual(q, 2*x**2 + 12*y)
+        self.assertNotIn(a.key, q.varlocs)
+        self.assertEqual(hash(q), hash(12*y + 2*x**2))
+        self.assertAlmostEqual(p.subsummag({x: 2, y: 1, a: 0.5}), 10)
+
 # test substitution
 
 TESTS = [TestPosynomial, TestMonomial, TestSignomial]
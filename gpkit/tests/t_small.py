@@ -1,7 +1,10 @@
-"""Tests for small_classes.py and small_scripts.py"""
+"""Tests for small_classes.py, small_scripts.py and segment_ops.py"""
 import unittest
-from gpkit.small_classes import HashVector
+import numpy as np
+from gpkit.small_classes import HashVector, CootMatrix
 from gpkit.small_scripts import unitstr
+from gpkit.segment_ops import (segment_sum, segment_max, segment_logsumexp,
+                               segment_softmax)
 import gpkit
 
 
@@ -47,6 +50,30 @@ class TestHashVector(unittest.TestCase):
         self.assertEqual(a * b * c, HashVector())
         self.assertEqual(a * {'x': 6, 'k': 4}, HashVector(x=6))
 
+
+class TestCootMatrix(unittest.TestCase):
+    """TestCase for the CootMatrix class"""
+
+    def test_array_equality(self):
+        "Array-backed and list-backed CootMatrices should compare equal"
+        listed = CootMatrix([0, 1], [0, 0], [2., -1.])
+        arrayed = CootMatrix(np.array([0, 1]), np.array([0, 0]),
+                             np.array([2., -1.]))
+        self.assertEqual(listed, arrayed)
+        self.assertNotEqual(listed, CootMatrix([0, 1], [0, 0], [2., 1.]))
+
+    def test_conversion_cache(self):
+        "Conversions should be cached until the matrix is appended to"
+        A = CootMatrix([], [], [])
+        A.append(0, 0, 1.)
+        A.append(1, 0, 3.)
+        self.assertIs(A.tocsr(), A.tocsr())
+        self.assertEqual(list(A.dot([2.])), [2., 6.])
+        A.append(1, 1, 1.)
+        self.assertEqual(A.tocsc().shape, (2, 2))
+        self.assertEqual(list(A.dot([2., 1.])), [2., 7.])
+
+
 class TestSmallScripts(unittest.TestCase):
     """TestCase for gpkit.small_scripts"""
     def test_unitstr(self):
@@ -59,7 +86,29 @@ class TestSmallScripts(unittest.TestCase):
         self.assertEqual(unitstr(None, dimless="--"), "")
 
 
-TESTS = [TestHashVector, TestSmallScripts]
+class TestSegmentOps(unittest.TestCase):
+    """TestCase for the segment_ops module"""
+
+    def test_reductions(self):
+        values = np.array([1., 2., 3., 1000., 1001.])
+        for idxs in [np.array([0, 0, 0, 2, 2]), np.array([2, 0, 0, 2, 0])]:
+            self.assertEqual(list(segment_sum(values, idxs, 4)),
+                             [values[idxs == i].sum() for i in range(4)])
+            self.assertEqual(list(segment_max(values, idxs, 4)),
+                             [values[idxs == i].max() if i in idxs
+                              else -np.inf for i in range(4)])
+            lse = segment_logsumexp(values, idxs, 4)
+            self.assertEqual(lse[1], -np.inf)
+            self.assertTrue(np.isfinite(lse[2]))
+            softmax = segment_softmax(values, idxs, 4)
+            self.assertTrue(np.allclose(segment_sum(softmax, idxs, 4),
+                                        [1, 0, 1, 0]))
+            self.assertTrue(np.allclose(softmax, np.exp(values - lse[idxs])))
+        small = segment_logsumexp(values[:3], np.zeros(3, dtype=int), 1)
+        self.assertAlmostEqual(small[0], np.log(np.exp(values[:3]).sum()))
+
+
+TESTS = [TestHashVector, TestCootMatrix, TestSmallScripts, TestSegmentOps]
 
 
 if __name__ == '__main__':
@@ -22,12 +22,12 @@ def te_exp_minus1(posy, nterm):
     """
     if nterm < 1:
         raise ValueError("Unexpected number of terms, nterm=%s" % nterm)
-    res = 0
-    factorial_denom = 1
+    terms = []
+    term = 1
     for i in range(1, nterm + 1):
-        factorial_denom *= i
-        res += posy**i / factorial_denom
-    return res
+        term = term * posy / i  # posy**i / i!
+        terms.append(term)
+    return NomialArray(terms).sum(axis=0)
 
 
 def composite_objective(*objectives, **kwargs):